@@ -54,6 +54,21 @@ CREATE TABLE IF NOT EXISTS feedback (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Table seen_urls (crawl incrémental des sources, utilisée dans main.py)
+CREATE TABLE IF NOT EXISTS seen_urls (
+    url_hash CHAR(32) PRIMARY KEY,  -- md5(source_url + "\n" + url)
+    source_url VARCHAR(512) NOT NULL,
+    url TEXT NOT NULL,
+    first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_seen_urls_source (source_url, first_seen)
+);
+
+-- Table crawl_cursors (date du dernier passage par source, utilisée dans main.py)
+CREATE TABLE IF NOT EXISTS crawl_cursors (
+    source_url VARCHAR(512) PRIMARY KEY,
+    last_run DATETIME NOT NULL
+);
+
 -- Insertion des valeurs par défaut pour filters
 INSERT IGNORE INTO filters (id, exclude_ads, exclude_professional, target_press, time_unit, time_value, exclude_jobs, exclude_training)
 VALUES (1, FALSE, FALSE, FALSE, 'mois', 1, FALSE, FALSE);
\ No newline at end of file
@@ -12,5 +12,6 @@ setup(
         "pymysql",
         "python-dotenv",
         "httpx",
+        "numpy",
     ],
 )
@@ -5,7 +5,6 @@ from utils import *
 import pandas as pd
 import os
 import requests
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 import pypdf
 from docx import Document
@@ -48,6 +47,9 @@ st.markdown("""
 
 load_dotenv()
 
+# Préchargement du modèle Ollama en arrière-plan : la première génération ne paie pas le chargement
+ollama_manager.ensure_warm()
+
 default_source_urls = load_default_sources()
 default_keywords = load_default_keywords()
 default_urls_summary = [
@@ -62,6 +64,10 @@ default_urls_corpus = [
 
 st.title("Automatisation de la veille")
 
+with st.sidebar.expander("Performances du modèle"):
+    st.caption(f"Modèle : {OLLAMA_MODEL} — keep_alive : {ollama_manager.keep_alive()}")
+    st.json(ollama_manager.summary())
+
 tabs = st.tabs(
     [
         "Ma veille personnalisée",
@@ -119,6 +125,11 @@ with tabs[0]:
     target_press = st.checkbox("Cibler uniquement les articles de presse")
     exclude_jobs = st.checkbox("Exclure les offres d'emploi")
     exclude_training = st.checkbox("Exclure les formations")
+    st.number_input(
+        "Nombre de résultats de recherche par thème",
+        min_value=1, max_value=SEARCH_MAX_RESULTS, value=10, step=10,
+        key="num_articles_keywords",
+    )
 
     # Sauvegarder les paramètres de filtres
     if st.button("Sauvegarder les filtres"):
@@ -138,6 +149,7 @@ with tabs[0]:
 ##################################
 with tabs[1]:
     st.write("### Suggestions d'articles par thèmes personnalisés")
+    st.caption(f"Quota de recherche restant aujourd'hui : {search_quota.remaining()}/{SEARCH_DAILY_QUOTA}")
     keywords = load_default_keywords()
     filters = load_filters()
     time_unit = filters.get("time_unit", "mois")
@@ -156,23 +168,28 @@ with tabs[1]:
             with st.spinner("Recherche des articles en cours..."):
                 urls = []
                 keyword_sources = []
-                for idx, keyword in enumerate(keywords):
-                    keyword_urls = google_search(
-                        query=keyword,
-                        num_results=st.session_state.get("num_articles_keywords", 10),
-                        time_unit=time_unit,
-                        time_value=time_value,
-                        exclude_ads=filters.get("exclude_ads", False),
-                        exclude_professional=filters.get("exclude_professional", False),
-                        target_press=filters.get("target_press", False),
-                        exclude_jobs=filters.get("exclude_jobs", False),
-                        exclude_training=filters.get("exclude_training", False),
-                    )
+                # Toutes les recherches partent en parallèle (résultats mis en cache)
+                search_results = google_search_many(
+                    keywords,
+                    num_results=st.session_state.get("num_articles_keywords", 10),
+                    time_unit=time_unit,
+                    time_value=time_value,
+                    exclude_ads=filters.get("exclude_ads", False),
+                    exclude_professional=filters.get("exclude_professional", False),
+                    target_press=filters.get("target_press", False),
+                    exclude_jobs=filters.get("exclude_jobs", False),
+                    exclude_training=filters.get("exclude_training", False),
+                )
+                for keyword, keyword_urls in zip(keywords, search_results):
                     urls.extend(keyword_urls)
                     keyword_sources.extend([keyword] * len(keyword_urls))
-                    progress_value = min((idx + 1) / len(keywords), 1.0)
-                    progress_bar.progress(progress_value)
-                    status_text.text(f"Recherche en cours... {idx + 1}/{len(keywords)}")
+                progress_bar.progress(1.0)
+                status_text.text(f"Recherche en cours... {len(keywords)}/{len(keywords)}")
+
+                # Une même page peut revenir sous plusieurs URLs (suivi, AMP, http/https)
+                kept = unique_url_indices(urls)
+                urls = [urls[i] for i in kept]
+                keyword_sources = [keyword_sources[i] for i in kept]
 
                 if urls:
                     st.session_state["proposed_urls"] = urls
@@ -186,21 +203,35 @@ with tabs[1]:
                 progress_bar = st.progress(0)
                 status_text = st.empty()
                 with st.spinner("Scraping des articles proposés..."):
-                    for idx, url in enumerate(urls):
-                        if len(scraped_data) >= 12:
-                            break
-                        page_data = scrape_page(url)
+                    # Compteurs de progression propres à la session, remis à zéro à chaque traitement
+                    st.session_state["scraped_count"] = 0
+
+                    def on_scraped(idx, url, page_data):
+                        st.session_state["scraped_count"] += 1
+                        scraped_count = st.session_state["scraped_count"]
+                        if not page_data:
+                            st.warning(f"Échec du scraping pour l'URL : {url}")
+                        progress_value = min(scraped_count / min(len(urls), 12), 1.0)
+                        progress_bar.progress(progress_value)
+                        status_text.text(f"Scraping en cours... {min(scraped_count, 12)}/12")
+
+                    page_keywords = {}
+                    # Les articles hors de la fenêtre de publication sont écartés dès le scraping
+                    pages = scrape_pages(
+                        urls, max_pages=12, on_result=on_scraped,
+                        published_after=publication_window_start(time_unit, time_value),
+                    )
+                    for keyword, page_data in zip(keyword_sources, pages):
                         if page_data:
                             save_page_to_mongodb(page_data)
                             scraped_data.append(page_data)
-                        else:
-                            st.warning(f"Échec du scraping pour l'URL : {url}")
-                        progress_value = min((idx + 1) / min(len(urls), 12), 1.0)
-                        progress_bar.progress(progress_value)
-                        status_text.text(f"Scraping en cours... {min(idx + 1, 12)}/12")
+                            page_keywords[page_data.link] = keyword
 
+                    # Une seule page par groupe de quasi-doublons (reprises de dépêches)
+                    scraped_data = deduplicate_pages(scraped_data)
                     if scraped_data:
                         st.session_state["scraped_data"] = scraped_data
+                        st.session_state["keyword_sources"] = [page_keywords[page.link] for page in scraped_data]
                         st.success("Scraping des articles terminé avec succès.")
                     else:
                         st.error("Échec du scraping pour tous les articles.")
@@ -211,21 +242,34 @@ with tabs[1]:
                 status_text = st.empty()
                 with st.spinner("Génération des résumés en cours..."):
                     summaries = []
-                    for idx, (page, keyword) in enumerate(zip(st.session_state["scraped_data"], st.session_state["keyword_sources"])):
-                        summary = generate_summary(
-                            article_text=page.content,
-                            system_prompt="""Role: Vous êtes un rédacteur expert en création de résumés d’articles clairs, informatifs et impartiaux.
-                                            Votre objectif est de rédiger des résumés précis et concis qui permettent aux lecteurs de comprendre rapidement les points essentiels de l’article.
-                                            Ces résumés doivent présenter les informations principales, les points clés et les conclusions importantes de manière neutre et fidèle au contenu de l’article, sans introduire d’éléments promotionnels, de suspense ou de langage intrigant.
-                                            Adoptez un ton clair, adapté au sujet et accessible à un large public.
-                                            Assurez-vous que le résumé est organisé de façon logique et structurée.""",
-                            user_prompt=f"""Voici le contenu d’un article que je souhaite résumer :\n{page.content}
-                                            Rédigez un résumé clair, concis et informatif de cet article. Mettez en avant les informations principales, les points clés et les conclusions importantes en vous assurant que :
-                                            - Le ton est strictement neutre et descriptif.
-                                            - La présentation est structurée et factuelle.
-                                            - Le texte reste accessible et compréhensible.
-                                            Ajoutez des émojis pertinents pour améliorer la lisibilité et rendre le résumé plus engageant, sans compromettre la neutralité du contenu. Limitez-vous à un maximum de 150 mots.""",
+                    scraped_pages = st.session_state["scraped_data"]
+                    st.session_state["summary_count"] = 0
+
+                    def on_summary(idx, summary):
+                        st.session_state["summary_count"] += 1
+                        summary_count = st.session_state["summary_count"]
+                        progress_bar.progress(min(summary_count / len(scraped_pages), 1.0))
+                        status_text.text(f"Génération des résumés en cours... {summary_count}/{len(scraped_pages)}")
+
+                    prompts = [
+                        (
+                            """Role: Vous êtes un rédacteur expert en création de résumés d’articles clairs, informatifs et impartiaux.
+                           Votre objectif est de rédiger des résumés précis et concis qui permettent aux lecteurs de comprendre rapidement les points essentiels de l’article.
+                           Ces résumés doivent présenter les informations principales, les points clés et les conclusions importantes de manière neutre et fidèle au contenu de l’article, sans introduire d’éléments promotionnels, de suspense ou de langage intrigant.
+                           Adoptez un ton clair, adapté au sujet et accessible à un large public.
+                           Assurez-vous que le résumé est organisé de façon logique et structurée.""",
+                            f"""Voici le contenu d’un article que je souhaite résumer :\n{page.content}
+                            Rédigez un résumé clair, concis et informatif de cet article. Mettez en avant les informations principales, les points clés et les conclusions importantes en vous assurant que :
+                            - Le ton est strictement neutre et descriptif.
+                            - La présentation est structurée et factuelle.
+                            - Le texte reste accessible et compréhensible.
+                            Ajoutez des émojis pertinents pour améliorer la lisibilité et rendre le résumé plus engageant, sans compromettre la neutralité du contenu. Limitez-vous à un maximum de 150 mots.""",
                         )
+                        for page in scraped_pages
+                    ]
+                    # Les résumés sont générés en parallèle (SUMMARY_CONCURRENCY requêtes Ollama à la fois)
+                    summary_texts = generate_summaries(scraped_pages, prompts, on_result=on_summary)
+                    for page, keyword, summary in zip(scraped_pages, st.session_state["keyword_sources"], summary_texts):
                         summaries.append(
                             {
                                 "title": page.title,
@@ -233,11 +277,9 @@ with tabs[1]:
                                 "summary": summary,
                                 "image_url": page.image_url,
                                 "keyword_source": keyword,
+                                "alternate_links": page.alternate_links,
                             }
                         )
-                        progress_value = min((idx + 1) / len(st.session_state["scraped_data"]), 1.0)
-                        progress_bar.progress(progress_value)
-                        status_text.text(f"Génération des résumés en cours... {idx + 1}/{len(st.session_state['scraped_data'])}")
 
                     if summaries:
                         st.session_state["summaries"] = summaries
@@ -248,6 +290,7 @@ with tabs[1]:
 
     if "summaries" in st.session_state:
         summaries = st.session_state["summaries"]
+        valid_images = validate_image_urls([summary.get("image_url") for summary in summaries])
         st.write("### Articles proposés :")
         for i in range(0, len(summaries), 3):
             cols = st.columns(3)
@@ -262,7 +305,7 @@ with tabs[1]:
                         )
                         keyword_source = summary.get("keyword_source", "Source inconnue")
                         st.write(f"**Mot-clé source :** {keyword_source}")
-                        if "image_url" in summary and summary["image_url"] and is_valid_image_url(summary["image_url"]):
+                        if valid_images.get(summary.get("image_url")):
                             st.markdown(
                                 f"<a href='{link}'><img src='{summary['image_url']}' style='width:100%;'></a>",
                                 unsafe_allow_html=True,
@@ -275,6 +318,10 @@ with tabs[1]:
                                 f"Pour en savoir plus, consultez l'article : [Article]({link})",
                                 unsafe_allow_html=True,
                             )
+                        if summary.get("alternate_links"):
+                            st.caption("Également publié sur : " + ", ".join(
+                                f"[{urlparse(alternate).netloc}]({alternate})" for alternate in summary["alternate_links"]
+                            ))
 
                         # Boutons de feedback -> MySQL
                         if st.button("👍", key=f"like_{i + j}"):
@@ -316,6 +363,7 @@ with tabs[1]:
             st.success("Chargement des résultats précédents.")
             if "summaries" in st.session_state:
                 new_summaries = st.session_state["summaries"]
+                valid_images = validate_image_urls([summary.get("image_url") for summary in new_summaries])
                 st.write("### Articles proposés pour la nouvelle recherche :")
                 for i in range(0, len(new_summaries), 3):
                     cols = st.columns(3)
@@ -329,7 +377,7 @@ with tabs[1]:
                                 )
                                 keyword_source = summary.get("keyword_source", "Source inconnue")
                                 st.write(f"**Mot-clé source :** {keyword_source}")
-                                if "image_url" in summary and summary["image_url"] and is_valid_image_url(summary["image_url"]):
+                                if valid_images.get(summary.get("image_url")):
                                     st.markdown(
                                         f"<a href='{summary['url']}'><img src='{summary['image_url']}' style='width:100%;'></a>",
                                         unsafe_allow_html=True,
@@ -342,6 +390,10 @@ with tabs[1]:
                                         f"Pour en savoir plus, consultez l'article : [Article]({summary['url']})",
                                         unsafe_allow_html=True,
                                     )
+                                if summary.get("alternate_links"):
+                                    st.caption("Également publié sur : " + ", ".join(
+                                        f"[{urlparse(alternate).netloc}]({alternate})" for alternate in summary["alternate_links"]
+                                    ))
                                 # Boutons de feedback -> MySQL
                                 if st.button("👍", key=f"new_like_{i + j}"):
                                     save_feedback_to_mysql({
@@ -374,23 +426,28 @@ with tabs[1]:
                 with st.spinner("Recherche des articles en cours..."):
                     new_urls = []
                     new_keyword_sources = []
-                    for idx, keyword in enumerate(new_keywords):
-                        keyword_urls = google_search(
-                            query=keyword,
-                            num_results=st.session_state.get("num_articles_keywords", 10),
-                            time_unit=new_time_unit,
-                            time_value=new_time_value,
-                            exclude_ads=filters.get("exclude_ads", False),
-                            exclude_professional=filters.get("exclude_professional", False),
-                            target_press=filters.get("target_press", False),
-                            exclude_jobs=filters.get("exclude_jobs", False),
-                            exclude_training=filters.get("exclude_training", False),
-                        )
+                    # Toutes les recherches partent en parallèle (résultats mis en cache)
+                    search_results = google_search_many(
+                        new_keywords,
+                        num_results=st.session_state.get("num_articles_keywords", 10),
+                        time_unit=new_time_unit,
+                        time_value=new_time_value,
+                        exclude_ads=filters.get("exclude_ads", False),
+                        exclude_professional=filters.get("exclude_professional", False),
+                        target_press=filters.get("target_press", False),
+                        exclude_jobs=filters.get("exclude_jobs", False),
+                        exclude_training=filters.get("exclude_training", False),
+                    )
+                    for keyword, keyword_urls in zip(new_keywords, search_results):
                         new_urls.extend(keyword_urls)
                         new_keyword_sources.extend([keyword] * len(keyword_urls))
-                        progress_value = min((idx + 1) / len(new_keywords), 1.0)
-                        progress_bar.progress(progress_value)
-                        status_text.text(f"Recherche en cours... {idx + 1}/{len(new_keywords)}")
+                    progress_bar.progress(1.0)
+                    status_text.text(f"Recherche en cours... {len(new_keywords)}/{len(new_keywords)}")
+
+                    # Une même page peut revenir sous plusieurs URLs (suivi, AMP, http/https)
+                    kept = unique_url_indices(new_urls)
+                    new_urls = [new_urls[i] for i in kept]
+                    new_keyword_sources = [new_keyword_sources[i] for i in kept]
 
                     if new_urls:
                         st.session_state["proposed_urls"] = new_urls
@@ -404,21 +461,34 @@ with tabs[1]:
                     progress_bar = st.progress(0)
                     status_text = st.empty()
                     with st.spinner("Scraping des articles proposés..."):
-                        for idx, url in enumerate(new_urls):
-                            if len(new_scraped_data) >= 12:
-                                break
-                            page_data = scrape_page(url)
+                        st.session_state["scraped_count"] = 0
+
+                        def on_scraped(idx, url, page_data):
+                            st.session_state["scraped_count"] += 1
+                            scraped_count = st.session_state["scraped_count"]
+                            if not page_data:
+                                st.warning(f"Échec du scraping pour l'URL : {url}")
+                            progress_value = min(scraped_count / min(len(new_urls), 12), 1.0)
+                            progress_bar.progress(progress_value)
+                            status_text.text(f"Scraping en cours... {min(scraped_count, 12)}/12")
+
+                        page_keywords = {}
+                        # Les articles hors de la fenêtre de publication sont écartés dès le scraping
+                        pages = scrape_pages(
+                            new_urls, max_pages=12, on_result=on_scraped,
+                            published_after=publication_window_start(new_time_unit, new_time_value),
+                        )
+                        for keyword, page_data in zip(new_keyword_sources, pages):
                             if page_data:
                                 save_page_to_mongodb(page_data)
                                 new_scraped_data.append(page_data)
-                            else:
-                                st.warning(f"Échec du scraping pour l'URL : {url}")
-                            progress_value = min((idx + 1) / min(len(new_urls), 12), 1.0)
-                            progress_bar.progress(progress_value)
-                            status_text.text(f"Scraping en cours... {min(idx + 1, 12)}/12")
+                                page_keywords[page_data.link] = keyword
 
+                        # Une seule page par groupe de quasi-doublons (reprises de dépêches)
+                        new_scraped_data = deduplicate_pages(new_scraped_data)
                         if new_scraped_data:
                             st.session_state["scraped_data"] = new_scraped_data
+                            st.session_state["keyword_sources"] = [page_keywords[page.link] for page in new_scraped_data]
                             st.success("Scraping des articles terminé avec succès.")
                         else:
                             st.error("Échec du scraping pour tous les articles.")
@@ -429,21 +499,34 @@ with tabs[1]:
                     status_text = st.empty()
                     with st.spinner("Génération des résumés en cours..."):
                         new_summaries = []
-                        for idx, (page, keyword) in enumerate(zip(st.session_state["scraped_data"], st.session_state["keyword_sources"])):
-                            new_summary = generate_summary(
-                                article_text=page.content,
-                                system_prompt="""Role: Vous êtes un rédacteur expert en création de résumés d’articles clairs, informatifs et impartiaux.
-                                                Votre objectif est de rédiger des résumés précis et concis qui permettent aux lecteurs de comprendre rapidement les points essentiels de l’article.
-                                                Ces résumés doivent présenter les informations principales, les points clés et les conclusions importantes de manière neutre et fidèle au contenu de l’article, sans introduire d’éléments promotionnels, de suspense ou de langage intrigant.
-                                                Adoptez un ton clair, adapté au sujet et accessible à un large public.
-                                                Assurez-vous que le résumé est organisé de façon logique et structurée.""",
-                                user_prompt=f"""Voici le contenu d’un article que je souhaite résumer :\n{page.content}
-                                                Rédigez un résumé clair, concis et informatif de cet article. Mettez en avant les informations principales, les points clés et les conclusions importantes en vous assurant que :
-                                                - Le ton est strictement neutre et descriptif.
-                                                - La présentation est structurée et factuelle.
-                                                - Le texte reste accessible et compréhensible.
-                                                Ajoutez des émojis pertinents pour améliorer la lisibilité et rendre le résumé plus engageant, sans compromettre la neutralité du contenu. Limitez-vous à un maximum de 150 mots.""",
+                        scraped_pages = st.session_state["scraped_data"]
+                        st.session_state["summary_count"] = 0
+
+                        def on_summary(idx, summary):
+                            st.session_state["summary_count"] += 1
+                            summary_count = st.session_state["summary_count"]
+                            progress_bar.progress(min(summary_count / len(scraped_pages), 1.0))
+                            status_text.text(f"Génération des résumés en cours... {summary_count}/{len(scraped_pages)}")
+
+                        prompts = [
+                            (
+                                """Role: Vous êtes un rédacteur expert en création de résumés d’articles clairs, informatifs et impartiaux.
+                               Votre objectif est de rédiger des résumés précis et concis qui permettent aux lecteurs de comprendre rapidement les points essentiels de l’article.
+                               Ces résumés doivent présenter les informations principales, les points clés et les conclusions importantes de manière neutre et fidèle au contenu de l’article, sans introduire d’éléments promotionnels, de suspense ou de langage intrigant.
+                               Adoptez un ton clair, adapté au sujet et accessible à un large public.
+                               Assurez-vous que le résumé est organisé de façon logique et structurée.""",
+                                f"""Voici le contenu d’un article que je souhaite résumer :\n{page.content}
+                                Rédigez un résumé clair, concis et informatif de cet article. Mettez en avant les informations principales, les points clés et les conclusions importantes en vous assurant que :
+                                - Le ton est strictement neutre et descriptif.
+                                - La présentation est structurée et factuelle.
+                                - Le texte reste accessible et compréhensible.
+                                Ajoutez des émojis pertinents pour améliorer la lisibilité et rendre le résumé plus engageant, sans compromettre la neutralité du contenu. Limitez-vous à un maximum de 150 mots.""",
                             )
+                            for page in scraped_pages
+                        ]
+                        # Les résumés sont générés en parallèle (SUMMARY_CONCURRENCY requêtes Ollama à la fois)
+                        summary_texts = generate_summaries(scraped_pages, prompts, on_result=on_summary)
+                        for page, keyword, new_summary in zip(scraped_pages, st.session_state["keyword_sources"], summary_texts):
                             new_summaries.append(
                                 {
                                     "title": page.title,
@@ -451,11 +534,9 @@ with tabs[1]:
                                     "summary": new_summary,
                                     "image_url": page.image_url,
                                     "keyword_source": keyword,
+                                    "alternate_links": page.alternate_links,
                                 }
                             )
-                            progress_value = min((idx + 1) / len(st.session_state["scraped_data"]), 1.0)
-                            progress_bar.progress(progress_value)
-                            status_text.text(f"Génération des résumés en cours... {idx + 1}/{len(st.session_state['scraped_data'])}")
 
                         if new_summaries:
                             st.session_state["summaries"] = new_summaries
@@ -474,6 +555,10 @@ with tabs[2]:
     time_unit = filters.get("time_unit", "mois")
     time_value = filters.get("time_value", 1)
     input_data = "\n".join(source_urls) + f"{time_unit}{time_value}"
+    incremental = st.checkbox("Uniquement les articles nouveaux depuis le dernier passage", key="incremental_sources_tab3")
+    if incremental:
+        # Un crawl incrémental par jour : les reruns de la journée rechargent son résultat
+        input_data += f"\nincremental{datetime.now().strftime('%Y-%m-%d')}"
 
     if check_and_load_results(input_data, "summaries"):
         st.success("Chargement des résultats précédents.")
@@ -484,27 +569,43 @@ with tabs[2]:
             progress_bar = st.progress(0)
             status_text = st.empty()
             proposed_urls = []
+            proposed_sources = {}
             scraped_data = []
             with st.spinner("Scraping des pages sources en cours..."):
-                for idx, url in enumerate(source_urls):
+                valid_source_urls = []
+                for url in source_urls:
                     url = url.strip()
                     if not url or not url.startswith("http"):
                         st.warning(f"URL invalide ou vide : '{url}'")
                         continue
-                    response = requests.get(url)
-                    if response.status_code == 200:
-                        soup = BeautifulSoup(response.content, "lxml")
-                        articles = soup.select("h2.entry-title.ast-blog-single-element a, div.td-module-thumb a, div.tds_module_loop_1 a")
-                        proposed_urls.extend([a["href"] for a in articles[:st.session_state.get("num_articles_sources", 10)]])
-                    else:
+                    valid_source_urls.append(url)
+
+                num_articles_sources = st.session_state.get("num_articles_sources", 10)
+                if incremental:
+                    listings = crawl_sources_incremental(valid_source_urls, limit=num_articles_sources)
+                else:
+                    listings = dict(zip(
+                        valid_source_urls,
+                        run_concurrently(lambda source_url: crawl_source_listing(source_url, num_articles_sources), valid_source_urls),
+                    ))
+                for url, links in listings.items():
+                    if links is None:
                         st.error(f"Échec du scraping pour l'URL : {url}")
-                    progress_value = min((idx + 1) / len(source_urls), 1.0)
-                    progress_bar.progress(progress_value)
-                    status_text.text(f"Scraping des pages sources en cours... {idx + 1}/{len(source_urls)}")
+                        continue
+                    if incremental:
+                        last_run = seen_url_index.last_run(url)
+                        st.info(f"{len(links)} nouvel(s) article(s) pour {url} depuis le dernier passage ({last_run or 'jamais'}).")
+                    for link in links:
+                        proposed_sources.setdefault(link, url)
+                proposed_urls = dedupe_urls(list(proposed_sources))
+                progress_bar.progress(1.0)
+                status_text.text(f"Scraping des pages sources en cours... {len(valid_source_urls)}/{len(valid_source_urls)}")
 
                 if proposed_urls:
                     st.session_state["proposed_urls"] = proposed_urls
                     st.success("Scraping des pages sources terminé avec succès.")
+                elif incremental:
+                    st.info("Aucun nouvel article depuis le dernier passage.")
                 else:
                     st.error("Aucun article proposé trouvé. Veuillez vérifier les URLs sources.")
 
@@ -512,19 +613,32 @@ with tabs[2]:
             progress_bar = st.progress(0)
             status_text = st.empty()
             with st.spinner("Scraping des articles proposés en cours..."):
-                for idx, url in enumerate(proposed_urls):
-                    if len(scraped_data) >= 12:
-                        break
-                    page_data = scrape_page(url)
+                st.session_state["scraped_count"] = 0
+                # URLs traitées, y compris les échecs et les pages écartées (doublons, hors période)
+                handled_urls = []
+
+                def on_scraped(idx, url, page_data):
+                    st.session_state["scraped_count"] += 1
+                    scraped_count = st.session_state["scraped_count"]
+                    handled_urls.append(url)
+                    if not page_data:
+                        st.warning(f"Échec du scraping pour l'URL : {url}")
+                    progress_value = min(scraped_count / min(len(proposed_urls), 12), 1.0)
+                    progress_bar.progress(progress_value)
+                    status_text.text(f"Scraping des articles proposés en cours... {min(scraped_count, 12)}/12")
+
+                for page_data in scrape_pages(
+                    proposed_urls, max_pages=12, on_result=on_scraped,
+                    published_after=publication_window_start(time_unit, time_value),
+                    on_skipped=lambda idx, url: handled_urls.append(url),
+                ):
                     if page_data:
                         save_page_to_mongodb(page_data)
                         scraped_data.append(page_data)
-                    else:
-                        st.warning(f"Échec du scraping pour l'URL : {url}")
-                    progress_value = min((idx + 1) / min(len(proposed_urls), 12), 1.0)
-                    progress_bar.progress(progress_value)
-                    status_text.text(f"Scraping des articles proposés en cours... {min(idx + 1, 12)}/12")
 
+                # Une seule page par groupe de quasi-doublons ; en mode incrémental,
+                # les reprises d'articles déjà archivés sont aussi écartées
+                scraped_data = deduplicate_pages(scraped_data, against_archive=incremental)
                 if scraped_data:
                     st.session_state["scraped_data"] = scraped_data
                     st.success("Scraping des articles proposés terminé avec succès.")
@@ -536,32 +650,42 @@ with tabs[2]:
             status_text = st.empty()
             with st.spinner("Génération des résumés en cours..."):
                 summaries = []
-                for idx, page in enumerate(scraped_data):
-                    summary = generate_summary(
-                        article_text=page.content,
-                        system_prompt="""Role: Vous êtes un rédacteur expert en création de résumés d’articles clairs, informatifs et impartiaux.
-                                        Votre objectif est de rédiger des résumés précis et concis qui permettent aux lecteurs de comprendre rapidement les points essentiels de l’article.
-                                        Ces résumés doivent présenter les informations principales, les points clés et les conclusions importantes de manière neutre et fidèle au contenu de l’article, sans introduire d’éléments promotionnels, de suspense ou de langage intrigant.
-                                        Adoptez un ton clair, adapté au sujet et accessible à un large public.
-                                        Assurez-vous que le résumé est organisé de façon logique et structurée.""",
-                        user_prompt=f"""Voici le contenu d’un article que je souhaite résumer :\n{page.content}
-                                        Rédigez un résumé clair, concis et informatif de cet article. Mettez en avant les informations principales, les points clés et les conclusions importantes en vous assurant que :
-                                        - Le ton est strictement neutre et descriptif.
-                                        - La présentation est structurée et factuelle.
-                                        - Le texte reste accessible et compréhensible.
-                                        Ajoutez des émojis pertinents pour améliorer la lisibilité et rendre le résumé plus engageant, sans compromettre la neutralité du contenu. Limitez-vous à un maximum de 150 mots.""",
+                st.session_state["summary_count"] = 0
+
+                def on_summary(idx, summary):
+                    st.session_state["summary_count"] += 1
+                    summary_count = st.session_state["summary_count"]
+                    progress_bar.progress(min(summary_count / len(scraped_data), 1.0))
+                    status_text.text(f"Génération des résumés en cours... {summary_count}/{len(scraped_data)}")
+
+                prompts = [
+                    (
+                        """Role: Vous êtes un rédacteur expert en création de résumés d’articles clairs, informatifs et impartiaux.
+                       Votre objectif est de rédiger des résumés précis et concis qui permettent aux lecteurs de comprendre rapidement les points essentiels de l’article.
+                       Ces résumés doivent présenter les informations principales, les points clés et les conclusions importantes de manière neutre et fidèle au contenu de l’article, sans introduire d’éléments promotionnels, de suspense ou de langage intrigant.
+                       Adoptez un ton clair, adapté au sujet et accessible à un large public.
+                       Assurez-vous que le résumé est organisé de façon logique et structurée.""",
+                        f"""Voici le contenu d’un article que je souhaite résumer :\n{page.content}
+                        Rédigez un résumé clair, concis et informatif de cet article. Mettez en avant les informations principales, les points clés et les conclusions importantes en vous assurant que :
+                        - Le ton est strictement neutre et descriptif.
+                        - La présentation est structurée et factuelle.
+                        - Le texte reste accessible et compréhensible.
+                        Ajoutez des émojis pertinents pour améliorer la lisibilité et rendre le résumé plus engageant, sans compromettre la neutralité du contenu. Limitez-vous à un maximum de 150 mots.""",
                     )
+                    for page in scraped_data
+                ]
+                # Les résumés sont générés en parallèle (SUMMARY_CONCURRENCY requêtes Ollama à la fois)
+                summary_texts = generate_summaries(scraped_data, prompts, on_result=on_summary)
+                for page, summary in zip(scraped_data, summary_texts):
                     summaries.append(
                         {
                             "title": page.title,
                             "url": page.link,
                             "summary": summary,
                             "image_url": page.image_url,
+                            "alternate_links": page.alternate_links,
                         }
                     )
-                    progress_value = min((idx + 1) / len(scraped_data), 1.0)
-                    progress_bar.progress(progress_value)
-                    status_text.text(f"Génération des résumés en cours... {idx + 1}/{len(scraped_data)}")
 
                 if summaries:
                     st.session_state["summaries"] = summaries
@@ -570,8 +694,19 @@ with tabs[2]:
                 else:
                     st.error("Aucun résumé n'a été généré. Veuillez vérifier les articles.")
 
+                # En mode incrémental, les articles traités ne seront plus proposés, y compris ceux
+                # écartés (hors période, quasi-doublons de l'archive, échecs) et leurs variantes d'URL ;
+                # un crawl complet ne modifie pas l'index des URLs vues
+                if incremental:
+                    handled = {canonicalize_url(url) for url in handled_urls}
+                    handled.update(canonicalize_url(link) for page in scraped_data for link in [page.link] + page.alternate_links)
+                    for source_url, links in listings.items():
+                        if links is not None:
+                            seen_url_index.mark_seen(source_url, [link for link in links if canonicalize_url(link) in handled])
+
     if "summaries" in st.session_state:
         summaries = st.session_state["summaries"]
+        valid_images = validate_image_urls([summary.get("image_url") for summary in summaries])
         st.write("### Articles proposés :")
         for i in range(0, len(summaries), 3):
             cols = st.columns(3)
@@ -584,7 +719,7 @@ with tabs[2]:
                             f"<a href='{link}' style='text-decoration:none; color:inherit;'><h3>{summary['title']}</h3></a>",
                             unsafe_allow_html=True,
                         )
-                        if "image_url" in summary and summary["image_url"] and is_valid_image_url(summary["image_url"]):
+                        if valid_images.get(summary.get("image_url")):
                             st.markdown(
                                 f"<a href='{link}'><img src='{summary['image_url']}' style='width:100%;'></a>",
                                 unsafe_allow_html=True,
@@ -597,6 +732,10 @@ with tabs[2]:
                                 f"Pour en savoir plus, consultez l'article : [Article]({link})",
                                 unsafe_allow_html=True,
                             )
+                        if summary.get("alternate_links"):
+                            st.caption("Également publié sur : " + ", ".join(
+                                f"[{urlparse(alternate).netloc}]({alternate})" for alternate in summary["alternate_links"]
+                            ))
                         # Feedback -> MySQL
                         if st.button("👍", key=f"like_source_{i + j}"):
                             save_feedback_to_mysql({
@@ -634,7 +773,8 @@ with tabs[3]:
         key="urls_input_summary_tab",
     )
     uploaded_files = st.file_uploader("Ou uploader des fichiers PDF ou Word", type=["pdf", "docx"], accept_multiple_files=True, key="file_uploader_summary_tab")
-    urls = [url.strip() for url in urls_input.split("\n") if url.strip()]
+    # Une même page saisie sous plusieurs formes (suivi, AMP, http/https) n'est traitée qu'une fois
+    urls = dedupe_urls([url.strip() for url in urls_input.split("\n") if url.strip()])
 
     if st.button("Générer le(s) résumé(s)", key="generate_summaries_button"):
         input_data = "\n".join(urls)
@@ -647,11 +787,20 @@ with tabs[3]:
                 progress_bar = st.progress(0)
                 status_text = st.empty()
                 summaries = []
+                # Documents à résumer : (titre, lien, contenu, libellé pour les messages d'erreur)
+                documents = []
+                prompts = []
 
                 # Scraping des URLs
-                for idx, url in enumerate(urls):
+                duplicate_urls = []
+                with st.spinner("Scraping des articles en cours..."):
+                    # Les doublons révélés au téléchargement (redirection, rel=canonical) restent à None
+                    pages_data = scrape_pages(urls, on_skipped=lambda idx, url: duplicate_urls.append(url))
+                for url, page_data in zip(urls, pages_data):
                     try:
-                        page_data = scrape_page(url)
+                        if url in duplicate_urls:
+                            st.info(f"Doublon d'un autre article ignoré : {url}")
+                            continue
                         if not page_data:
                             st.warning(f"Échec du scraping pour l'URL : {url}")
                             continue
@@ -664,36 +813,14 @@ with tabs[3]:
                         user_prompt = f"Résumez l'article suivant en respectant les consignes données :\n {page_data.content}"
                         st.session_state["system_prompt"] = system_prompt
                         st.session_state["user_prompt"] = user_prompt
-
-                        with st.spinner(f"Génération du résumé pour {url}..."):
-                            summary = generate_summary(
-                                article_text=page_data.content,
-                                system_prompt=system_prompt,
-                                user_prompt=user_prompt,
-                            )
-
-                        if not summary or "Erreur" in summary:
-                            st.error(f"Erreur lors de la génération du résumé pour l'URL : {url}")
-                            continue
-
-                        summaries.append(
-                            {
-                                "title": page_data.title,
-                                "link": url,
-                                "summary": summary,
-                                "content": page_data.content,
-                            }
-                        )
-                        st.success(f"Résumé généré pour : {page_data.title}")
-                        progress_value = min((idx + 1) / len(urls), 1.0)
-                        progress_bar.progress(progress_value)
-                        status_text.text(f"Génération des résumés en cours... {idx + 1}/{len(urls)}")
+                        documents.append((page_data.title, url, page_data.content, f"l'URL : {url}"))
+                        prompts.append((system_prompt, user_prompt))
 
                     except Exception as e:
                         st.error(f"Erreur inattendue pour l'URL {url} : {str(e)}")
 
-                # Scraping des fichiers uploadés
-                for idx, uploaded_file in enumerate(uploaded_files):
+                # Lecture des fichiers uploadés
+                for uploaded_file in uploaded_files:
                     try:
                         if uploaded_file.name.endswith(".pdf"):
                             reader = PdfReader(uploaded_file)
@@ -710,32 +837,38 @@ with tabs[3]:
                         user_prompt = f"Résumez l'article suivant en respectant les consignes données :\n {content}"
                         st.session_state["system_prompt"] = system_prompt
                         st.session_state["user_prompt"] = user_prompt
-                        with st.spinner(f"Génération du résumé pour {uploaded_file.name}..."):
-                            summary = generate_summary(
-                                article_text=content,
-                                system_prompt=system_prompt,
-                                user_prompt=user_prompt,
-                            )
-                        if not summary or "Erreur" in summary:
-                            st.error(f"Erreur lors de la génération du résumé pour le fichier : {uploaded_file.name}")
-                            continue
-
-                        summaries.append(
-                            {
-                                "title": uploaded_file.name,
-                                "link": "#",
-                                "summary": summary,
-                                "content": content,
-                            }
-                        )
-                        st.success(f"Résumé généré pour : {uploaded_file.name}")
-                        progress_value = min((idx + len(urls) + 1) / (len(urls) + len(uploaded_files)), 1.0)
-                        progress_bar.progress(progress_value)
-                        status_text.text(f"Génération des résumés en cours... {idx + len(urls) + 1}/{len(urls) + len(uploaded_files)}")
+                        documents.append((uploaded_file.name, "#", content, f"le fichier : {uploaded_file.name}"))
+                        prompts.append((system_prompt, user_prompt))
 
                     except Exception as e:
                         st.error(f"Erreur inattendue pour le fichier {uploaded_file.name} : {str(e)}")
 
+                # Génération des résumés en parallèle (SUMMARY_CONCURRENCY requêtes Ollama à la fois)
+                st.session_state["summary_count"] = 0
+
+                def on_summary(idx, summary):
+                    st.session_state["summary_count"] += 1
+                    summary_count = st.session_state["summary_count"]
+                    progress_bar.progress(min(summary_count / len(documents), 1.0))
+                    status_text.text(f"Génération des résumés en cours... {summary_count}/{len(documents)}")
+
+                with st.spinner("Génération des résumés en cours..."):
+                    summary_texts = generate_summaries([content for _, _, content, _ in documents], prompts, on_result=on_summary)
+                for (title, link, content, label), summary in zip(documents, summary_texts):
+                    if not summary or "Erreur" in summary:
+                        st.error(f"Erreur lors de la génération du résumé pour {label}")
+                        continue
+
+                    summaries.append(
+                        {
+                            "title": title,
+                            "link": link,
+                            "summary": summary,
+                            "content": content,
+                        }
+                    )
+                    st.success(f"Résumé généré pour : {title}")
+
                 if summaries:
                     st.session_state["summaries"] = summaries
                     st.success("Génération des résumés terminée avec succès.")
@@ -790,7 +923,8 @@ with tabs[4]:
     )
     uploaded_files = st.file_uploader("Ou uploader des fichiers PDF ou Word", type=["pdf", "docx"], accept_multiple_files=True, key="file_uploader_corpus_tab")
 
-    urls = [url.strip() for url in urls_input.split("\n") if url.strip()]
+    # Une même page saisie sous plusieurs formes (suivi, AMP, http/https) n'est traitée qu'une fois
+    urls = dedupe_urls([url.strip() for url in urls_input.split("\n") if url.strip()])
     if st.button("Générer la synthèse de corpus"):
         input_data = "\n".join(urls)
         if check_and_load_results(input_data, "synthesis"):
@@ -803,19 +937,24 @@ with tabs[4]:
             scraped_data = []
 
             # Scraping des URLs
-            for idx, url in enumerate(urls):
-                page_data = scrape_page(url)
+            st.session_state["scraped_count"] = 0
+
+            def on_scraped(idx, url, page_data):
+                st.session_state["scraped_count"] += 1
+                scraped_count = st.session_state["scraped_count"]
+                if not page_data:
+                    st.warning(f"Échec du scraping pour l'URL : {url}")
+                progress_value = min(scraped_count / len(urls), 1.0)
+                progress_bar.progress(progress_value)
+                status_text.text(f"Scraping des articles en cours... {scraped_count}/{len(urls)}")
+
+            for page_data in scrape_pages(urls, on_result=on_scraped):
                 if page_data:
                     save_page_to_mongodb(page_data)
                     scraped_data.append(page_data)
-                else:
-                    st.warning(f"Échec du scraping pour l'URL : {url}")
-                progress_value = min((idx + 1) / len(urls), 1.0)
-                progress_bar.progress(progress_value)
-                status_text.text(f"Scraping des articles en cours... {idx + 1}/{len(urls)}")
 
             # Scraping des fichiers
-            for uploaded_file in uploaded_files:
+            for idx, uploaded_file in enumerate(uploaded_files):
                 try:
                     if uploaded_file.name.endswith(".pdf"):
                         reader = PdfReader(uploaded_file)
@@ -846,30 +985,32 @@ with tabs[4]:
             if not scraped_data:
                 st.error("Aucun article n'a été scrappé. Veuillez vérifier les URLs fournies.")
             else:
-                concatenated_content = "\n\n".join(
-                    f"### {page.title}\nURL : {page.link}\n{page.content}"
-                    for page in scraped_data
-                )
+                # Au-delà du contexte du modèle, les articles sont résumés puis fusionnés (map-reduce)
+                def on_synthesis_progress(stage, done, total):
+                    progress_bar.progress(min(done / total, 1.0))
+                    status_text.text(f"{stage}... {done}/{total}")
+
+                with st.spinner("Préparation du corpus..."):
+                    concatenated_content = corpus_synthesis_context(scraped_data, on_progress=on_synthesis_progress)
                 with st.spinner("Génération de la synthèse..."):
                     try:
                         system_prompt = """Vous êtes un expert en veille stratégique. Votre tâche est de créer une synthèse concise et engageante des articles suivants. 
                         1. Commencez par une vue d'ensemble des grandes tendances observées.
                         2. Pour chaque article, identifiez les points clés et les innovations notables.
                         3. Concluez avec une analyse des implications globales."""
-                        user_prompt = f"""Veuillez générer une synthèse stratégique des articles suivants en suivant ces consignes :
-                        {concatenated_content}"""
-                        synthesis = generate_summary(
+                        user_prompt = "Veuillez générer une synthèse stratégique des articles suivants en suivant ces consignes :"
+                        # La synthèse s'affiche au fil de la génération
+                        st.write("### Synthèse du corpus")
+                        synthesis = st.write_stream(stream_summary(
                             article_text=concatenated_content,
                             system_prompt=system_prompt,
                             user_prompt=user_prompt,
-                        )
+                        ))
 
                         if "Erreur" in synthesis:
                             st.error(synthesis)
                         else:
                             st.success("Synthèse générée avec succès !")
-                            st.write("### Synthèse du corpus")
-                            st.write(synthesis)
                             st.session_state["synthesis"] = synthesis
                             file = create_file(
                                 summary=synthesis,
@@ -935,6 +1076,19 @@ with tabs[5]:
     st.write("### Chabot Q/A")
     st.write("Chargez des articles via des URLs, des fichiers PDF ou Word, et posez vos questions.")
 
+    # Recherche plein texte dans les pages déjà archivées (index BM25 de l'API)
+    with st.expander("Déjà vu dans l'archive ?"):
+        archive_query = st.text_input("Rechercher dans les articles archivés", key="archive_query_qa_tab")
+        if archive_query:
+            archive_results = search_archive(archive_query, k=10)
+            if not archive_results:
+                st.info("Aucun article archivé ne correspond à cette recherche.")
+            for result in archive_results:
+                date_label = f" ({result['date'][:10]})" if result.get("date") else ""
+                st.markdown(f"- [{result['title'] or result['url']}]({result['url']}){date_label}")
+            if archive_results:
+                st.caption("Copiez les URLs utiles dans le champ ci-dessous pour interroger ces articles.")
+
     # Chargement des articles
     urls_input = st.text_area(
         "Entrez les URLs des articles, une par ligne",
@@ -943,7 +1097,8 @@ with tabs[5]:
     )
     uploaded_files = st.file_uploader("Ou uploader des fichiers PDF ou Word", type=["pdf", "docx"], accept_multiple_files=True, key="file_uploader_qa_tab_unique")
 
-    urls = [url.strip() for url in urls_input.split("\n") if url.strip()]
+    # Une même page saisie sous plusieurs formes (suivi, AMP, http/https) n'est traitée qu'une fois
+    urls = dedupe_urls([url.strip() for url in urls_input.split("\n") if url.strip()])
 
     if st.button("Charger les articles", key="load_articles_button_unique"):
         scraped_data = []
@@ -951,16 +1106,21 @@ with tabs[5]:
             progress_bar = st.progress(0)
             status_text = st.empty()
             with st.spinner("Chargement des articles en cours..."):
-                for idx, url in enumerate(urls):
-                    page_data = scrape_page(url)
+                st.session_state["scraped_count"] = 0
+
+                def on_scraped(idx, url, page_data):
+                    st.session_state["scraped_count"] += 1
+                    scraped_count = st.session_state["scraped_count"]
+                    if not page_data:
+                        st.warning(f"Échec du scraping pour l'URL : {url}")
+                    progress_value = min(scraped_count / len(urls), 1.0)
+                    progress_bar.progress(progress_value)
+                    status_text.text(f"Chargement des articles en cours... {scraped_count}/{len(urls)}")
+
+                for page_data in scrape_pages(urls, on_result=on_scraped):
                     if page_data:
                         save_page_to_mongodb(page_data)
                         scraped_data.append(page_data)
-                    else:
-                        st.warning(f"Échec du scraping pour l'URL : {url}")
-                    progress_value = min((idx + 1) / len(urls), 1.0)
-                    progress_bar.progress(progress_value)
-                    status_text.text(f"Chargement des articles en cours... {idx + 1}/{len(urls)}")
 
         if uploaded_files:
             progress_bar = st.progress(0)
@@ -997,6 +1157,15 @@ with tabs[5]:
 
         if scraped_data:
             st.session_state["scraped_data"] = scraped_data
+            # Les articles sont découpés et embarqués une seule fois, au chargement
+            st.session_state.pop("qa_index", None)
+            with st.spinner("Indexation des articles..."):
+                try:
+                    qa_index = ChunkIndex()
+                    qa_index.add_pages(scraped_data)
+                    st.session_state["qa_index"] = qa_index
+                except Exception as e:
+                    st.warning(f"Indexation impossible, les questions porteront sur le texte complet : {str(e)}")
             st.success("Articles chargés avec succès.")
         else:
             st.error("Aucun article n'a été chargé. Veuillez vérifier les URLs et les fichiers fournis.")
@@ -1007,12 +1176,25 @@ with tabs[5]:
         user_input = st.text_input("Votre question :", key="user_input_qa_tab_unique")
         if st.button("Envoyer", key="send_button_qa_tab_unique"):
             if user_input:
-                concatenated_content = "\n\n".join(
-                    f"### {page.title}\nURL : {page.link}\n{page.content}"
-                    for page in st.session_state["scraped_data"]
-                )
-                with st.spinner("Génération de la réponse en cours..."):
-                    answer = generate_answer(question=user_input, context=concatenated_content)
+                concatenated_content = None
+                if "qa_index" in st.session_state:
+                    # Seuls les morceaux les plus proches de la question sont transmis au modèle
+                    try:
+                        concatenated_content = st.session_state["qa_index"].context(user_input)
+                    except Exception as e:
+                        st.warning(f"Recherche des passages impossible, utilisation du texte complet : {str(e)}")
+                if not concatenated_content:
+                    concatenated_content = format_corpus(st.session_state["scraped_data"])
+                # La réponse s'affiche token par token dans la bulle, puis rejoint l'historique
+                live_answer = st.empty()
+                answer = ""
+                with live_answer.container():
+                    st.markdown(f'<div class="user-message">{user_input}</div>', unsafe_allow_html=True)
+                    bot_bubble = st.empty()
+                    for token in stream_answer(question=user_input, context=concatenated_content):
+                        answer += token
+                        bot_bubble.markdown(f'<div class="bot-message">{answer}▌</div>', unsafe_allow_html=True)
+                live_answer.empty()
 
                 if "conversation_history" not in st.session_state:
                     st.session_state["conversation_history"] = []
@@ -2,12 +2,15 @@
 
 import os
 import json
+import hashlib
+import threading
 from typing import Optional, List
 from fastapi import FastAPI, HTTPException, Query, status
 from pydantic import BaseModel
 import pymysql
 from datetime import datetime
 from dotenv import load_dotenv
+from veille_db.app.search_index import BM25Index
 
 load_dotenv()
 
@@ -59,6 +62,16 @@ class CacheItem(BaseModel):
     result_key: str
     data: str  # Le contenu JSON des résumés, par exemple
 
+class SeenUrls(BaseModel):
+    source_url: str
+    urls: List[str]
+
+class IndexedPage(BaseModel):
+    url: str
+    title: str
+    content: str
+    date: Optional[str] = None
+
 ##############
 # Endpoints : Sources
 ##############
@@ -250,6 +263,135 @@ def save_cache_item(item: CacheItem):
         conn.close()
     return {"message": "Cache sauvegardé avec succès."}
 
+##############
+# Endpoints : URLs d'articles déjà vues (crawl incrémental des sources)
+##############
+def seen_url_hash(source_url: str, url: str) -> str:
+    return hashlib.md5(f"{source_url}\n{url}".encode("utf-8")).hexdigest()
+
+@app.get("/seen_urls")
+def get_seen_urls(source_url: str, since: Optional[str] = None):
+    """
+    Liste les URLs vues pour une source, éventuellement depuis une date (synchronisation incrémentale).
+    `synced_at` est l'heure du serveur, à repasser comme `since` à l'appel suivant.
+    """
+    conn = get_mysql_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT NOW() AS now")
+            synced_at = cursor.fetchone()["now"]
+            if since:
+                cursor.execute(
+                    "SELECT url FROM seen_urls WHERE source_url=%s AND first_seen >= %s",
+                    (source_url, since)
+                )
+            else:
+                cursor.execute("SELECT url FROM seen_urls WHERE source_url=%s", (source_url,))
+            rows = cursor.fetchall()
+            return {"urls": [row["url"] for row in rows], "synced_at": synced_at.isoformat(sep=" ")}
+    finally:
+        conn.close()
+
+@app.post("/seen_urls/check")
+def check_seen_urls(item: SeenUrls):
+    """
+    Retourne, parmi les URLs fournies, celles déjà vues pour cette source.
+    """
+    if not item.urls:
+        return {"seen": []}
+    hashes = {seen_url_hash(item.source_url, url): url for url in item.urls}
+    conn = get_mysql_connection()
+    try:
+        with conn.cursor() as cursor:
+            placeholders = ", ".join(["%s"] * len(hashes))
+            cursor.execute(f"SELECT url_hash FROM seen_urls WHERE url_hash IN ({placeholders})", list(hashes))
+            rows = cursor.fetchall()
+            return {"seen": [hashes[row["url_hash"]] for row in rows]}
+    finally:
+        conn.close()
+
+@app.post("/seen_urls")
+def save_seen_urls(item: SeenUrls):
+    """
+    Enregistre des URLs comme traitées pour une source et avance le curseur de dernier passage.
+    """
+    conn = get_mysql_connection()
+    try:
+        with conn.cursor() as cursor:
+            for url in item.urls:
+                cursor.execute("""
+                    INSERT IGNORE INTO seen_urls (url_hash, source_url, url)
+                    VALUES (%s, %s, %s)
+                """, (seen_url_hash(item.source_url, url), item.source_url, url))
+            cursor.execute("""
+                REPLACE INTO crawl_cursors (source_url, last_run) VALUES (%s, NOW())
+            """, (item.source_url,))
+        conn.commit()
+    finally:
+        conn.close()
+    return {"message": "URLs vues sauvegardées avec succès.", "count": len(item.urls)}
+
+@app.get("/crawl_cursor")
+def get_crawl_cursor(source_url: str):
+    """
+    Récupère la date du dernier passage du crawl incrémental pour une source.
+    """
+    conn = get_mysql_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT last_run FROM crawl_cursors WHERE source_url=%s", (source_url,))
+            row = cursor.fetchone()
+            last_run = row["last_run"].isoformat(sep=" ") if row else None
+            return {"source_url": source_url, "last_run": last_run}
+    finally:
+        conn.close()
+
+##############
+# Endpoints : recherche plein texte dans les pages archivées (BM25)
+##############
+_page_index: Optional[BM25Index] = None
+# Les endpoints synchrones tournent dans un pool de threads : chargement, ajouts et écriture sous verrou
+_page_index_lock = threading.Lock()
+# Délai de regroupement des écritures de l'index sur disque
+SEARCH_INDEX_SAVE_DELAY = float(os.getenv("SEARCH_INDEX_SAVE_DELAY", 30))
+
+def get_page_index() -> BM25Index:
+    """
+    Index BM25 des pages, chargé depuis le disque au premier appel.
+    """
+    global _page_index
+    with _page_index_lock:
+        if _page_index is None:
+            _page_index = BM25Index.load()
+        return _page_index
+
+@app.post("/search_index/pages")
+def index_pages(pages: List[IndexedPage]):
+    """
+    Ajoute des pages à l'index (celles déjà indexées sont ignorées). L'écriture sur disque
+    est regroupée (SEARCH_INDEX_SAVE_DELAY) et forcée à l'arrêt de l'API.
+    """
+    index = get_page_index()
+    with _page_index_lock:
+        added = sum(index.add(page.url, page.title, page.content, page.date) for page in pages)
+        if added:
+            index.save_later(SEARCH_INDEX_SAVE_DELAY)
+        total = len(index)
+    return {"added": added, "total": total}
+
+@app.on_event("shutdown")
+def save_page_index():
+    with _page_index_lock:
+        if _page_index is not None and _page_index.dirty:
+            _page_index.save()
+
+@app.get("/search")
+def search_pages(q: str, k: int = Query(10, ge=1, le=100)):
+    """
+    Recherche des pages archivées par BM25 sur le titre et le contenu.
+    """
+    return {"query": q, "results": get_page_index().search(q, k)}
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
\ No newline at end of file
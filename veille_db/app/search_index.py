@@ -0,0 +1,172 @@
+# search_index.py
+#
+# Index plein texte BM25 des pages archivées, servi par l'API (voir /search dans main.py).
+# Les pages sont ajoutées au fil de save_page_to_mongodb ; l'index est persisté sur disque
+# sous forme de tableaux NumPy (listes de postings contiguës), rechargé au démarrage de l'API.
+
+import os
+import re
+import json
+import threading
+import unicodedata
+from array import array
+from typing import Dict, List, Optional
+import numpy as np
+
+SEARCH_INDEX_PATH = os.getenv(
+    "SEARCH_INDEX_PATH",
+    os.path.join(os.getenv("VEILLE_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "veille")), "pages_bm25.npz"),
+)
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Les mots du titre comptent plusieurs fois dans la fréquence des termes
+TITLE_WEIGHT = 3
+
+FRENCH_STOPWORDS = frozenset("""
+a afin ai aie aient ait alors au aucun aupres aussi autre aux avant avec avez avoir avons c ca ce ceci cela celle
+celles celui ces cet cette ceux chaque chez ci comme comment d dans de des deja depuis donc dont du elle elles en
+encore entre es est et etaient etait ete etre eu eux faire fait il ils j je l la le les leur leurs lui m ma mais
+me meme memes mes moi mon n ne ni non nos notre nous on ont ou par parce pas peu peut plus pour pourquoi qu quand
+que quel quelle quelles quels qui s sa sans se sera ses si son sont sous sur t ta te tes toi ton tous tout toute
+toutes tres tu un une unes uns vers vos votre vous y
+""".split())
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+def fold_accents(text: str) -> str:
+    return unicodedata.normalize("NFKD", text.replace("œ", "oe").replace("æ", "ae")).encode("ascii", "ignore").decode("ascii")
+
+def stem(word: str) -> str:
+    """Racinisation légère du français : pluriels et féminins, sans dictionnaire."""
+    if len(word) > 4 and word.endswith("aux"):
+        return word[:-3] + "al"
+    if len(word) > 3 and word[-1] in "sx":
+        word = word[:-1]
+    if len(word) > 4 and word.endswith("e"):
+        word = word[:-1]
+    return word
+
+def tokenize(text: str) -> List[str]:
+    """Minuscules, accents retirés, élisions (l', d', qu'...) et mots vides supprimés, racinisation légère."""
+    words = WORD_RE.findall(fold_accents((text or "").lower()))
+    return [stem(word) for word in words if word not in FRENCH_STOPWORDS and len(word) > 1]
+
+class BM25Index:
+    """
+    Index inversé BM25 sur le titre et le contenu des pages.
+    En mémoire, chaque terme a deux tableaux compacts (identifiants de documents, fréquences) qui
+    grossissent à chaque ajout ; sur disque, toutes les listes sont concaténées dans un seul .npz
+    (vocabulaire, décalages, documents, fréquences, longueurs) avec les métadonnées des pages.
+    Une page déjà indexée (même URL) est ignorée.
+    """
+
+    def __init__(self, path: str = SEARCH_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.postings: Dict[str, tuple] = {}
+        self.doc_lengths = array("I")
+        self.docs: List[dict] = []
+        self.doc_ids: Dict[str, int] = {}
+        self._total_length = 0
+        self.dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, url: str, title: str, content: str, date: Optional[str] = None) -> bool:
+        """Indexe une page ; retourne False si elle l'était déjà."""
+        with self._lock:
+            if url in self.doc_ids:
+                return False
+            doc_id = len(self.docs)
+            counts: Dict[str, int] = {}
+            for token in tokenize(title) * TITLE_WEIGHT + tokenize(content):
+                counts[token] = counts.get(token, 0) + 1
+            for term, count in counts.items():
+                docs, freqs = self.postings.setdefault(term, (array("I"), array("H")))
+                docs.append(doc_id)
+                freqs.append(min(count, 65535))
+            length = sum(counts.values())
+            self.doc_lengths.append(length)
+            self._total_length += length
+            self.docs.append({"url": url, "title": title, "date": date})
+            self.doc_ids[url] = doc_id
+            self.dirty = True
+            return True
+
+    def search(self, query: str, k: int = 10) -> List[dict]:
+        """Les `k` pages les mieux classées par BM25, avec leur score."""
+        with self._lock:
+            if not self.docs:
+                return []
+            lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32).astype(np.float32)
+            # Longueur moyenne nulle si toutes les pages ne contiennent que des mots vides
+            avgdl = max(self._total_length / len(self.docs), 1)
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avgdl)
+            scores = np.zeros(len(self.docs), dtype=np.float32)
+            for term in set(tokenize(query)):
+                if term not in self.postings:
+                    continue
+                docs, freqs = self.postings[term]
+                doc_ids = np.frombuffer(docs, dtype=np.uint32)
+                tf = np.frombuffer(freqs, dtype=np.uint16).astype(np.float32)
+                idf = np.log(1 + (len(self.docs) - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+                scores[doc_ids] += idf * tf * (BM25_K1 + 1) / (tf + norm[doc_ids])
+            matched = np.flatnonzero(scores)
+            top = matched[np.argsort(-scores[matched], kind="stable")[:k]]
+            return [dict(self.docs[i], score=round(float(scores[i]), 4)) for i in top]
+
+    def save(self) -> None:
+        """Écrit l'index (écriture atomique : fichier temporaire puis remplacement)."""
+        with self._lock:
+            terms = sorted(self.postings)
+            sizes = np.fromiter((len(self.postings[term][0]) for term in terms), dtype=np.int64, count=len(terms))
+            offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+            doc_ids = np.concatenate([np.frombuffer(self.postings[t][0], dtype=np.uint32) for t in terms]) if terms else np.zeros(0, np.uint32)
+            freqs = np.concatenate([np.frombuffer(self.postings[t][1], dtype=np.uint16) for t in terms]) if terms else np.zeros(0, np.uint16)
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.tmp.npz"
+            np.savez(
+                tmp_path,
+                vocabulary=np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8),
+                offsets=offsets,
+                doc_ids=doc_ids,
+                freqs=freqs,
+                doc_lengths=np.frombuffer(self.doc_lengths, dtype=np.uint32),
+                docs=np.frombuffer(json.dumps(self.docs, ensure_ascii=False).encode("utf-8"), dtype=np.uint8),
+            )
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+            self._save_timer = None
+
+    def save_later(self, delay: float) -> None:
+        """
+        Persiste au plus une fois par `delay` secondes : les ajouts rapprochés ne réécrivent
+        pas chacun tout le fichier. Appeler save() à l'arrêt pour ne rien perdre.
+        """
+        with self._lock:
+            if self._save_timer is not None or not self.dirty:
+                return
+            self._save_timer = threading.Timer(delay, self.save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    @classmethod
+    def load(cls, path: str = SEARCH_INDEX_PATH) -> "BM25Index":
+        """Recharge l'index persisté ; un index vide si le fichier n'existe pas encore."""
+        index = cls(path)
+        if not os.path.exists(path):
+            return index
+        with np.load(path) as data:
+            vocabulary = data["vocabulary"].tobytes().decode("utf-8")
+            terms = vocabulary.split("\n") if vocabulary else []
+            offsets, doc_ids, freqs = data["offsets"], data["doc_ids"], data["freqs"]
+            for i, term in enumerate(terms):
+                start, end = offsets[i], offsets[i + 1]
+                index.postings[term] = (array("I", doc_ids[start:end].tobytes()), array("H", freqs[start:end].tobytes()))
+            index.doc_lengths = array("I", data["doc_lengths"].tobytes())
+            index.docs = json.loads(data["docs"].tobytes().decode("utf-8"))
+        index.doc_ids = {doc["url"]: i for i, doc in enumerate(index.docs)}
+        index._total_length = int(sum(index.doc_lengths))
+        return index
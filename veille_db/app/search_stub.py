@@ -0,0 +1,112 @@
+# search_stub.py
+#
+# Serveur local imitant l'API Google Custom Search et les sites d'articles qu'elle renvoie,
+# pour tester toute la chaîne (recherche, scraping, résumés) hors ligne et sous charge.
+#
+# python -m uvicorn veille_db.app.search_stub:app --port 8001
+# puis lancer l'application avec GOOGLE_SEARCH_URL=http://localhost:8001/customsearch/v1
+
+import os
+import random
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+from fastapi import FastAPI, Response
+from fastapi.responses import HTMLResponse, JSONResponse
+
+STUB_BASE_URL = os.getenv("STUB_BASE_URL", "http://localhost:8001")
+# Nombre total de résultats par requête (l'API réelle s'arrête à 100)
+STUB_TOTAL_RESULTS = int(os.getenv("STUB_TOTAL_RESULTS", 60))
+# Latence simulée de l'API de recherche et des pages d'articles
+STUB_LATENCY_MS = int(os.getenv("STUB_LATENCY_MS", 200))
+# Quota quotidien simulé (0 : illimité)
+STUB_DAILY_QUOTA = int(os.getenv("STUB_DAILY_QUOTA", 0))
+# Ancienneté maximale des articles générés, en jours (une partie sort de la fenêtre de publication)
+STUB_MAX_AGE_DAYS = int(os.getenv("STUB_MAX_AGE_DAYS", 400))
+
+app = FastAPI()
+
+_queries_per_day = {}
+
+WORDS = (
+    "innovation numérique seniors banque service clientèle projet pilote intelligence artificielle "
+    "générative données santé autonomie territoire collectivité entreprise marché croissance étude "
+    "enquête rapport usagers accompagnement formation emploi transformation plateforme sécurité "
+    "réglementation investissement partenariat recherche développement qualité performance"
+).split()
+
+# Petite image PNG 1x1 pour les vignettes des cartes
+PIXEL_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360f8cf00000301010018dd8db40000000049454e44ae426082"
+)
+
+def article_id(query: str, rank: int) -> str:
+    return hashlib.md5(f"{query.lower()}-{rank}".encode("utf-8")).hexdigest()[:12]
+
+async def simulate_latency():
+    if STUB_LATENCY_MS:
+        await asyncio.sleep(STUB_LATENCY_MS / 1000 * random.uniform(0.5, 1.5))
+
+@app.get("/customsearch/v1")
+async def custom_search(q: str, num: int = 10, start: int = 1):
+    """Même forme de réponse que l'API Custom Search : `items` absent quand il n'y a plus de résultats."""
+    if not 1 <= num <= 10:
+        return JSONResponse(status_code=400, content={"error": {"code": 400, "message": "Invalid Value"}})
+    today = datetime.now().strftime("%Y-%m-%d")
+    _queries_per_day[today] = _queries_per_day.get(today, 0) + 1
+    if STUB_DAILY_QUOTA and _queries_per_day[today] > STUB_DAILY_QUOTA:
+        return JSONResponse(status_code=429, content={"error": {"code": 429, "message": "Quota exceeded"}})
+    await simulate_latency()
+
+    last = min(start + num - 1, STUB_TOTAL_RESULTS, 100)
+    items = []
+    for rank in range(start, last + 1):
+        link = f"{STUB_BASE_URL}/articles/{article_id(q, rank)}"
+        if rank % 7 == 0:
+            # Même article que le résultat précédent, avec un paramètre de suivi (déduplication)
+            link = f"{STUB_BASE_URL}/articles/{article_id(q, rank - 1)}?utm_source=stub"
+        items.append({"title": f"{q} : résultat {rank}", "link": link, "snippet": f"Article de test n°{rank} sur {q}."})
+    response = {"queries": {"request": [{"searchTerms": q, "startIndex": start, "count": len(items)}]}}
+    if items:
+        response["items"] = items
+    return response
+
+@app.get("/articles/{article}", response_class=HTMLResponse)
+async def article_page(article: str):
+    """Page d'article déterministe : titre, date de publication, image, paragraphes et boilerplate."""
+    await simulate_latency()
+    rng = random.Random(article)
+    published = datetime.now() - timedelta(days=rng.randint(0, STUB_MAX_AGE_DAYS))
+    title = " ".join(rng.choice(WORDS) for _ in range(6)).capitalize()
+    paragraphs = "\n".join(
+        f"<p>{' '.join(rng.choice(WORDS) for _ in range(rng.randint(40, 90))).capitalize()}.</p>"
+        for _ in range(rng.randint(4, 10))
+    )
+    return f"""<!DOCTYPE html>
+<html lang="fr"><head>
+<meta charset="utf-8">
+<title>{title}</title>
+<meta name="description" content="{title} : article de test.">
+<meta property="og:image" content="{STUB_BASE_URL}/images/{article}.png">
+<meta property="article:published_time" content="{published.isoformat(timespec='seconds')}">
+<link rel="canonical" href="{STUB_BASE_URL}/articles/{article}">
+</head><body>
+<nav><a href="/">Accueil</a> <a href="/actualites">Actualités</a></nav>
+<article>
+<h1>{title}</h1>
+<span class="author">Rédaction test</span>
+<time datetime="{published.isoformat(timespec='seconds')}">{published:%d/%m/%Y}</time>
+{paragraphs}
+</article>
+<footer><p>Nous utilisons des cookies pour améliorer votre expérience. Tous droits réservés.</p></footer>
+</body></html>"""
+
+@app.api_route("/images/{name}", methods=["GET", "HEAD"])
+async def image(name: str):
+    return Response(content=PIXEL_PNG, media_type="image/png")
+
+@app.get("/stats")
+async def stats():
+    """Nombre de requêtes de recherche reçues par jour (contrôle du quota côté client)."""
+    return _queries_per_day
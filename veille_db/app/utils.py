@@ -1,17 +1,27 @@
 # utils.py
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import os
 import json
 import csv
 import hashlib
 import streamlit as st
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import lxml
-from lxml import html as lxml_html
-from typing import Optional, Any, Dict
+from lxml import etree, html as lxml_html
+from typing import Optional, Any, Dict, List, Callable, Tuple, Iterator
 import logging
+import asyncio
+import sqlite3
+import threading
+import atexit
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import aclosing, contextmanager
 import ollama
 from dateutil import parser
 from reportlab.lib import pagesizes
@@ -22,10 +32,14 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from io import BytesIO
 import re
+import math
+import numpy as np
 import time
 import random
-from urllib.parse import urljoin
-from datetime import datetime, timedelta
+from urllib.parse import urljoin, urlparse, urlsplit, urlunsplit, parse_qsl, urlencode, quote_plus
+from urllib.robotparser import RobotFileParser
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timedelta, timezone
 import pypdf
 from docx import Document
 from sqlalchemy import Column, Integer, String, Text, DateTime
@@ -46,6 +60,89 @@ load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 CSE_ID = os.getenv("CSE_ID")
 
+# API FastAPI de persistance
+API_URL = os.getenv("API_URL", "http://localhost:8000")
+
+# Répertoire des caches et index locaux
+VEILLE_CACHE_DIR = os.getenv("VEILLE_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "veille"))
+
+###############################
+# Session HTTP partagée
+###############################
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 10))
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", 20))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 10))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 2))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", 0.5))
+
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+
+def get_http_session() -> requests.Session:
+    """
+    Session requests unique pour tout le module : connexions keep-alive réutilisées,
+    un pool par hôte (HTTP_POOL_CONNECTIONS hôtes, HTTP_POOL_MAXSIZE connexions chacun)
+    et nouvelles tentatives avec backoff exponentiel sur les erreurs réseau et 5xx.
+    """
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            retry = Retry(
+                total=HTTP_MAX_RETRIES,
+                backoff_factor=HTTP_BACKOFF_FACTOR,
+                # 429 et 503 sont laissés au limiteur de débit par hôte (Retry-After)
+                status_forcelist=(500, 502, 504),
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_CONNECTIONS,
+                pool_maxsize=HTTP_POOL_MAXSIZE,
+                max_retries=retry,
+            )
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _http_session = session
+        return _http_session
+
+def http_request(method: str, url: str, timeout=None, **kwargs) -> requests.Response:
+    """Requête HTTP via la session partagée, avec les timeouts (connexion, lecture) par défaut."""
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    return get_http_session().request(method, url, timeout=timeout, **kwargs)
+
+###############################
+# Stockage local SQLite (caches)
+###############################
+class SqliteStore:
+    """
+    Base des caches persistants sur disque : une base SQLite par cache, créée au premier accès
+    selon `SCHEMA`, une connexion par opération, accès sérialisés par un verrou.
+    """
+    SCHEMA: Tuple[str, ...] = ()
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    @contextmanager
+    def _connection(self):
+        with self._lock:
+            if not self._initialized:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            try:
+                if not self._initialized:
+                    for statement in self.SCHEMA:
+                        conn.execute(statement)
+                    self._initialized = True
+                yield conn
+                conn.commit()
+            finally:
+                conn.close()
+
 ###############################
 # Fonctions MongoDB
 ###############################
@@ -69,6 +166,9 @@ class Page:
     description: Optional[str] = None  # Add this
     author: Optional[str] = None      # Add this 
     image_url: Optional[str] = None   # Add this
+    token_estimate: Optional[int] = None  # Taille estimée du contenu en tokens LLM
+    canonical_url: Optional[str] = None   # URL canonique (redirections, <link rel=canonical>), clé de déduplication
+    alternate_links: List[str] = field(default_factory=list)  # Quasi-doublons regroupés sous cette page
 
 def save_page_to_mongodb(page: Page) -> bool:
     try:
@@ -80,10 +180,19 @@ def save_page_to_mongodb(page: Page) -> bool:
             "link": page.link,
             "content": page.content,
             # Inclusion de 'date' si disponible
-            "date": page.date
+            "date": page.date,
+            "canonical_url": page.canonical_url,
         }
+        # Signature MinHash et clés LSH : détection des quasi-doublons dans toute l'archive
+        signature = minhash_signature(page.content)
+        if signature is not None:
+            ensure_minhash_index(collection)
+            page_dict["minhash"] = signature.tobytes()
+            page_dict["minhash_bands"] = lsh_bands(signature)
+            page_dict["minhash_version"] = MINHASH_VERSION
         collection.insert_one(page_dict)
         client.close()
+        queue_page_for_search(page)
         return True
     except Exception as e:
         print(f"Erreur lors de la sauvegarde MongoDB: {str(e)}")
@@ -144,168 +253,2493 @@ def save_feedback_to_mysql(data):
 ###############################
 # Fonctions Google Search 
 ###############################
-def google_search(query, num_results=10, languages=None, time_unit=None, time_value=None,
-                  exclude_ads=False, exclude_professional=False, target_press=False,
-                  exclude_jobs=False, exclude_training=False):
-    url = f"https://www.googleapis.com/customsearch/v1?q={query}&key={GOOGLE_API_KEY}&cx={CSE_ID}&num={num_results}"
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", os.path.join(VEILLE_CACHE_DIR, "search_cache.sqlite"))
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", 12 * 3600))
+# Les résultats périmés restent disponibles quand le quota du jour est presque épuisé
+SEARCH_CACHE_RETENTION = int(os.getenv("SEARCH_CACHE_RETENTION", 30 * 24 * 3600))
+SEARCH_QUOTA_PATH = os.getenv("SEARCH_QUOTA_PATH", os.path.join(VEILLE_CACHE_DIR, "search_quota.sqlite"))
+SEARCH_DAILY_QUOTA = int(os.getenv("SEARCH_DAILY_QUOTA", 100))
+# Requêtes gardées en réserve : le planificateur ne les consomme pas
+SEARCH_QUOTA_RESERVE = int(os.getenv("SEARCH_QUOTA_RESERVE", 10))
+# Le quota Custom Search est remis à zéro à minuit, heure du Pacifique
+SEARCH_QUOTA_TZ = timezone(timedelta(hours=-8))
+# Remplaçable par le serveur local de test (voir search_stub.py)
+GOOGLE_SEARCH_URL = os.getenv("GOOGLE_SEARCH_URL", "https://www.googleapis.com/customsearch/v1")
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", 8))
+SEARCH_PAGE_SIZE = 10  # maximum de `num` accepté par l'API Custom Search
+SEARCH_MAX_RESULTS = 100  # l'API ne donne pas accès au-delà du 100e résultat
+SEARCH_PAGE_CONCURRENCY = int(os.getenv("SEARCH_PAGE_CONCURRENCY", 3))
+
+class SearchCache(SqliteStore):
+    """
+    Cache persistant des résultats de recherche : clé de requête -> liste d'URLs, valable `ttl` secondes.
+    Les entrées périmées sont conservées `retention` secondes pour les jours de quota épuisé.
+    """
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS search_cache (key TEXT PRIMARY KEY, urls TEXT NOT NULL, fetched_at REAL NOT NULL)",
+    )
+
+    def __init__(self, path: str = SEARCH_CACHE_PATH, ttl: int = SEARCH_CACHE_TTL, retention: int = SEARCH_CACHE_RETENTION):
+        super().__init__(path)
+        self.ttl = ttl
+        self.retention = retention
+
+    def get(self, key: str, allow_stale: bool = False) -> Optional[List[str]]:
+        max_age = self.retention if allow_stale else self.ttl
+        try:
+            with self._connection() as conn:
+                row = conn.execute(
+                    "SELECT urls FROM search_cache WHERE key=? AND fetched_at>?", (key, time.time() - max_age)
+                ).fetchone()
+            return json.loads(row[0]) if row else None
+        except (sqlite3.Error, OSError, ValueError) as e:
+            logging.error(f"Erreur de lecture du cache de recherche : {e}")
+            return None
+
+    def age(self, key: str) -> Optional[float]:
+        """Ancienneté en secondes des derniers résultats de la requête (None si jamais cherchée)."""
+        try:
+            with self._connection() as conn:
+                row = conn.execute("SELECT fetched_at FROM search_cache WHERE key=?", (key,)).fetchone()
+            return time.time() - row[0] if row else None
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"Erreur de lecture du cache de recherche : {e}")
+            return None
+
+    def store(self, key: str, urls: List[str]) -> None:
+        now = time.time()
+        try:
+            with self._connection() as conn:
+                conn.execute("REPLACE INTO search_cache (key, urls, fetched_at) VALUES (?, ?, ?)", (key, json.dumps(urls), now))
+                conn.execute("DELETE FROM search_cache WHERE fetched_at<=?", (now - self.retention,))
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"Erreur d'écriture du cache de recherche : {e}")
+
+    def clear(self) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM search_cache")
+
+search_cache = SearchCache()
+
+class SearchQuota(SqliteStore):
+    """Décompte persistant des requêtes Custom Search de la journée, partagé par tous les onglets."""
+    SCHEMA = ("CREATE TABLE IF NOT EXISTS search_quota (day TEXT PRIMARY KEY, used INTEGER NOT NULL)",)
+
+    def __init__(self, path: str = SEARCH_QUOTA_PATH, daily_quota: int = SEARCH_DAILY_QUOTA):
+        super().__init__(path)
+        self.daily_quota = daily_quota
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(SEARCH_QUOTA_TZ).strftime("%Y-%m-%d")
+
+    def used(self) -> int:
+        try:
+            with self._connection() as conn:
+                row = conn.execute("SELECT used FROM search_quota WHERE day=?", (self._today(),)).fetchone()
+            return row[0] if row else 0
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"Erreur de lecture du quota de recherche : {e}")
+            return 0
+
+    def remaining(self) -> int:
+        return max(0, self.daily_quota - self.used())
+
+    def consume(self) -> bool:
+        """Réserve une requête sur le quota du jour ; False si le quota est épuisé."""
+        try:
+            with self._connection() as conn:
+                conn.execute("INSERT OR IGNORE INTO search_quota (day, used) VALUES (?, 0)", (self._today(),))
+                cursor = conn.execute(
+                    "UPDATE search_quota SET used=used+1 WHERE day=? AND used<?", (self._today(), self.daily_quota)
+                )
+                return cursor.rowcount == 1
+        except (sqlite3.Error, OSError) as e:
+            # Un décompte local illisible ne doit pas bloquer la recherche
+            logging.error(f"Erreur de mise à jour du quota de recherche : {e}")
+            return True
+
+    def exhaust(self) -> None:
+        """Marque le quota du jour comme épuisé (refus de l'API)."""
+        try:
+            with self._connection() as conn:
+                conn.execute("REPLACE INTO search_quota (day, used) VALUES (?, ?)", (self._today(), self.daily_quota))
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"Erreur de mise à jour du quota de recherche : {e}")
+
+search_quota = SearchQuota()
+
+def search_cache_key(query, num_results=10, languages=None, time_unit=None, time_value=None, start=1, **filters) -> str:
+    """Clé de cache d'une recherche : requête normalisée, filtres et fenêtre de dates (au jour près)."""
+    window_start = publication_window_start(time_unit, time_value)
+    key_data = {
+        "cx": CSE_ID,
+        "q": " ".join(query.lower().split()),
+        "num": num_results,
+        "start": start,
+        "lr": sorted(languages or []),
+        "window": window_start.strftime("%Y%m%d") if window_start else None,
+        "filters": sorted(name for name, enabled in filters.items() if enabled),
+    }
+    return get_hash(json.dumps(key_data, sort_keys=True))
+
+def google_search_page(query, start=1, num=10, languages=None, time_unit=None, time_value=None,
+                       filters: Optional[Dict[str, bool]] = None, use_cache=True, cache_only=False) -> List[str]:
+    """
+    Une page de résultats de l'API Custom Search (au plus 10 résultats à partir du rang `start`).
+    Chaque appel à l'API est décompté du quota du jour ; quota épuisé ou `cache_only`,
+    les derniers résultats en cache sont servis, même périmés.
+    """
+    filters = filters or {}
+    cache_key = search_cache_key(query, num, languages, time_unit, time_value, start=start, **filters)
+    if use_cache or cache_only:
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    if cache_only:
+        return search_cache.get(cache_key, allow_stale=True) or []
+    if not search_quota.consume():
+        logging.warning(f"Quota de recherche épuisé, résultats en cache pour '{query}'")
+        return search_cache.get(cache_key, allow_stale=True) or []
+
+    url = f"{GOOGLE_SEARCH_URL}?q={quote_plus(query)}&key={GOOGLE_API_KEY}&cx={CSE_ID}&num={num}"
+    if start > 1:
+        url += f"&start={start}"
     if languages:
         lang_param = " OR ".join([f"lang_{lang}" for lang in languages])
         url += f"&lr={lang_param}"
-    if time_unit and time_value:
-        time_value_days = time_value * 30 if time_unit == "mois" else time_value * 365
+    window_start = publication_window_start(time_unit, time_value)
+    if window_start:
         end_date = datetime.now().strftime("%Y%m%d")
-        start_date = (datetime.now() - timedelta(days=time_value_days)).strftime("%Y%m%d")
+        start_date = window_start.strftime("%Y%m%d")
         url += f"&sort=date:r:{start_date}:{end_date}"
+        # dateRestrict filtre côté Google ; sort=date:r ne s'applique qu'aux pages qui déclarent une date
+        url += f"&dateRestrict=d{(datetime.now() - window_start).days}"
     # Filtres fictifs (à adapter en vrai projet)
-    if exclude_ads:
+    if filters.get("exclude_ads"):
         url += "&filter=0"
-    if exclude_professional:
+    if filters.get("exclude_professional"):
         url += "&filter=1"
-    if target_press:
+    if filters.get("target_press"):
         url += "&filter=2"
-    if exclude_jobs:
+    if filters.get("exclude_jobs"):
         url += "&filter=3"
-    if exclude_training:
+    if filters.get("exclude_training"):
         url += "&filter=4"
 
-    response = requests.get(url)
+    response = http_request("GET", url)
+    if response.status_code in (403, 429):
+        # Quota refusé par l'API (décompte local en retard, autre client sur la même clé...)
+        logging.error(f"Quota Custom Search refusé (HTTP {response.status_code}), résultats en cache pour '{query}'")
+        search_quota.exhaust()
+        return search_cache.get(cache_key, allow_stale=True) or []
     data = response.json()
     urls = [item["link"] for item in data.get("items", [])]
+    # Les réponses en erreur ne sont pas mises en cache
+    if use_cache and response.status_code == 200:
+        search_cache.store(cache_key, urls)
     return urls
 
+async def search_pages(query: str, num_results: int, page_concurrency: int = SEARCH_PAGE_CONCURRENCY, **options) -> List[str]:
+    """
+    Recherche paginée : les pages start=1, 11, 21... partent en parallèle (au plus `page_concurrency`
+    à la fois). Les pages pas encore demandées sont abandonnées dès que les premières pages, dans l'ordre
+    du classement, donnent `num_results` URLs uniques, ou qu'une page incomplète signale la fin des résultats.
+    Les URLs sont fusionnées dans l'ordre du classement, sans doublons (URL canonique).
+    """
+    starts = list(range(1, min(num_results, SEARCH_MAX_RESULTS) + 1, SEARCH_PAGE_SIZE))
+    limit = asyncio.Semaphore(max(1, page_concurrency))
+
+    pages: Dict[int, List[str]] = {}
+    last_start = starts[-1]
+
+    def merged() -> List[str]:
+        # Pages contiguës depuis la première, pour respecter le classement
+        urls: Dict[str, str] = {}
+        for start in starts:
+            if start > last_start or start not in pages:
+                break
+            for url in pages[start]:
+                urls.setdefault(canonicalize_url(url), url)
+        return list(urls.values())
+
+    def finished() -> bool:
+        return len(merged()) >= num_results or all(start in pages for start in starts if start <= last_start)
+
+    async def fetch(start):
+        nonlocal last_start
+        async with limit:
+            # État relu après l'attente : une page devenue inutile n'est pas demandée (quota)
+            if start > last_start or finished():
+                return
+            try:
+                urls = await asyncio.to_thread(google_search_page, query, start, SEARCH_PAGE_SIZE, **options)
+            except (requests.RequestException, ValueError) as e:
+                logging.error(f"Erreur lors de la recherche '{query}' (start={start}) : {e}")
+                urls = []
+            pages[start] = urls
+            if len(urls) < SEARCH_PAGE_SIZE:
+                last_start = min(last_start, start)
+
+    tasks = [asyncio.ensure_future(fetch(start)) for start in starts]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            await next_done
+            if finished():
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+    return merged()[:num_results]
+
+def google_search(query, num_results=10, languages=None, time_unit=None, time_value=None,
+                  exclude_ads=False, exclude_professional=False, target_press=False,
+                  exclude_jobs=False, exclude_training=False, use_cache=True,
+                  page_concurrency: int = SEARCH_PAGE_CONCURRENCY, cache_only=False):
+    """
+    URLs des `num_results` premiers résultats (100 au maximum).
+    Au-delà de 10 résultats, l'API est interrogée page par page (voir search_pages).
+    Avec `cache_only`, l'API n'est pas appelée : derniers résultats en cache, même périmés.
+    """
+    options = dict(
+        languages=languages, time_unit=time_unit, time_value=time_value, use_cache=use_cache, cache_only=cache_only,
+        filters={
+            "exclude_ads": exclude_ads, "exclude_professional": exclude_professional, "target_press": target_press,
+            "exclude_jobs": exclude_jobs, "exclude_training": exclude_training,
+        },
+    )
+    if num_results <= SEARCH_PAGE_SIZE:
+        return google_search_page(query, 1, num_results, **options)
+    return run_async(search_pages(query, num_results, page_concurrency, **options))
+
+def search_staleness(query, num_results=10, languages=None, time_unit=None, time_value=None,
+                     use_cache=True, page_concurrency=None, cache_only=False, **filters) -> Optional[float]:
+    """Ancienneté des derniers résultats d'une recherche (première page), None si elle n'a jamais été faite."""
+    first_page_size = min(num_results, SEARCH_PAGE_SIZE)
+    return search_cache.age(search_cache_key(query, first_page_size, languages, time_unit, time_value, start=1, **filters))
+
+def google_search_many(queries: List[str], concurrency: int = SEARCH_CONCURRENCY, **options) -> List[List[str]]:
+    """
+    Planifie les recherches de plusieurs thèmes (mêmes options pour toutes) et les lance en parallèle.
+    Les résultats encore frais viennent du cache sans consommer de quota. Les autres thèmes sont
+    servis des jamais cherchés aux plus anciens, tant que le quota du jour moins SEARCH_QUOTA_RESERVE
+    le permet ; au-delà, leurs derniers résultats en cache sont servis, même périmés.
+    Retourne les listes d'URLs dans l'ordre des requêtes ; une recherche en échec donne une liste vide.
+    """
+    num_results = min(options.get("num_results", 10), SEARCH_MAX_RESULTS)
+    cost = math.ceil(num_results / SEARCH_PAGE_SIZE)
+    ages = {query: search_staleness(query, **options) for query in dict.fromkeys(queries)}
+    stale = [query for query, age in ages.items() if age is None or age >= search_cache.ttl]
+    stale.sort(key=lambda query: math.inf if ages[query] is None else ages[query], reverse=True)
+    budget = max(0, search_quota.remaining() - SEARCH_QUOTA_RESERVE) // cost
+    deferred = set(stale[budget:])
+    if deferred:
+        logging.warning(f"Quota de recherche insuffisant : {len(deferred)} thème(s) servis depuis le cache")
+
+    def search_one(query):
+        try:
+            return google_search(query, cache_only=query in deferred, **options)
+        except (requests.RequestException, ValueError) as e:
+            logging.error(f"Erreur lors de la recherche '{query}' : {e}")
+            return []
+
+    return run_concurrently(search_one, queries, concurrency)
+
+###############################
+# Cache HTTP sur disque
+###############################
+HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", os.path.join(VEILLE_CACHE_DIR, "http_cache.sqlite"))
+HTTP_CACHE_TTL = int(os.getenv("HTTP_CACHE_TTL", 3600))
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+    url: Optional[str] = None  # clé canonique sous laquelle le corps est stocké
+
+    def is_fresh(self, ttl: int) -> bool:
+        return time.time() - self.fetched_at < ttl
+
+    def validators(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+class HttpCache(SqliteStore):
+    """
+    Cache persistant des réponses HTTP (SQLite), avec revalidation ETag / Last-Modified.
+    Au-delà de `ttl` secondes une entrée doit être revalidée ; au-delà de `max_bytes`
+    les entrées les moins récemment utilisées sont supprimées.
+    Les entrées sont indexées par URL canonique ; la table url_aliases fait pointer les autres
+    formes connues d'une même page (URL avant redirection, variante désignée par rel=canonical)
+    vers cette entrée.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS http_cache (
+            url TEXT PRIMARY KEY,
+            body BLOB NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            fetched_at REAL NOT NULL,
+            last_access REAL NOT NULL,
+            size INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_http_cache_access ON http_cache (last_access)",
+        "CREATE TABLE IF NOT EXISTS url_aliases (alias TEXT PRIMARY KEY, url TEXT NOT NULL)",
+    )
+
+    def __init__(self, path: str = HTTP_CACHE_PATH, ttl: int = HTTP_CACHE_TTL, max_bytes: int = HTTP_CACHE_MAX_BYTES):
+        super().__init__(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def _resolve(conn, url: str) -> str:
+        row = conn.execute("SELECT url FROM url_aliases WHERE alias=?", (url,)).fetchone()
+        return row[0] if row else url
+
+    def resolve(self, url: str) -> str:
+        """Clé de l'entrée vers laquelle pointe `url` (elle-même si ce n'est pas un alias connu)."""
+        try:
+            with self._connection() as conn:
+                return self._resolve(conn, url)
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"Erreur de lecture des alias du cache HTTP pour {url} : {e}")
+            return url
+
+    def add_alias(self, alias: str, url: str) -> None:
+        if alias == url:
+            return
+        try:
+            with self._connection() as conn:
+                conn.execute("REPLACE INTO url_aliases (alias, url) VALUES (?, ?)", (alias, url))
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"Erreur d'écriture des alias du cache HTTP pour {alias} : {e}")
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        try:
+            with self._connection() as conn:
+                url = self._resolve(conn, url)
+                row = conn.execute(
+                    "SELECT body, etag, last_modified, fetched_at FROM http_cache WHERE url=?", (url,)
+                ).fetchone()
+                if not row:
+                    return None
+                conn.execute("UPDATE http_cache SET last_access=? WHERE url=?", (time.time(), url))
+                return CachedResponse(body=row[0], etag=row[1], last_modified=row[2], fetched_at=row[3], url=url)
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"Erreur de lecture du cache HTTP pour {url} : {e}")
+            return None
+
+    def store(self, url: str, body: bytes, headers, aliases=()) -> None:
+        if "no-store" in headers.get("Cache-Control", "") or len(body) > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    "REPLACE INTO http_cache (url, body, etag, last_modified, fetched_at, last_access, size) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (url, body, headers.get("ETag"), headers.get("Last-Modified"), now, now, len(body)),
+                )
+                conn.execute("DELETE FROM url_aliases WHERE alias=?", (url,))
+                conn.executemany(
+                    "REPLACE INTO url_aliases (alias, url) VALUES (?, ?)",
+                    [(alias, url) for alias in aliases if alias != url],
+                )
+                self._evict(conn)
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"Erreur d'écriture du cache HTTP pour {url} : {e}")
+
+    def refresh(self, url: str) -> None:
+        """Marque une entrée revalidée (réponse 304) comme fraîche."""
+        try:
+            with self._connection() as conn:
+                now = time.time()
+                conn.execute("UPDATE http_cache SET fetched_at=?, last_access=? WHERE url=?", (now, now, self._resolve(conn, url)))
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"Erreur de mise à jour du cache HTTP pour {url} : {e}")
+
+    def _evict(self, conn) -> None:
+        """Supprime les entrées les moins récemment utilisées jusqu'à repasser sous max_bytes."""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, size in conn.execute("SELECT url, size FROM http_cache ORDER BY last_access").fetchall():
+            conn.execute("DELETE FROM http_cache WHERE url=?", (url,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        conn.execute("DELETE FROM url_aliases WHERE url NOT IN (SELECT url FROM http_cache)")
+
+    def clear(self) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM http_cache")
+            conn.execute("DELETE FROM url_aliases")
+
+http_cache = HttpCache()
+
+###############################
+# Canonicalisation des URLs
+###############################
+# Paramètres de suivi sans effet sur le contenu de la page
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "_ga", "_gl", "ref", "ref_src", "xtor", "cmpid", "ncid", "ito", "amp", "outputtype",
+}
+TRACKING_PARAM_PREFIXES = ("utm_", "at_", "pk_", "mtm_")
+# Variantes AMP : /article/amp, /article/amp/, /article.amp
+AMP_PATH_RE = re.compile(r"(?:/amp/?|\.amp)$", re.IGNORECASE)
+
+def is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PARAM_PREFIXES)
+
+def canonicalize_url(url: str) -> str:
+    """
+    Forme normalisée d'une URL, utilisée comme clé de déduplication et de cache :
+    https, hôte en minuscules sans port par défaut, sans fragment ni paramètres de suivi,
+    paramètres triés, sans variante AMP ni slash final.
+    Les URLs non HTTP sont retournées telles quelles.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except (ValueError, AttributeError):
+        return url
+    if parts.scheme.lower() not in ("http", "https") or not parts.hostname:
+        return url
+    host = parts.hostname.lower()
+    if port and port not in (80, 443):
+        host = f"{host}:{port}"
+    path = AMP_PATH_RE.sub("", re.sub(r"/{2,}", "/", parts.path))
+    path = path.rstrip("/") or "/"
+    query = urlencode(sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not is_tracking_param(name)
+    ))
+    return urlunsplit(("https", host, path, query, ""))
+
+def resolve_canonical_url(url: str) -> str:
+    """URL canonique, en suivant les redirections et rel=canonical déjà observés (alias du cache HTTP)."""
+    return http_cache.resolve(canonicalize_url(url))
+
+def unique_url_indices(urls: List[str]) -> List[int]:
+    """Indices des URLs à conserver : la première occurrence de chaque URL canonique."""
+    first_index: Dict[str, int] = {}
+    for index, url in enumerate(urls):
+        first_index.setdefault(resolve_canonical_url(url), index)
+    return list(first_index.values())
+
+def dedupe_urls(urls: List[str]) -> List[str]:
+    """Supprime les doublons (paramètres de suivi, AMP, http/https, redirections connues) en gardant l'ordre."""
+    return [urls[index] for index in unique_url_indices(urls)]
+
+###############################
+# Limitation de débit par hôte (politesse)
+###############################
+HOST_RATE_INITIAL = float(os.getenv("HOST_RATE_INITIAL", 2.0))
+HOST_RATE_MIN = float(os.getenv("HOST_RATE_MIN", 0.1))
+HOST_RATE_MAX = float(os.getenv("HOST_RATE_MAX", 5.0))
+HOST_RATE_BURST = float(os.getenv("HOST_RATE_BURST", 2.0))
+HOST_RATE_INCREASE = 0.25
+HOST_MAX_RETRY_AFTER = float(os.getenv("HOST_MAX_RETRY_AFTER", 120))
+THROTTLE_STATUSES = (429, 503)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Convertit un en-tête Retry-After (secondes ou date HTTP) en nombre de secondes."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+@dataclass
+class HostState:
+    rate: float
+    tokens: float
+    updated: float
+    blocked_until: float = 0.0
+    max_rate: float = HOST_RATE_MAX
+
+class HostRateLimiter:
+    """
+    Seau à jetons par hôte, à débit adaptatif (AIMD) :
+    le débit augmente doucement à chaque succès et est divisé par deux sur 429/503,
+    l'hôte étant alors suspendu pendant la durée de Retry-After.
+    Le Crawl-delay du robots.txt de l'hôte plafonne le débit.
+    """
+
+    def __init__(self, initial_rate: float = HOST_RATE_INITIAL, min_rate: float = HOST_RATE_MIN,
+                 max_rate: float = HOST_RATE_MAX, burst: float = HOST_RATE_BURST):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, HostState] = {}
+        self._crawl_delays: Dict[str, Optional[float]] = {}
+        self._crawl_delay_loading: Dict[str, threading.Event] = {}
+
+    def _state(self, host: str) -> HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            max_rate = self.max_rate
+            crawl_delay = self._crawl_delays.get(host)
+            if crawl_delay:
+                max_rate = min(max_rate, 1.0 / crawl_delay)
+            state = HostState(rate=min(self.initial_rate, max_rate), tokens=self.burst,
+                              updated=time.monotonic(), max_rate=max_rate)
+            self._hosts[host] = state
+        return state
+
+    def _load_crawl_delay(self, scheme: str, host: str) -> None:
+        # Un seul thread télécharge le robots.txt d'un hôte, les autres attendent son résultat
+        with self._lock:
+            if host in self._crawl_delays:
+                return
+            loading = self._crawl_delay_loading.get(host)
+            if loading is None:
+                self._crawl_delay_loading[host] = threading.Event()
+        if loading is not None:
+            loading.wait()
+            return
+        crawl_delay = None
+        try:
+            response = http_request("GET", f"{scheme}://{host}/robots.txt", headers=SCRAPE_HEADERS)
+            if response.status_code == 200:
+                robots = RobotFileParser()
+                robots.parse(response.text.splitlines())
+                crawl_delay = robots.crawl_delay(SCRAPE_HEADERS["User-Agent"])
+        except requests.RequestException as e:
+            logging.warning(f"robots.txt indisponible pour {host} : {e}")
+        finally:
+            with self._lock:
+                self._crawl_delays[host] = float(crawl_delay) if crawl_delay else None
+                self._crawl_delay_loading.pop(host).set()
+
+    def blocked_for(self, host: str) -> float:
+        """Secondes restantes avant que l'hôte soit de nouveau autorisé (sans consommer de jeton)."""
+        with self._lock:
+            state = self._hosts.get(host)
+            return max(0.0, state.blocked_until - time.monotonic()) if state else 0.0
+
+    def _reserve(self, host: str) -> float:
+        """Consomme un jeton et retourne 0 si la requête est autorisée, sinon le délai d'attente en secondes."""
+        with self._lock:
+            state = self._state(host)
+            now = time.monotonic()
+            state.tokens = min(self.burst, state.tokens + (now - state.updated) * state.rate)
+            state.updated = now
+            wait = state.blocked_until - now
+            if wait > 0:
+                return wait
+            if state.tokens >= 1:
+                state.tokens -= 1
+                return 0.0
+            return (1 - state.tokens) / state.rate
+
+    def acquire(self, url: str) -> None:
+        """Bloque le thread appelant jusqu'à ce qu'une requête vers l'hôte de `url` soit autorisée."""
+        parsed = urlparse(url)
+        host = parsed.netloc.lower()
+        self._load_crawl_delay(parsed.scheme or "https", host)
+        while True:
+            wait = self._reserve(host)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, url: str) -> None:
+        """Comme acquire, mais l'attente libère la boucle asyncio au lieu de bloquer un thread."""
+        parsed = urlparse(url)
+        host = parsed.netloc.lower()
+        await asyncio.to_thread(self._load_crawl_delay, parsed.scheme or "https", host)
+        while True:
+            wait = self._reserve(host)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def record(self, url: str, status: Optional[int], retry_after: Optional[float] = None) -> None:
+        """Adapte le débit de l'hôte selon le code de réponse obtenu."""
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            state = self._state(host)
+            if status in THROTTLE_STATUSES:
+                state.rate = max(self.min_rate, state.rate / 2)
+                state.tokens = 0.0
+                delay = retry_after if retry_after is not None else 1.0 / state.rate
+                state.blocked_until = max(state.blocked_until, time.monotonic() + min(delay, HOST_MAX_RETRY_AFTER))
+            elif status is not None and status < 400:
+                state.rate = min(state.max_rate, state.rate + HOST_RATE_INCREASE)
+
+host_rate_limiter = HostRateLimiter()
+
+###############################
+# Dates de publication
+###############################
+FRENCH_MONTHS = {
+    "janvier": 1, "janv": 1, "février": 2, "fevrier": 2, "févr": 2, "fevr": 2, "fév": 2, "fev": 2,
+    "mars": 3, "avril": 4, "avr": 4, "mai": 5, "juin": 6, "juillet": 7, "juil": 7,
+    "août": 8, "aout": 8, "septembre": 9, "sept": 9, "octobre": 10, "oct": 10,
+    "novembre": 11, "nov": 11, "décembre": 12, "decembre": 12, "déc": 12, "dec": 12,
+}
+# Heure facultative après la date : "à 14h30", "14:30", "- 9h"
+_TIME_SUFFIX = r"(?:\D{1,6}?(\d{1,2})\s*[h:]\s*(\d{2})?)?"
+TEXT_DATE_RE = re.compile(r"\b(\d{1,2})(?:er)?\s+([a-zéèêûô]+)\.?\s+(\d{4})" + _TIME_SUFFIX, re.IGNORECASE)
+NUMERIC_DATE_RE = re.compile(r"\b(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})\b" + _TIME_SUFFIX)
+RELATIVE_DATE_RE = re.compile(
+    r"(?:il y a|depuis)\s+(\d+|une?)\s*(secondes?|minutes?|min|heures?|h|jours?|semaines?|mois|années?|ans?)\b"
+    r"|(\d+|an?)\s+(seconds?|minutes?|mins?|hours?|days?|weeks?|months?|years?)\s+ago\b",
+    re.IGNORECASE,
+)
+RELATIVE_DAYS = {"aujourd'hui": 0, "aujourd’hui": 0, "today": 0, "hier": 1, "yesterday": 1, "avant-hier": 2}
+RELATIVE_UNITS = {
+    "seconde": timedelta(seconds=1), "second": timedelta(seconds=1),
+    "minute": timedelta(minutes=1), "min": timedelta(minutes=1),
+    "heure": timedelta(hours=1), "h": timedelta(hours=1), "hour": timedelta(hours=1),
+    "jour": timedelta(days=1), "day": timedelta(days=1),
+    "semaine": timedelta(weeks=1), "week": timedelta(weeks=1),
+    "mois": timedelta(days=30), "month": timedelta(days=30),
+    "année": timedelta(days=365), "an": timedelta(days=365), "year": timedelta(days=365),
+}
+
+def _relative_unit(unit: str) -> timedelta:
+    """Unité d'une date relative, mot complet au singulier ou au pluriel ("secondes" ≠ "semaines")."""
+    unit = unit.lower()
+    if unit not in RELATIVE_UNITS and unit.endswith("s"):
+        unit = unit[:-1]
+    return RELATIVE_UNITS[unit]
+
+def _build_datetime(year, month, day, hour=None, minute=None) -> Optional[datetime]:
+    try:
+        return datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0))
+    except ValueError:
+        return None
+
+def parse_date(date_string: Optional[str], now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Interprète une date de publication. Les formats sont essayés du plus courant au plus coûteux :
+    ISO 8601 (attributs datetime, métadonnées), date numérique française (03/04/2024),
+    date en toutes lettres ("mardi 3 avril 2024 à 14h30"), date relative ("il y a 3 jours", "hier"),
+    puis dateutil en dernier recours (formats anglais, RFC 2822).
+    """
+    if not isinstance(date_string, str):
+        return None
+    text = date_string.strip()
+    if not text:
+        return None
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00") if text.endswith("Z") else text)
+    except ValueError:
+        pass
+
+    match = NUMERIC_DATE_RE.search(text)
+    if match:
+        day, month, year, hour, minute = match.groups()
+        return _build_datetime(year, month, day, hour, minute)
+
+    match = TEXT_DATE_RE.search(text)
+    if match and match.group(2).lower() in FRENCH_MONTHS:
+        day, month, year, hour, minute = match.groups()
+        return _build_datetime(year, FRENCH_MONTHS[month.lower()], day, hour, minute)
+
+    now = now or datetime.now()
+    lowered = text.lower()
+    for word, days in RELATIVE_DAYS.items():
+        if re.search(rf"(?<![\w-]){re.escape(word)}(?![\w-])", lowered):
+            return now - timedelta(days=days)
+    match = RELATIVE_DATE_RE.search(text)
+    if match:
+        count, unit = (match.group(1), match.group(2)) if match.group(1) else (match.group(3), match.group(4))
+        count = 1 if not count.isdigit() else int(count)
+        return now - count * _relative_unit(unit)
+
+    # dateutil en dernier recours, seulement si une année est présente (sinon "3" deviendrait le 3 du mois courant)
+    if re.search(r"\d{4}", text):
+        try:
+            return parser.parse(text, dayfirst=True, default=datetime(now.year, 1, 1))
+        except (ValueError, OverflowError):
+            pass
+    return None
+
+def publication_window_start(time_unit: Optional[str], time_value: Optional[int], now: Optional[datetime] = None) -> Optional[datetime]:
+    """Début de la fenêtre de publication configurée ("Paru il y a N mois/années")."""
+    if not time_unit or not time_value:
+        return None
+    days = time_value * 30 if time_unit == "mois" else time_value * 365
+    return (now or datetime.now()) - timedelta(days=days)
+
+def is_within_window(page: Page, window_start: Optional[datetime]) -> bool:
+    """Une page sans date reconnue est conservée : on ne peut pas savoir si elle est hors fenêtre."""
+    if window_start is None or not page.date:
+        return True
+    published = parse_date(page.date)
+    if published is None:
+        return True
+    if published.tzinfo is not None:
+        published = published.astimezone().replace(tzinfo=None)
+    return published >= window_start
+
 ###############################
 # Fonctions de scraping
 ###############################
 def clean_date(date_string: str) -> Optional[str]:
+    """Normalise une date de publication en horodatage ISO 8601 (None si elle n'est pas reconnue)."""
+    published = parse_date(date_string)
+    return published.isoformat() if published else None
+
+# XPath compilées une seule fois au chargement du module, dans l'ordre de priorité.
+# smart_strings=False : les résultats texte sont de simples str, sans référence vers l'arbre.
+def _compile_xpaths(paths):
+    return [etree.XPath(path, smart_strings=False) for path in paths]
+
+EXTRACTION_XPATHS = {
+    # normalize-space(//h1) couvre à la fois "//h1/text()" et le texte des titres imbriqués (<h1><a>...</a></h1>)
+    "title": _compile_xpaths(["normalize-space(//h1)", "//meta[@property='og:title']/@content", "//title/text()"]),
+    # Paragraphes candidats, filtrés ensuite par compact_blocks
+    "content": _compile_xpaths(["//p"]),
+    "author": _compile_xpaths(["//meta[@name='author']/@content", "//span[contains(@class, 'author')]//text()"]),
+    "date": _compile_xpaths(["//time/@datetime", "//meta[@property='article:published_time']/@content"]),
+    "description": _compile_xpaths(["//meta[@name='description']/@content", "//meta[@property='og:description']/@content"]),
+    "image_url": _compile_xpaths([
+        "//meta[@property='og:image']/@content",
+        "//img[@class='featured-image']/@src",
+        "//div[contains(@class, 'td-module-thumb')]//img/@src",
+        "//img[contains(@class, 'entry-thumb')]/@src",
+    ]),
+}
+
+# Anciens sélecteurs CSS (span.author, time), évalués sur le texte complet de l'élément
+# uniquement quand aucune XPath principale n'a donné de résultat.
+EXTRACTION_FALLBACKS = {
+    "author": _compile_xpaths(["//span[contains(concat(' ', normalize-space(@class), ' '), ' author ')]"]),
+    "date": _compile_xpaths(["//time"]),
+}
+
+CANONICAL_LINK = etree.XPath("//link[contains(concat(' ', normalize-space(@rel), ' '), ' canonical ')]/@href", smart_strings=False)
+
+# Champs dont le sélecteur gagnant est mémorisé par domaine (voir ExtractionProfiles)
+PROFILED_FIELDS = ("title", "author", "date", "description", "image_url")
+
+def match_first_xpath(tree, xpaths):
+    """Retourne (valeur, expression XPath gagnante) pour la première XPath qui donne un texte non vide."""
+    for path in xpaths:
+        results = path(tree)
+        for result in ([results] if isinstance(results, str) else results):
+            value = result.strip() if isinstance(result, str) else result.text_content().strip()
+            if value:
+                return value, path.path
+    return None, None
+
+def get_first_valid_xpath(tree, xpaths):
+    return match_first_xpath(tree, xpaths)[0]
+
+def field_candidates(field, preferred: Optional[str] = None):
+    """XPath d'un champ dans l'ordre d'essai : le sélecteur préféré du domaine d'abord, puis l'ordre par défaut."""
+    candidates = EXTRACTION_XPATHS[field] + EXTRACTION_FALLBACKS.get(field, [])
+    if preferred:
+        first = [path for path in candidates if path.path == preferred]
+        if first:
+            candidates = first + [path for path in candidates if path.path != preferred]
+    return candidates
+
+def get_field(tree, field, preferred: Optional[str] = None):
+    return match_first_xpath(tree, field_candidates(field, preferred))
+
+def parse_html(content: bytes):
+    """
+    Parse le HTML brut en un seul passage lxml.
+    Si le contenu est de l'UTF-8 valide, on l'impose ; sinon libxml2 s'appuie sur le charset déclaré.
+    """
     try:
-        return date_string.strip()
-    except AttributeError:
+        content.decode("utf-8")
+        encoding = "utf-8"
+    except UnicodeDecodeError:
+        encoding = None
+    return lxml_html.document_fromstring(content, parser=lxml_html.HTMLParser(encoding=encoding))
+
+SCRAPE_HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept-Language": "fr-FR,fr;q=0.9",
+}
+SCRAPE_MAX_BYTES = int(os.getenv("SCRAPE_MAX_BYTES", 3 * 1024 * 1024))
+SCRAPE_MAX_SECONDS = float(os.getenv("SCRAPE_MAX_SECONDS", 20))
+SCRAPE_CHUNK_SIZE = 16 * 1024
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+def read_html_body(response, url: str, max_bytes: int = SCRAPE_MAX_BYTES) -> Optional[Tuple[bytes, bool]]:
+    """
+    Lit le corps d'une réponse en streaming.
+    Abandonne tout de suite si le Content-Type n'est pas du HTML ; s'arrête au-delà de `max_bytes`
+    (le HTML tronqué reste exploitable par lxml) ou de SCRAPE_MAX_SECONDS.
+    Retourne (corps, lu_entièrement) ou None si la réponse est ignorée.
+    """
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if content_type and content_type not in HTML_CONTENT_TYPES:
+        logging.error(f"Contenu non HTML ({content_type}) pour {url}")
         return None
+    buffer = bytearray()
+    deadline = time.monotonic() + SCRAPE_MAX_SECONDS
+    for chunk in response.iter_content(chunk_size=SCRAPE_CHUNK_SIZE):
+        buffer.extend(chunk)
+        if len(buffer) >= max_bytes:
+            logging.warning(f"Limite de {max_bytes} octets atteinte pour {url}, contenu tronqué")
+            return bytes(buffer[:max_bytes]), False
+        if time.monotonic() > deadline:
+            logging.warning(f"Téléchargement trop long pour {url}, contenu tronqué")
+            return bytes(buffer), False
+    return bytes(buffer), True
 
-def get_first_valid_xpath(tree, xpaths):
-    for path in xpaths:
-        result = tree.xpath(path)
-        if result:
-            return result[0].strip() if isinstance(result[0], str) else result[0]
-    return None
+@dataclass
+class FetchResult:
+    body: Optional[bytes]
+    status: Optional[int] = None  # None : erreur réseau ou réponse servie par le cache
+    retry_after: Optional[float] = None
+    url: Optional[str] = None  # URL canonique du contenu, après redirections
 
-def get_first_valid_css(soup, css_selectors):
-    for selector in css_selectors:
-        result = soup.select_one(selector)
-        if result:
-            return result.get_text(strip=True) if result.get_text else result.get("content", "").strip()
-    return None
+    @property
+    def throttled(self) -> bool:
+        return self.status in THROTTLE_STATUSES
 
-def scrape_page(url: str) -> Optional[Page]:
-    headers = {
-        "User-Agent": "Mozilla/5.0",
-        "Accept-Language": "fr-FR,fr;q=0.9",
-    }
+def fetch_url(url: str, use_cache: bool = True, max_bytes: int = SCRAPE_MAX_BYTES,
+              rate_limited: bool = True) -> FetchResult:
+    """
+    Télécharge le HTML brut d'une URL et retourne le corps avec le statut HTTP.
+    Les réponses sont servies depuis le cache disque tant qu'elles sont fraîches,
+    puis revalidées par requête conditionnelle (If-None-Match / If-Modified-Since).
+    Chaque requête réseau passe par le limiteur de débit de l'hôte, sauf avec
+    `rate_limited=False` quand l'appelant a déjà attendu son jeton (voir iter_scraped_pages).
+    Le corps est lu en streaming (voir read_html_body) ; seules les réponses lues
+    entièrement sont mises en cache, sous l'URL canonique finale (après redirections).
+    """
+    key = canonicalize_url(url)
+    cached = http_cache.get(key) if use_cache else None
+    if cached and cached.is_fresh(http_cache.ttl):
+        return FetchResult(body=cached.body, url=cached.url)
+
+    headers = dict(SCRAPE_HEADERS)
+    if cached:
+        headers.update(cached.validators())
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        if response.status_code != 200:
-            logging.error(f"Erreur HTTP {response.status_code} pour {url}")
-            return None
+        if rate_limited:
+            host_rate_limiter.acquire(url)
+        with http_request("GET", url, headers=headers, stream=True) as response:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            host_rate_limiter.record(url, response.status_code, retry_after)
+            if response.status_code == 304 and cached:
+                http_cache.refresh(cached.url)
+                return FetchResult(body=cached.body, status=304, url=cached.url)
+            if response.status_code != 200:
+                logging.error(f"Erreur HTTP {response.status_code} pour {url}")
+                return FetchResult(body=None, status=response.status_code, retry_after=retry_after)
+            result = read_html_body(response, url, max_bytes=max_bytes)
+            if result is None:
+                return FetchResult(body=None, status=response.status_code)
+            body, complete = result
+            final_url = canonicalize_url(response.url)
+            if use_cache and complete:
+                http_cache.store(final_url, body, response.headers, aliases=(key,))
+            return FetchResult(body=body, status=response.status_code, url=final_url)
+    except requests.RequestException as e:
+        if cached:
+            logging.warning(f"Erreur réseau pour {url}, utilisation de la copie en cache : {e}")
+            return FetchResult(body=cached.body, url=cached.url)
+        logging.error(f"Erreur lors du téléchargement de {url} : {e}")
+        return FetchResult(body=None)
 
-        soup = BeautifulSoup(response.content, "lxml")
-        html_tree = lxml_html.fromstring(str(soup))
-
-        xpaths = {
-            "title": ["//h1/text()", "//meta[@property='og:title']/@content", "//title/text()"],
-            "content": ["//article//p//text()", "//div[contains(@class, 'content')]//p//text()", "//p//text()"],
-            "author": ["//meta[@name='author']/@content", "//span[contains(@class, 'author')]//text()"],
-            "date": ["//time/@datetime", "//meta[@property='article:published_time']/@content"],
-            "description": ["//meta[@name='description']/@content", "//meta[@property='og:description']/@content"],
-            "image_url": [
-                "//meta[@property='og:image']/@content",
-                "//img[@class='featured-image']/@src",
-                "//div[contains(@class, 'td-module-thumb')]//img/@src",
-                "//img[contains(@class, 'entry-thumb')]/@src"
-            ],
-        }
-        css_selectors = {
-            "title": ["h1", "meta[property='og:title']", "title"],
-            "content": ["article p", "div.content p", "p"],
-            "author": ["meta[name='author']", "span.author"],
-            "date": ["time", "meta[property='article:published_time']"],
-            "description": ["meta[name='description']", "meta[property='og:description']"],
-            "image_url": ["meta[property='og:image']", "img.featured-image", "div.td-module-thumb img", "img.entry-thumb"],
-        }
+def fetch_page(url: str, use_cache: bool = True, max_bytes: int = SCRAPE_MAX_BYTES) -> Optional[bytes]:
+    """Télécharge le HTML brut d'une URL. Retourne None si la réponse n'est pas exploitable."""
+    return fetch_url(url, use_cache=use_cache, max_bytes=max_bytes).body
+
+def extract_page_with_profile(url: str, content: bytes,
+                              profile: Optional[Dict[str, str]] = None) -> Tuple[Optional[Page], Dict[str, Optional[str]]]:
+    """
+    Extrait les champs d'un Page à partir du HTML brut déjà téléchargé.
+    `profile` donne, par champ, l'XPath à essayer en premier pour ce domaine.
+    Retourne aussi l'XPath gagnante de chaque champ (None si aucun sélecteur n'a trouvé de valeur).
+    """
+    profile = profile or {}
+    winners: Dict[str, Optional[str]] = {}
+    try:
+        html_tree = parse_html(content)
+
+        values = {}
+        for field in PROFILED_FIELDS:
+            values[field], winners[field] = get_field(html_tree, field, profile.get(field))
 
-        title = get_first_valid_xpath(html_tree, xpaths["title"]) or get_first_valid_css(soup, css_selectors["title"]) or "Titre non trouvé"
-        content_elements = html_tree.xpath("|".join(xpaths["content"])) or soup.select("|".join(css_selectors["content"]))
-        content = " ".join([c.strip() for c in content_elements if len(c.strip()) > 50]) or "Contenu non trouvé"
-        author = get_first_valid_xpath(html_tree, xpaths["author"]) or get_first_valid_css(soup, css_selectors["author"]) or "Auteur non spécifié"
-        date = get_first_valid_xpath(html_tree, xpaths["date"]) or get_first_valid_css(soup, css_selectors["date"])
-        date = clean_date(date) if date else None
-        description = get_first_valid_xpath(html_tree, xpaths["description"]) or get_first_valid_css(soup, css_selectors["description"]) or "Description non trouvée"
-        image_url = get_first_valid_xpath(html_tree, xpaths["image_url"]) or get_first_valid_css(soup, css_selectors["image_url"]) or None
+        content = "\n".join(compact_blocks(EXTRACTION_XPATHS["content"][0](html_tree))) or "Contenu non trouvé"
+        date = clean_date(values["date"]) if values["date"] else None
+        image_url = values["image_url"] or None
         if image_url and not image_url.startswith("http"):
             image_url = urljoin(url, image_url)
+        canonical_links = CANONICAL_LINK(html_tree)
+        canonical_url = canonicalize_url(urljoin(url, canonical_links[0].strip())) if canonical_links else None
 
-        return Page(
+        page = Page(
             date=date,
-            title=title,
+            title=values["title"] or "Titre non trouvé",
             link=url,
-            description=description,
+            description=values["description"] or "Description non trouvée",
             content=content,
-            author=author,
+            author=values["author"] or "Auteur non spécifié",
             image_url=image_url,
+            token_estimate=estimate_tokens(content),
+            canonical_url=canonical_url,
         )
+        return page, winners
+
+    except Exception as e:
+        logging.error(f"Erreur lors de l'extraction de {url} : {e}")
+        return None, {}
+
+def extract_page(url: str, content: bytes) -> Optional[Page]:
+    return extract_page_with_profile(url, content)[0]
+
+###############################
+# Compaction du contenu (suppression du boilerplate)
+###############################
+MIN_BLOCK_CHARS = 50
+MAX_LINK_DENSITY = 0.33
+# Un court paragraphe contenant ces formules est du boilerplate (bandeau cookies, pied de page...)
+SHORT_BOILERPLATE_CHARS = 200
+BOILERPLATE_TAGS = {"nav", "footer", "header", "aside", "form", "noscript", "figcaption"}
+BOILERPLATE_ATTR_RE = re.compile(
+    r"cookie|consent|gdpr|rgpd|newsletter|subscribe|abonn|footer|related|similar|share|partage|social|"
+    r"comment|sidebar|widget|menu|breadcrumb|promo|banner|advert|sponsor|author-bio|tags",
+    re.IGNORECASE,
+)
+BOILERPLATE_TEXT_RE = re.compile(
+    r"cookies?\b|tous droits réservés|all rights reserved|abonnez-vous|inscrivez-vous|newsletter|"
+    r"politique de confidentialité|mentions légales|lire aussi|à lire également|partager sur",
+    re.IGNORECASE,
+)
+
+def is_boilerplate_container(element) -> bool:
+    """Vrai si un ancêtre du paragraphe (jusqu'à <article>, <main> ou <body>) est une zone de navigation."""
+    for ancestor in element.iterancestors():
+        tag = ancestor.tag if isinstance(ancestor.tag, str) else ""
+        if tag in ("article", "main", "body"):
+            return False
+        if tag in BOILERPLATE_TAGS:
+            return True
+        if BOILERPLATE_ATTR_RE.search(f"{ancestor.get('class', '')} {ancestor.get('id', '')}"):
+            return True
+    return False
+
+def compact_blocks(paragraphs) -> List[str]:
+    """
+    Garde les paragraphes qui ressemblent à du texte d'article :
+    assez longs, peu de texte en liens, hors zones de navigation, sans formules de boilerplate,
+    et sans doublons. Si tout est écarté, retombe sur les paragraphes simplement assez longs.
+    """
+    blocks = []
+    long_enough = []
+    seen = set()
+    for paragraph in paragraphs:
+        text = " ".join(paragraph.text_content().split())
+        if len(text) <= MIN_BLOCK_CHARS:
+            continue
+        long_enough.append(text)
+        key = text.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        link_chars = sum(len(link.text_content().strip()) for link in paragraph.iter("a"))
+        if link_chars / len(text) > MAX_LINK_DENSITY:
+            continue
+        if len(text) < SHORT_BOILERPLATE_CHARS and BOILERPLATE_TEXT_RE.search(text):
+            continue
+        if is_boilerplate_container(paragraph):
+            continue
+        blocks.append(text)
+    return blocks or long_enough
+
+def remove_repeated_blocks(pages: List[Optional[Page]]) -> None:
+    """
+    Retire d'un lot de pages les paragraphes répétés à l'identique sur plusieurs pages
+    d'un même domaine (encarts promotionnels, signatures...). Modifie les pages en place.
+    """
+    pages_by_host: Dict[str, List[Page]] = {}
+    for page in pages:
+        if page and page.content:
+            pages_by_host.setdefault(urlparse(page.link).netloc.lower(), []).append(page)
+    for host_pages in pages_by_host.values():
+        if len(host_pages) < 2:
+            continue
+        block_counts: Dict[str, int] = {}
+        for page in host_pages:
+            for block in set(page.content.split("\n")):
+                block_counts[block] = block_counts.get(block, 0) + 1
+        for page in host_pages:
+            kept = [block for block in page.content.split("\n") if block_counts[block] < 2]
+            if kept and len(kept) < len(page.content.split("\n")):
+                page.content = "\n".join(kept)
+                page.token_estimate = estimate_tokens(page.content)
+
+class TokenCounter:
+    """
+    Nombre de tokens d'un texte pour un modèle Ollama. Faute de tokenizer local, le compte repose sur
+    un ratio caractères/token par modèle, recalé sur les comptes exacts (prompt_eval_count) que
+    renvoie Ollama à chaque requête ; 4 caractères par token tant qu'aucune mesure n'existe.
+    """
+    DEFAULT_CHARS_PER_TOKEN = 4.0
+    # Mesures hors de cette plage ignorées (prompt en partie servi par le cache KV d'Ollama...)
+    PLAUSIBLE_RATIOS = (2.0, 6.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ratios: Dict[str, float] = {}
+
+    def chars_per_token(self, model: Optional[str] = None) -> float:
+        return self._ratios.get(model or OLLAMA_MODEL, self.DEFAULT_CHARS_PER_TOKEN)
+
+    def count(self, text: str, model: Optional[str] = None) -> int:
+        return math.ceil(len(text) / self.chars_per_token(model))
+
+    def observe(self, chars: int, tokens: Optional[int], model: Optional[str] = None) -> None:
+        """Recale le ratio du modèle sur un compte exact (moyenne glissante)."""
+        if not chars or not tokens:
+            return
+        ratio = chars / tokens
+        low, high = self.PLAUSIBLE_RATIOS
+        if not low <= ratio <= high:
+            return
+        model = model or OLLAMA_MODEL
+        with self._lock:
+            previous = self._ratios.get(model)
+            self._ratios[model] = ratio if previous is None else 0.8 * previous + 0.2 * ratio
+
+token_counter = TokenCounter()
+
+def estimate_tokens(text: str, model: Optional[str] = None) -> int:
+    """Nombre de tokens du texte pour le modèle (voir TokenCounter)."""
+    return token_counter.count(text, model)
+
+###############################
+# Profils d'extraction par domaine
+###############################
+EXTRACTION_PROFILES_PATH = os.getenv("EXTRACTION_PROFILES_PATH", os.path.join(VEILLE_CACHE_DIR, "extraction_profiles.json"))
+EXTRACTION_PROFILE_MAX_MISSES = int(os.getenv("EXTRACTION_PROFILE_MAX_MISSES", 3))
+
+class ExtractionProfiles:
+    """
+    Mémorise, pour chaque domaine et chaque champ, l'XPath qui a trouvé la valeur,
+    afin de l'essayer en premier sur les pages suivantes du même domaine.
+    Une entrée est remplacée (ou supprimée) après `max_misses` pages consécutives
+    sur lesquelles elle ne trouve plus rien. Persisté dans un fichier JSON.
+    """
+
+    def __init__(self, path: str = EXTRACTION_PROFILES_PATH, max_misses: int = EXTRACTION_PROFILE_MAX_MISSES):
+        self.path = path
+        self.max_misses = max_misses
+        self._lock = threading.Lock()
+        self._profiles: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None
+        self._dirty = False
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        if self._profiles is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._profiles = json.load(f)
+            except FileNotFoundError:
+                self._profiles = {}
+            except (OSError, ValueError) as e:
+                logging.error(f"Profils d'extraction illisibles ({self.path}) : {e}")
+                self._profiles = {}
+        return self._profiles
+
+    def get(self, host: str) -> Dict[str, str]:
+        """Retourne {champ: XPath préférée} pour un domaine."""
+        with self._lock:
+            entries = self._load().get(host, {})
+            return {field: entry["selector"] for field, entry in entries.items()}
+
+    def record(self, host: str, winners: Dict[str, Optional[str]]) -> None:
+        """Met à jour le profil d'un domaine avec les XPath gagnantes d'une page."""
+        if not winners:
+            return
+        with self._lock:
+            entries = self._load().setdefault(host, {})
+            for field, winner in winners.items():
+                entry = entries.get(field)
+                if entry and entry["selector"] == winner:
+                    entry["hits"] += 1
+                    entry["misses"] = 0
+                elif entry:
+                    # Le sélecteur préféré est essayé en premier : s'il n'a pas gagné, il n'a rien trouvé
+                    entry["misses"] += 1
+                    if entry["misses"] >= self.max_misses:
+                        if winner:
+                            entries[field] = {"selector": winner, "hits": 1, "misses": 0}
+                        else:
+                            del entries[field]
+                elif winner:
+                    entries[field] = {"selector": winner, "hits": 1, "misses": 0}
+            self._dirty = True
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty or self._profiles is None:
+                return
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._profiles, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except OSError as e:
+                logging.error(f"Erreur lors de la sauvegarde des profils d'extraction : {e}")
+
+extraction_profiles = ExtractionProfiles()
+
+###############################
+# Moteur de scraping concurrent
+###############################
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", 8))
+SCRAPE_PER_HOST_LIMIT = int(os.getenv("SCRAPE_PER_HOST_LIMIT", 2))
+# Nombre de remises en file d'une URL limitée par son hôte (429/503) avant abandon
+SCRAPE_MAX_REQUEUES = int(os.getenv("SCRAPE_MAX_REQUEUES", 3))
+# Nombre de processus d'extraction HTML (0 : extraction dans les threads du moteur)
+SCRAPE_PARSE_WORKERS = int(os.getenv("SCRAPE_PARSE_WORKERS", 0))
+
+_parse_pools: Dict[int, ProcessPoolExecutor] = {}
+_parse_pools_lock = threading.Lock()
+
+def get_parse_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Pool de processus partagé pour l'extraction HTML (CPU), créé au premier usage et réutilisé ensuite.
+    Démarrage en "spawn" : le processus Streamlit a déjà de nombreux threads, un fork n'est pas sûr.
+    """
+    with _parse_pools_lock:
+        pool = _parse_pools.get(workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _parse_pools[workers] = pool
+        return pool
+
+def discard_parse_pool(workers: int) -> None:
+    with _parse_pools_lock:
+        pool = _parse_pools.pop(workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+async def extract_page_async(url: str, content: bytes, parse_workers: int = SCRAPE_PARSE_WORKERS) -> Optional[Page]:
+    """
+    Étape d'extraction : octets bruts -> Page, guidée par le profil d'extraction du domaine.
+    Dans un pool de processus si `parse_workers` > 0, sinon dans un thread.
+    """
+    host = urlparse(url).netloc.lower()
+    profile = extraction_profiles.get(host)
+    result = None
+    if parse_workers > 0:
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(get_parse_pool(parse_workers), extract_page_with_profile, url, content, profile)
+        except BrokenProcessPool as e:
+            logging.error(f"Pool d'extraction indisponible, extraction locale pour {url} : {e}")
+            discard_parse_pool(parse_workers)
+    if result is None:
+        result = await asyncio.to_thread(extract_page_with_profile, url, content, profile)
+    page, winners = result
+    extraction_profiles.record(host, winners)
+    return page
+
+def run_async(coro):
+    """
+    Exécute une coroutine depuis du code synchrone (Streamlit, scripts).
+    Si une boucle tourne déjà dans ce thread (ex. endpoint FastAPI), on l'exécute dans un thread dédié.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+def run_concurrently(func: Callable, items, concurrency: int = SCRAPE_CONCURRENCY) -> list:
+    """
+    Applique une fonction bloquante (I/O) à chaque élément, au plus `concurrency` à la fois.
+    Retourne les résultats dans l'ordre des éléments.
+    """
+    items = list(items)
+
+    async def run_all():
+        limit = asyncio.Semaphore(max(1, concurrency))
+
+        async def run_one(item):
+            async with limit:
+                return await asyncio.to_thread(func, item)
+
+        return await asyncio.gather(*(run_one(item) for item in items))
+
+    return run_async(run_all()) if items else []
+
+async def iter_scraped_pages(urls: List[str], concurrency: int = SCRAPE_CONCURRENCY,
+                             per_host_limit: int = SCRAPE_PER_HOST_LIMIT, parse_workers: int = SCRAPE_PARSE_WORKERS):
+    """
+    Télécharge et extrait les URLs en parallèle et produit des tuples (index, url, Page | None)
+    dans l'ordre de fin de traitement.
+    La concurrence globale et la concurrence par hôte sont bornées par des sémaphores.
+    Le téléchargement (I/O) et l'extraction (CPU, voir extract_page_async) sont deux étapes distinctes :
+    une page en cours d'extraction ne bloque pas les téléchargements suivants.
+    """
+    global_limit = asyncio.Semaphore(max(1, concurrency))
+    host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    async def scrape_one(index: int, url: str):
+        host = urlparse(url).netloc.lower()
+        if host not in host_limits:
+            host_limits[host] = asyncio.Semaphore(max(1, per_host_limit))
+        for attempt in range(SCRAPE_MAX_REQUEUES + 1):
+            # L'attente du limiteur (débit, Crawl-delay, suspension sur 429/503) se fait hors des
+            # sémaphores : un hôte lent n'immobilise pas de place pour les autres hôtes.
+            # Une page fraîche en cache ne consomme pas de jeton.
+            cached = await asyncio.to_thread(http_cache.get, canonicalize_url(url))
+            if not (cached and cached.is_fresh(http_cache.ttl)):
+                await host_rate_limiter.acquire_async(url)
+            async with global_limit, host_limits[host]:
+                result = await asyncio.to_thread(fetch_url, url, rate_limited=False)
+            if not result.throttled or attempt == SCRAPE_MAX_REQUEUES or (result.retry_after or 0) > HOST_MAX_RETRY_AFTER:
+                break
+            logging.warning(f"{url} limité par l'hôte (HTTP {result.status}), remise en file ({attempt + 1}/{SCRAPE_MAX_REQUEUES})")
+        if result.body is None:
+            return index, url, None
+        page = await extract_page_async(url, result.body, parse_workers)
+        if page:
+            fetched_url = result.url or canonicalize_url(url)
+            if page.canonical_url and page.canonical_url != fetched_url:
+                # La variante désignée par rel=canonical sera servie par le cache
+                await asyncio.to_thread(http_cache.add_alias, page.canonical_url, fetched_url)
+            page.canonical_url = page.canonical_url or fetched_url
+        return index, url, page
+
+    tasks = [asyncio.ensure_future(scrape_one(index, url)) for index, url in enumerate(urls)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def scrape_pages(urls: List[str], concurrency: int = SCRAPE_CONCURRENCY,
+                 per_host_limit: int = SCRAPE_PER_HOST_LIMIT, max_pages: Optional[int] = None,
+                 on_result: Optional[Callable[[int, str, Optional[Page]], None]] = None,
+                 parse_workers: int = SCRAPE_PARSE_WORKERS,
+                 published_after: Optional[datetime] = None,
+                 on_skipped: Optional[Callable[[int, str], None]] = None) -> List[Optional[Page]]:
+    """
+    Scrape une liste d'URLs en parallèle.
+    Retourne une liste alignée sur `urls` (None pour les échecs et les URLs non traitées).
+    `on_result(index, url, page)` est appelé dès qu'une URL est terminée (barres de progression) ;
+    page vaut None seulement pour un échec, jamais pour un doublon ou une page hors fenêtre.
+    `on_skipped(index, url)` est appelé pour une URL téléchargée puis écartée (doublon, hors fenêtre).
+    Avec `max_pages`, le traitement s'arrête dès que ce nombre de pages a été obtenu.
+    Avec `parse_workers` > 0, l'extraction HTML est répartie sur autant de processus.
+    Les doublons (même URL canonique) ne sont téléchargés qu'une fois et restent à None,
+    y compris ceux révélés après téléchargement par une redirection ou rel=canonical.
+    Avec `published_after`, les pages datées d'avant ce moment restent à None et ne comptent
+    pas dans `max_pages`.
+    """
+    results: List[Optional[Page]] = [None] * len(urls)
+    unique_indices = unique_url_indices(urls)
+    if len(unique_indices) < len(urls):
+        logging.info(f"{len(urls) - len(unique_indices)} URLs en double ignorées avant scraping")
+
+    async def collect():
+        found = 0
+        canonical_urls: Dict[str, str] = {}
+        unique_urls = [urls[index] for index in unique_indices]
+        async with aclosing(iter_scraped_pages(unique_urls, concurrency, per_host_limit, parse_workers)) as scraped:
+            async for unique_index, url, page in scraped:
+                index = unique_indices[unique_index]
+                if page and page.canonical_url in canonical_urls:
+                    logging.info(f"{url} est un doublon de {canonical_urls[page.canonical_url]}, ignoré")
+                    if on_skipped:
+                        on_skipped(index, url)
+                    continue
+                if page and not is_within_window(page, published_after):
+                    logging.info(f"{url} publié le {page.date}, hors de la fenêtre de publication, ignoré")
+                    if on_skipped:
+                        on_skipped(index, url)
+                    continue
+                if page:
+                    canonical_urls[page.canonical_url] = url
+                results[index] = page
+                if on_result:
+                    on_result(index, url, page)
+                if page:
+                    found += 1
+                    if max_pages is not None and found >= max_pages:
+                        break
+
+    if urls:
+        run_async(collect())
+        extraction_profiles.save()
+        remove_repeated_blocks(results)
+        logging.info(f"{sum(1 for page in results if page)} pages scrapées, "
+                     f"{sum(page.token_estimate or 0 for page in results if page)} tokens estimés")
+    return results
+
+def scrape_page(url: str) -> Optional[Page]:
+    return scrape_pages([url])[0]
+
+###############################
+# Détection des quasi-doublons (MinHash + LSH)
+###############################
+MINHASH_PERMUTATIONS = 128
+# 16 bandes de 8 lignes : deux pages deviennent candidates à partir d'environ 70 % de similarité
+MINHASH_BANDS = 16
+MINHASH_SHINGLE_WORDS = 5
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", 0.8))
+# Nombre maximum de candidats de l'archive vérifiés par page
+ARCHIVE_DUPLICATE_CANDIDATES = 50
+
+# Hachage universel (a·x + b) mod p avec p premier < 2^32 : a, x < p, donc a·x + b tient dans 64 bits
+# et le calcul uint64 de NumPy ne déborde jamais avant la réduction modulo p
+_MINHASH_PRIME = np.uint64(4294967291)
+# Incrémenté quand le calcul des signatures change : les signatures archivées d'une autre version sont recalculées
+MINHASH_VERSION = 2
+WORD_RE = re.compile(r"\w+")
+
+def _minhash_parameters(name: str) -> np.ndarray:
+    # Paramètres dérivés de façon déterministe : les signatures stockées dans MongoDB restent comparables
+    return np.array([
+        int.from_bytes(hashlib.blake2b(f"{name}{i}".encode(), digest_size=8).digest(), "little") % (int(_MINHASH_PRIME) - 1) + 1
+        for i in range(MINHASH_PERMUTATIONS)
+    ], dtype=np.uint64)
+
+_MINHASH_A = _minhash_parameters("minhash-a-")
+_MINHASH_B = _minhash_parameters("minhash-b-")
+
+def shingle_hashes(text: str) -> np.ndarray:
+    """Empreintes 32 bits des n-grammes de mots (shingles) du texte."""
+    words = WORD_RE.findall(text.lower())
+    shingles = {" ".join(words[i:i + MINHASH_SHINGLE_WORDS]) for i in range(len(words) - MINHASH_SHINGLE_WORDS + 1)}
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little") for shingle in shingles),
+        dtype=np.uint64, count=len(shingles),
+    )
+
+def minhash_signature(text: Optional[str]) -> Optional[np.ndarray]:
+    """Signature MinHash du texte (None si le texte est trop court pour être comparé)."""
+    if not text or text == "Contenu non trouvé":
+        return None
+    hashes = shingle_hashes(text)
+    if not hashes.size:
+        return None
+    permuted = (np.outer(hashes % _MINHASH_PRIME, _MINHASH_A) + _MINHASH_B) % _MINHASH_PRIME
+    return permuted.min(axis=0).astype(np.uint32)
+
+def minhash_similarity(signature: np.ndarray, other: np.ndarray) -> float:
+    """Estimation de la similarité de Jaccard entre les deux ensembles de shingles."""
+    return float(np.mean(signature == other))
+
+def lsh_bands(signature: np.ndarray) -> List[str]:
+    """Clés LSH : deux signatures qui partagent une clé sont candidates au doublon."""
+    rows = MINHASH_PERMUTATIONS // MINHASH_BANDS
+    return [
+        f"v{MINHASH_VERSION}:{band}:{hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8).hexdigest()}"
+        for band in range(MINHASH_BANDS)
+    ]
+
+class MinHashLSH:
+    """Index LSH en mémoire : clé de bande -> identifiants des signatures insérées."""
+
+    def __init__(self):
+        self.signatures: Dict[Any, np.ndarray] = {}
+        self.buckets: Dict[str, List[Any]] = {}
+
+    def insert(self, key, signature: np.ndarray) -> None:
+        self.signatures[key] = signature
+        for band in lsh_bands(signature):
+            self.buckets.setdefault(band, []).append(key)
+
+    def query(self, signature: np.ndarray, threshold: float = NEAR_DUPLICATE_THRESHOLD):
+        """Premier identifiant dont la similarité estimée atteint `threshold`, ou None."""
+        checked = set()
+        for band in lsh_bands(signature):
+            for key in self.buckets.get(band, []):
+                if key in checked:
+                    continue
+                checked.add(key)
+                if minhash_similarity(signature, self.signatures[key]) >= threshold:
+                    return key
+        return None
+
+def collapse_near_duplicates(pages: List[Optional[Page]], threshold: float = NEAR_DUPLICATE_THRESHOLD) -> List[Page]:
+    """
+    Regroupe les pages au contenu quasi identique (reprises de dépêches...).
+    La première page de chaque groupe est conservée, les liens des autres vont dans `alternate_links`.
+    """
+    index = MinHashLSH()
+    representatives: List[Page] = []
+    for page in pages:
+        if page is None:
+            continue
+        signature = minhash_signature(page.content)
+        duplicate_of = index.query(signature, threshold) if signature is not None else None
+        if duplicate_of is not None:
+            representative = representatives[duplicate_of]
+            representative.alternate_links.append(page.link)
+            logging.info(f"{page.link} est un quasi-doublon de {representative.link}")
+            continue
+        if signature is not None:
+            index.insert(len(representatives), signature)
+        representatives.append(page)
+    return representatives
+
+_minhash_index_ready = False
+
+def ensure_minhash_index(collection) -> None:
+    global _minhash_index_ready
+    if not _minhash_index_ready:
+        collection.create_index("minhash_bands")
+        _minhash_index_ready = True
+
+def find_archived_duplicate(collection, page: Page, threshold: float = NEAR_DUPLICATE_THRESHOLD) -> Optional[str]:
+    """Lien d'une page de l'archive MongoDB quasi identique à `page` (hors la page elle-même), ou None."""
+    signature = minhash_signature(page.content)
+    if signature is None:
+        return None
+    query = {
+        "minhash_bands": {"$in": lsh_bands(signature)},
+        "link": {"$nin": [page.link] + page.alternate_links},
+    }
+    if page.canonical_url:
+        query["canonical_url"] = {"$ne": page.canonical_url}
+    for doc in collection.find(query, {"link": 1, "minhash": 1}).limit(ARCHIVE_DUPLICATE_CANDIDATES):
+        other = np.frombuffer(doc["minhash"], dtype=np.uint32)
+        if other.size == signature.size and minhash_similarity(signature, other) >= threshold:
+            return doc["link"]
+    return None
+
+def deduplicate_pages(pages: List[Optional[Page]], against_archive: bool = False,
+                      threshold: float = NEAR_DUPLICATE_THRESHOLD) -> List[Page]:
+    """
+    Étape entre le scraping et la génération des résumés : un seul représentant par groupe de quasi-doublons.
+    Avec `against_archive`, les pages quasi identiques à une page déjà archivée sous un autre lien sont écartées.
+    """
+    representatives = collapse_near_duplicates(pages, threshold)
+    if not against_archive or not representatives:
+        return representatives
+    client = get_mongo_client()
+    if client is None:
+        return representatives
+    try:
+        collection = client.veille_db.pages
+        kept = []
+        for page in representatives:
+            archived_link = find_archived_duplicate(collection, page, threshold)
+            if archived_link:
+                logging.info(f"{page.link} est un quasi-doublon de {archived_link}, déjà archivé")
+            else:
+                kept.append(page)
+        return kept
+    except Exception as e:
+        logging.error(f"Erreur lors de la recherche de doublons dans l'archive : {e}")
+        return representatives
+    finally:
+        client.close()
+
+def index_archive_minhashes(batch_size: int = 500) -> int:
+    """Calcule les signatures MinHash manquantes (ou d'une version antérieure) des pages archivées. Retourne le nombre de pages indexées."""
+    client = get_mongo_client()
+    if client is None:
+        return 0
+    indexed = 0
+    try:
+        collection = client.veille_db.pages
+        ensure_minhash_index(collection)
+        while True:
+            docs = list(collection.find({"minhash_version": {"$ne": MINHASH_VERSION}}, {"content": 1}).limit(batch_size))
+            if not docs:
+                break
+            for doc in docs:
+                signature = minhash_signature(doc.get("content"))
+                update = {"minhash": signature.tobytes(), "minhash_bands": lsh_bands(signature)} if signature is not None else {"minhash_bands": []}
+                update["minhash_version"] = MINHASH_VERSION
+                collection.update_one({"_id": doc["_id"]}, {"$set": update})
+                indexed += signature is not None
+    except Exception as e:
+        logging.error(f"Erreur lors de l'indexation MinHash de l'archive : {e}")
+    finally:
+        client.close()
+    return indexed
+
+###############################
+# Recherche plein texte dans l'archive (index BM25 de l'API)
+###############################
+def index_pages_for_search(pages: List[Page]) -> int:
+    """Ajoute des pages à l'index BM25 de l'API. Retourne le nombre de pages nouvellement indexées."""
+    payload = [
+        {"url": page.canonical_url or page.link, "title": page.title or "", "content": page.content or "",
+         "date": str(page.date) if page.date else None}
+        for page in pages if page
+    ]
+    if not payload:
+        return 0
+    try:
+        resp = http_request("POST", f"{API_URL}/search_index/pages", json=payload)
+        resp.raise_for_status()
+        return resp.json().get("added", 0)
+    except (requests.RequestException, ValueError) as e:
+        logging.error(f"Erreur lors de l'indexation plein texte : {e}")
+        return 0
+
+# Les pages archivées sont envoyées à l'index par lots, hors du fil de l'interface
+SEARCH_INDEX_FLUSH_DELAY = float(os.getenv("SEARCH_INDEX_FLUSH_DELAY", 2))
+SEARCH_INDEX_BATCH_SIZE = 100
+
+_pending_search_pages: List[Page] = []
+_pending_search_lock = threading.Lock()
+_pending_search_timer: Optional[threading.Timer] = None
+
+def queue_page_for_search(page: Page) -> None:
+    """
+    Met une page en attente d'indexation. Les pages d'un même passage de scraping partent
+    ensemble, SEARCH_INDEX_FLUSH_DELAY secondes après la première, en tâche de fond.
+    """
+    global _pending_search_timer
+    with _pending_search_lock:
+        _pending_search_pages.append(page)
+        if _pending_search_timer is None:
+            _pending_search_timer = threading.Timer(SEARCH_INDEX_FLUSH_DELAY, flush_search_index)
+            _pending_search_timer.daemon = True
+            _pending_search_timer.start()
+
+def flush_search_index() -> int:
+    """Envoie les pages en attente à l'index BM25 de l'API, par lots. Retourne le nombre de pages indexées."""
+    global _pending_search_timer
+    with _pending_search_lock:
+        pages = list(_pending_search_pages)
+        _pending_search_pages.clear()
+        if _pending_search_timer is not None:
+            _pending_search_timer.cancel()
+            _pending_search_timer = None
+    return sum(
+        index_pages_for_search(pages[start:start + SEARCH_INDEX_BATCH_SIZE])
+        for start in range(0, len(pages), SEARCH_INDEX_BATCH_SIZE)
+    )
+
+atexit.register(flush_search_index)
+
+def search_archive(query: str, k: int = 10) -> List[dict]:
+    """Pages archivées les plus pertinentes pour `query` (url, title, date, score)."""
+    try:
+        resp = http_request("GET", f"{API_URL}/search", params={"q": query, "k": k})
+        resp.raise_for_status()
+        return resp.json().get("results", [])
+    except (requests.RequestException, ValueError) as e:
+        logging.error(f"Erreur lors de la recherche dans l'archive : {e}")
+        return []
+
+def index_archive_pages(batch_size: int = 200) -> int:
+    """Indexe dans BM25 les pages déjà archivées dans MongoDB (reprise de l'existant)."""
+    client = get_mongo_client()
+    if client is None:
+        return 0
+    indexed = 0
+    try:
+        batch = []
+        for doc in client.veille_db.pages.find({}, {"title": 1, "link": 1, "content": 1, "date": 1, "canonical_url": 1}):
+            batch.append(Page(
+                date=doc.get("date"), title=doc.get("title"), link=doc.get("link"), description="",
+                content=doc.get("content"), author=None, image_url=None, canonical_url=doc.get("canonical_url"),
+            ))
+            if len(batch) >= batch_size:
+                indexed += index_pages_for_search(batch)
+                batch = []
+        indexed += index_pages_for_search(batch)
+    except Exception as e:
+        logging.error(f"Erreur lors de l'indexation plein texte de l'archive : {e}")
+    finally:
+        client.close()
+    return indexed
+
+###############################
+# Crawl incrémental des sources
+###############################
+SEEN_URLS_BLOOM_PATH = os.getenv("SEEN_URLS_BLOOM_PATH", os.path.join(VEILLE_CACHE_DIR, "seen_urls.bloom"))
+SEEN_URLS_BLOOM_CAPACITY = int(os.getenv("SEEN_URLS_BLOOM_CAPACITY", 200000))
+SEEN_URLS_BLOOM_ERROR_RATE = 0.01
 
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+# Liens d'articles des pages sources (anciens sélecteurs CSS de l'onglet 3)
+SOURCE_LISTING_LINKS = etree.XPath(
+    f"//h2[{_has_class('entry-title')} and {_has_class('ast-blog-single-element')}]//a/@href"
+    f" | //div[{_has_class('td-module-thumb')}]//a/@href"
+    f" | //div[{_has_class('tds_module_loop_1')}]//a/@href",
+    smart_strings=False,
+)
+
+def extract_listing_links(source_url: str, content: bytes, limit: Optional[int] = None) -> List[str]:
+    """Liens d'articles d'une page source, absolus, sans doublons (URL canonique), dans l'ordre de la page."""
+    links: Dict[str, str] = {}
+    for href in SOURCE_LISTING_LINKS(parse_html(content)):
+        link = urljoin(source_url, href.strip())
+        if link.startswith("http"):
+            links.setdefault(canonicalize_url(link), link)
+    links = list(links.values())
+    return links[:limit] if limit else links
+
+def crawl_source_listing(source_url: str, limit: Optional[int] = None) -> Optional[List[str]]:
+    """Télécharge une page source et retourne ses liens d'articles (None si la page est inaccessible)."""
+    content = fetch_page(source_url)
+    if content is None:
+        return None
+    try:
+        return extract_listing_links(source_url, content, limit)
     except Exception as e:
-        logging.error(f"Erreur lors du scraping de {url} : {e}")
+        logging.error(f"Erreur lors de l'analyse de la page source {source_url} : {e}")
         return None
 
-def is_valid_image_url(url):
+class BloomFilter:
+    """Filtre de Bloom : aucun faux négatif, faux positifs à environ `error_rate`."""
+
+    def __init__(self, capacity: int = SEEN_URLS_BLOOM_CAPACITY, error_rate: float = SEEN_URLS_BLOOM_ERROR_RATE):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.num_hashes))
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+class SeenUrlIndex:
+    """
+    Index des URLs d'articles déjà traitées, par source.
+    Le stock exact est en MySQL (via l'API) ; un filtre de Bloom local, persisté sur disque
+    et synchronisé de façon incrémentale, évite d'interroger l'API pour les URLs jamais vues.
+    Les URLs sont enregistrées et comparées sous leur forme canonique.
+    """
+
+    def __init__(self, path: str = SEEN_URLS_BLOOM_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._bloom: Optional[BloomFilter] = None
+        self._synced_at: Dict[str, str] = {}
+        self._synced_this_run = set()
+
+    @staticmethod
+    def _key(source_url: str, url: str) -> str:
+        return f"{source_url}\n{url}"
+
+    def _load(self) -> BloomFilter:
+        if self._bloom is None:
+            self._bloom = BloomFilter()
+            try:
+                with open(self.path, "rb") as f:
+                    bits = f.read()
+                with open(f"{self.path}.json", "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                if len(bits) == len(self._bloom.bits) and meta.get("size") == self._bloom.size:
+                    self._bloom.bits = bytearray(bits)
+                    self._synced_at = meta.get("synced_at", {})
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                logging.error(f"Filtre de Bloom illisible ({self.path}), reconstruction depuis l'API : {e}")
+        return self._bloom
+
+    def _save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(f"{self.path}.tmp", "wb") as f:
+                f.write(self._bloom.bits)
+            os.replace(f"{self.path}.tmp", self.path)
+            with open(f"{self.path}.json", "w", encoding="utf-8") as f:
+                json.dump({"size": self._bloom.size, "synced_at": self._synced_at}, f)
+        except OSError as e:
+            logging.error(f"Erreur lors de la sauvegarde du filtre de Bloom : {e}")
+
+    def _sync(self, source_url: str) -> None:
+        """Ajoute au filtre les URLs enregistrées en base depuis la dernière synchronisation."""
+        if source_url in self._synced_this_run:
+            return
+        params = {"source_url": source_url}
+        if source_url in self._synced_at:
+            params["since"] = self._synced_at[source_url]
+        resp = http_request("GET", f"{API_URL}/seen_urls", params=params)
+        resp.raise_for_status()
+        data = resp.json()
+        for url in data["urls"]:
+            self._bloom.add(self._key(source_url, canonicalize_url(url)))
+        self._synced_at[source_url] = data["synced_at"]
+        self._synced_this_run.add(source_url)
+        self._save()
+
+    def filter_new(self, source_url: str, urls: List[str]) -> List[str]:
+        """Retourne, dans l'ordre, les URLs jamais traitées pour cette source."""
+        canonical = {url: canonicalize_url(url) for url in urls}
+        with self._lock:
+            bloom = self._load()
+            try:
+                self._sync(source_url)
+            except (requests.RequestException, KeyError, ValueError) as e:
+                logging.error(f"Synchronisation des URLs vues impossible pour {source_url} : {e}")
+            maybe_seen = list(dict.fromkeys(canonical[url] for url in urls if self._key(source_url, canonical[url]) in bloom))
+        seen = set()
+        if maybe_seen:
+            try:
+                resp = http_request("POST", f"{API_URL}/seen_urls/check", json={"source_url": source_url, "urls": maybe_seen})
+                resp.raise_for_status()
+                seen = set(resp.json()["seen"])
+            except (requests.RequestException, KeyError, ValueError) as e:
+                # Sans l'API, on se fie au filtre (quelques faux positifs possibles)
+                logging.error(f"Vérification des URLs vues impossible pour {source_url} : {e}")
+                seen = set(maybe_seen)
+        return [url for url in dict.fromkeys(urls) if canonical[url] not in seen]
+
+    def mark_seen(self, source_url: str, urls: List[str]) -> None:
+        """Enregistre des URLs comme traitées et avance le curseur de dernier passage de la source."""
+        urls = list(dict.fromkeys(canonicalize_url(url) for url in urls))
+        try:
+            resp = http_request("POST", f"{API_URL}/seen_urls", json={"source_url": source_url, "urls": urls})
+            resp.raise_for_status()
+        except requests.RequestException as e:
+            logging.error(f"Erreur lors de l'enregistrement des URLs vues pour {source_url} : {e}")
+            return
+        with self._lock:
+            bloom = self._load()
+            for url in urls:
+                bloom.add(self._key(source_url, url))
+            self._save()
+
+    def last_run(self, source_url: str) -> Optional[str]:
+        """Date du dernier passage enregistré pour la source (curseur "depuis le dernier passage")."""
+        try:
+            resp = http_request("GET", f"{API_URL}/crawl_cursor", params={"source_url": source_url})
+            resp.raise_for_status()
+            return resp.json().get("last_run")
+        except (requests.RequestException, ValueError) as e:
+            logging.error(f"Erreur lors de la lecture du curseur de {source_url} : {e}")
+            return None
+
+seen_url_index = SeenUrlIndex()
+
+def crawl_sources_incremental(source_urls: List[str], limit: Optional[int] = None) -> Dict[str, Optional[List[str]]]:
+    """
+    Télécharge les pages sources en parallèle et ne retourne, par source, que les liens
+    d'articles jamais traités (None si la page source est inaccessible).
+    """
+    listings = run_concurrently(crawl_source_listing, source_urls)
+    new_links = {}
+    for source_url, links in zip(source_urls, listings):
+        if links is None:
+            new_links[source_url] = None
+            continue
+        fresh_links = seen_url_index.filter_new(source_url, links)
+        new_links[source_url] = fresh_links[:limit] if limit else fresh_links
+    return new_links
+
+###############################
+# Validation des images (cartes)
+###############################
+IMAGE_CHECK_TTL = int(os.getenv("IMAGE_CHECK_TTL", 24 * 3600))
+IMAGE_CHECK_CONCURRENCY = int(os.getenv("IMAGE_CHECK_CONCURRENCY", 12))
+
+# url -> (image valide, horodatage de la vérification) ; conservé entre les reruns Streamlit
+_image_checks: Dict[str, Tuple[bool, float]] = {}
+_image_checks_lock = threading.Lock()
+
+def check_image_url(url: str) -> bool:
+    """Vérifie par HEAD (ou GET si HEAD est refusé) qu'une URL renvoie une image."""
     try:
-        response = requests.head(url, allow_redirects=True)
+        response = http_request("HEAD", url, allow_redirects=True)
+        if response.status_code in (403, 405, 501):
+            with http_request("GET", url, allow_redirects=True, stream=True) as response:
+                pass
         return response.status_code == 200 and response.headers.get("content-type", "").startswith("image/")
     except requests.RequestException:
         return False
 
+def get_cached_image_check(url: str) -> Optional[bool]:
+    with _image_checks_lock:
+        cached = _image_checks.get(url)
+    if cached and time.time() - cached[1] < IMAGE_CHECK_TTL:
+        return cached[0]
+    return None
+
+def is_valid_image_url(url):
+    valid = get_cached_image_check(url)
+    if valid is None:
+        valid = check_image_url(url)
+        with _image_checks_lock:
+            _image_checks[url] = (valid, time.time())
+    return valid
+
+def validate_image_urls(urls, concurrency: int = IMAGE_CHECK_CONCURRENCY) -> Dict[str, bool]:
+    """
+    Vérifie en un seul lot, en parallèle, toutes les images d'une grille de cartes.
+    Les résultats sont mis en cache IMAGE_CHECK_TTL secondes : un rerun ne refait aucune requête.
+    """
+    results = {}
+    to_check = []
+    for url in dict.fromkeys(url for url in urls if url):
+        valid = get_cached_image_check(url)
+        if valid is None:
+            to_check.append(url)
+        else:
+            results[url] = valid
+
+    if to_check:
+        now = time.time()
+        checked = run_concurrently(check_image_url, to_check, concurrency)
+        with _image_checks_lock:
+            for url, valid in zip(to_check, checked):
+                _image_checks[url] = (valid, now)
+                results[url] = valid
+    return results
+
 ###############################
 # Fonctions de génération
 ###############################
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2:3b")
+# Requêtes Ollama simultanées (à accorder avec OLLAMA_NUM_PARALLEL côté serveur)
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", 4))
+SUMMARY_MAX_RETRIES = 3
+SUMMARY_RETRY_DELAY = 2
+# Contexte demandé à Ollama (num_ctx) et part réservée à la réponse : les prompts sont construits pour tenir dedans
+OLLAMA_CONTEXT_TOKENS = int(os.getenv("OLLAMA_CONTEXT_TOKENS", 8192))
+SUMMARY_OUTPUT_TOKENS = int(os.getenv("SUMMARY_OUTPUT_TOKENS", 1024))
+# Maintien du modèle en mémoire (keep_alive Ollama) : long pendant les heures de veille, court sinon
+OLLAMA_KEEP_ALIVE_ACTIVE = os.getenv("OLLAMA_KEEP_ALIVE_ACTIVE", "2h")
+OLLAMA_KEEP_ALIVE_IDLE = os.getenv("OLLAMA_KEEP_ALIVE_IDLE", "5m")
+# Heures actives, heure locale, du lundi au vendredi : "8-19"
+OLLAMA_ACTIVE_HOURS = os.getenv("OLLAMA_ACTIVE_HOURS", "8-19")
+# Nombre de requêtes dont les mesures (tokens, durées) sont conservées
+GENERATION_STATS_SIZE = 200
+SUMMARY_CACHE_PATH = os.getenv("SUMMARY_CACHE_PATH", os.path.join(VEILLE_CACHE_DIR, "summary_cache.sqlite"))
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", 5000))
+
+class SummaryCache(SqliteStore):
+    """
+    Cache persistant des résumés, adressé par le contenu (voir summary_cache_key) : un même article
+    n'est résumé qu'une fois, quel que soit l'onglet ou la liste de thèmes qui l'a ramené.
+    Au-delà de `max_entries` les résumés les moins récemment utilisés sont supprimés.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS summary_cache (
+            key TEXT PRIMARY KEY,
+            summary TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_summary_cache_access ON summary_cache (last_access)",
+    )
+
+    def __init__(self, path: str = SUMMARY_CACHE_PATH, max_entries: int = SUMMARY_CACHE_MAX_ENTRIES):
+        super().__init__(path)
+        self.max_entries = max_entries
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            with self._connection() as conn:
+                row = conn.execute("SELECT summary FROM summary_cache WHERE key=?", (key,)).fetchone()
+                if row:
+                    conn.execute("UPDATE summary_cache SET last_access=? WHERE key=?", (time.time(), key))
+            return row[0] if row else None
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"Erreur de lecture du cache de résumés : {e}")
+            return None
+
+    def store(self, key: str, summary: str) -> None:
+        now = time.time()
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO summary_cache (key, summary, created_at, last_access) VALUES (?, ?, ?, ?)",
+                    (key, summary, now, now),
+                )
+                conn.execute(
+                    "DELETE FROM summary_cache WHERE key IN "
+                    "(SELECT key FROM summary_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"Erreur d'écriture du cache de résumés : {e}")
+
+    def clear(self) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM summary_cache")
+
+summary_cache = SummaryCache()
+
+def summary_cache_key(article_text: str, system_prompt: str, user_prompt: str, model: Optional[str] = None) -> str:
+    """
+    Clé d'un résumé : contenu normalisé de l'article, gabarit du prompt (l'article retiré du
+    prompt utilisateur, espaces normalisés) et modèle. Changer de prompt ou de modèle invalide le cache.
+    """
+    template = user_prompt.replace(article_text, "{article}") if article_text else user_prompt
+    parts = (article_text or "", system_prompt, template)
+    key = "\x1f".join([" ".join(part.split()) for part in parts] + [model or OLLAMA_MODEL])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+@dataclass
+class BuiltPrompt:
+    text: str
+    tokens: int                 # tokens estimés du prompt complet
+    document_tokens: List[int]  # tokens retenus pour chaque document
+    truncated: int = 0          # documents tronqués pour tenir dans le contexte
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """Coupe le texte à `max_tokens` (estimés), sur une frontière de mot."""
+    max_chars = int(max_tokens * token_counter.chars_per_token(model))
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(None, 1)[0] + " […]" if max_chars > 0 else ""
+
+def build_prompt(system_prompt: str, user_prompt: str, documents: List[str],
+                 context_tokens: Optional[int] = None, output_tokens: Optional[int] = None,
+                 model: Optional[str] = None) -> BuiltPrompt:
+    """
+    Assemble consignes puis documents, chacun une seule fois, dans le contexte du modèle.
+    Les consignes, communes à tout un lot, viennent en tête : c'est le préfixe réutilisé par Ollama.
+    Un document déjà recopié dans `user_prompt` en est retiré (il est placé après les consignes).
+    Si les documents dépassent le budget (contexte - réponse - consignes), chacun reçoit une part
+    équitable : les plus courts restent entiers, les plus longs sont tronqués au reste.
+    """
+    context_tokens = context_tokens or OLLAMA_CONTEXT_TOKENS
+    output_tokens = SUMMARY_OUTPUT_TOKENS if output_tokens is None else output_tokens
+    documents = list(dict.fromkeys(doc.strip() for doc in documents if doc and doc.strip()))
+    for doc in documents:
+        user_prompt = user_prompt.replace(doc, "")
+    instructions = "\n\n".join(part.strip() for part in (system_prompt, user_prompt) if part and part.strip())
+
+    sizes = [estimate_tokens(doc, model) for doc in documents]
+    allocation = list(sizes)
+    available = context_tokens - output_tokens - estimate_tokens(instructions, model) - 2 * len(documents)
+    if sum(sizes) > available:
+        remaining = max(available, 0)
+        order = sorted(range(len(documents)), key=sizes.__getitem__)
+        for rank, i in enumerate(order):
+            allocation[i] = min(sizes[i], remaining // (len(order) - rank))
+            remaining -= allocation[i]
+    fitted = [doc if allocation[i] >= sizes[i] else truncate_to_tokens(doc, allocation[i], model) for i, doc in enumerate(documents)]
+    text = "\n\n".join([instructions] + [doc for doc in fitted if doc])
+    return BuiltPrompt(
+        text=text,
+        tokens=estimate_tokens(text, model),
+        document_tokens=[estimate_tokens(doc, model) for doc in fitted],
+        truncated=sum(allocation[i] < sizes[i] for i in range(len(documents))),
+    )
+
+def ollama_options() -> Dict[str, Any]:
+    # Toujours le même num_ctx : un changement d'options obligerait Ollama à recharger le modèle
+    return {"num_ctx": OLLAMA_CONTEXT_TOKENS}
+
+def parse_duration(value: str) -> float:
+    """Durée au format keep_alive d'Ollama ("30s", "5m", "2h", secondes) ; négative = illimitée."""
+    value = str(value).strip()
+    units = {"s": 1, "m": 60, "h": 3600}
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+@dataclass
+class GenerationStats:
+    model: str
+    prompt_tokens: Optional[int]
+    output_tokens: Optional[int]
+    estimated_tokens: int
+    load_ms: float        # chargement du modèle (0 si déjà en mémoire)
+    prefill_ms: float     # évaluation du prompt (faible quand le préfixe est servi par le cache KV)
+    generation_ms: float  # génération des tokens de réponse
+    total_ms: float
+    at: float
+
+class OllamaModelManager:
+    """
+    Cycle de vie du modèle Ollama : préchargement au démarrage de l'application, keep_alive selon
+    les heures de veille, et mesures de chaque requête (tokens, chargement, prefill, génération).
+    Les prompts sont construits avec les consignes communes en tête (build_prompt) : d'un article
+    à l'autre le préfixe est identique et Ollama réutilise son cache KV au lieu de le réévaluer.
+    """
+
+    def __init__(self, model: Optional[str] = None):
+        self.model = model or OLLAMA_MODEL
+        self._lock = threading.Lock()
+        self._warming = False
+        self.last_used = 0.0
+        self.stats: deque = deque(maxlen=GENERATION_STATS_SIZE)
+
+    def keep_alive(self, now: Optional[datetime] = None) -> str:
+        now = now or datetime.now()
+        start, end = (int(hour) for hour in OLLAMA_ACTIVE_HOURS.split("-"))
+        active = now.weekday() < 5 and start <= now.hour < end
+        return OLLAMA_KEEP_ALIVE_ACTIVE if active else OLLAMA_KEEP_ALIVE_IDLE
+
+    def request_args(self) -> Dict[str, Any]:
+        """Arguments communs à tous les appels chat : mêmes options et keep_alive du moment."""
+        return {"options": ollama_options(), "keep_alive": self.keep_alive()}
+
+    def is_probably_loaded(self) -> bool:
+        """Vrai si le dernier appel date de moins que le keep_alive en cours."""
+        keep_alive = parse_duration(self.keep_alive())
+        return bool(self.last_used) and (keep_alive < 0 or time.time() - self.last_used < keep_alive)
+
+    def warm_up(self) -> Optional[float]:
+        """Charge le modèle (prompt vide) ; retourne la durée de chargement en ms, None en cas d'échec."""
+        try:
+            response = ollama.generate(model=self.model, prompt="", **self.request_args())
+            self.last_used = time.time()
+            load_ms = (response.get("load_duration") or 0) / 1e6
+            logging.info(f"Modèle {self.model} préchargé en {load_ms:.0f} ms (keep_alive {self.keep_alive()})")
+            return load_ms
+        except Exception as e:
+            logging.warning(f"Préchargement du modèle {self.model} impossible : {e}")
+            return None
+        finally:
+            with self._lock:
+                self._warming = False
+
+    def ensure_warm(self) -> None:
+        """Précharge le modèle en arrière-plan s'il a pu être déchargé (à appeler au démarrage)."""
+        with self._lock:
+            if self._warming or self.is_probably_loaded():
+                return
+            self._warming = True
+        threading.Thread(target=self.warm_up, daemon=True).start()
+
+    def record(self, prompt: BuiltPrompt, response) -> GenerationStats:
+        """Enregistre les mesures d'une réponse Ollama (durées en nanosecondes dans la réponse)."""
+        def ms(key):
+            return (response.get(key) or 0) / 1e6
+
+        stats = GenerationStats(
+            model=self.model,
+            prompt_tokens=response.get("prompt_eval_count"),
+            output_tokens=response.get("eval_count"),
+            estimated_tokens=prompt.tokens,
+            load_ms=ms("load_duration"),
+            prefill_ms=ms("prompt_eval_duration"),
+            generation_ms=ms("eval_duration"),
+            total_ms=ms("total_duration"),
+            at=time.time(),
+        )
+        self.last_used = stats.at
+        self.stats.append(stats)
+        return stats
+
+    def summary(self) -> Dict[str, Any]:
+        """Moyennes sur les requêtes récentes (pour l'affichage)."""
+        stats = list(self.stats)
+        if not stats:
+            return {"requêtes": 0}
+
+        def mean(values):
+            values = [value for value in values if value is not None]
+            return round(sum(values) / len(values), 1) if values else None
+
+        generation_s = sum(stat.generation_ms for stat in stats) / 1000
+        return {
+            "requêtes": len(stats),
+            "tokens de prompt (moy.)": mean(stat.prompt_tokens for stat in stats),
+            "tokens générés (moy.)": mean(stat.output_tokens for stat in stats),
+            "chargement ms (moy.)": mean(stat.load_ms for stat in stats),
+            "prefill ms (moy.)": mean(stat.prefill_ms for stat in stats),
+            "génération ms (moy.)": mean(stat.generation_ms for stat in stats),
+            "tokens/s": round(sum(stat.output_tokens or 0 for stat in stats) / generation_s, 1) if generation_s else None,
+        }
+
+ollama_manager = OllamaModelManager()
+
+def record_generation(prompt: BuiltPrompt, response) -> None:
+    """Journalise les tokens et durées d'une requête (estimés / mesurés par Ollama) et recale le compteur."""
+    stats = ollama_manager.record(prompt, response)
+    token_counter.observe(len(prompt.text), stats.prompt_tokens)
+    truncated = f", {prompt.truncated} document(s) tronqué(s)" if prompt.truncated else ""
+    logging.info(
+        f"Ollama {stats.model} : prompt {stats.prompt_tokens} tokens (estimé {prompt.tokens}{truncated}), "
+        f"réponse {stats.output_tokens} tokens ; chargement {stats.load_ms:.0f} ms, "
+        f"prefill {stats.prefill_ms:.0f} ms, génération {stats.generation_ms:.0f} ms"
+    )
+
+def is_generation_error(summary: Optional[str]) -> bool:
+    """Les erreurs d'appel sont rendues comme texte : elles ne doivent pas être mises en cache."""
+    return not summary or summary.startswith("Erreur lors de l'appel à l'API")
+
 def generate_summary(article_text: str, system_prompt: str, user_prompt: str) -> str:
-    max_retries = 3
-    retry_delay = 2
-    
+    max_retries = SUMMARY_MAX_RETRIES
+    retry_delay = SUMMARY_RETRY_DELAY
+    key = summary_cache_key(article_text, system_prompt, user_prompt)
+    cached = summary_cache.get(key)
+    if cached is not None:
+        return cached
+
+    prompt = build_prompt(system_prompt, user_prompt, [article_text])
     for attempt in range(max_retries):
         try:
-            prompt = f"{system_prompt}\n\n{user_prompt}\n\n{article_text}"
             response = ollama.chat(
-                model='llama3.2:3b',
+                model=OLLAMA_MODEL,
                 messages=[{
                     "role": "user",
-                    "content": prompt
-                }]
+                    "content": prompt.text
+                }],
+                **ollama_manager.request_args(),
             )
-            return response['message']['content']
+            record_generation(prompt, response)
+            summary = response['message']['content']
+            if not is_generation_error(summary):
+                summary_cache.store(key, summary)
+            return summary
         except Exception as e:
             if attempt == max_retries - 1:
                 return f"Erreur lors de l'appel à l'API après {max_retries} tentatives : {str(e)}"
             print(f"Tentative {attempt + 1} échouée : {e}")
             time.sleep(retry_delay)
 
-def generate_answer(question: str, context: str) -> str:
-    try:
-        prompt = f"""Vous êtes un assistant expert en veille stratégique. Votre tâche est de répondre aux questions basées sur les articles fournis.
+def generate_summaries(pages: List[Any], prompts: List[Tuple[str, str]], concurrency: int = SUMMARY_CONCURRENCY,
+                       on_result: Optional[Callable[[int, str], None]] = None) -> List[str]:
+    """
+    Génère les résumés d'un lot d'articles en parallèle avec le client Ollama asynchrone.
+    `pages` : des Page ou directement des textes ; `prompts` : un couple (system_prompt, user_prompt) par article.
+    Au plus `concurrency` requêtes sont en cours à la fois. Chaque article a ses propres tentatives :
+    un échec donne le même message d'erreur que generate_summary, sans interrompre les autres.
+    Retourne les résumés dans l'ordre des articles ; `on_result(index, résumé)` est appelé dès qu'un résumé est prêt.
+    Les résumés déjà en cache (summary_cache) sont rendus sans appel à Ollama.
+    """
+    if len(pages) != len(prompts):
+        raise ValueError("pages et prompts doivent avoir la même longueur")
+    results: List[Optional[str]] = [None] * len(pages)
+    texts = [page.content if isinstance(page, Page) else page for page in pages]
+    keys = [
+        summary_cache_key(article_text, system_prompt, user_prompt)
+        for article_text, (system_prompt, user_prompt) in zip(texts, prompts)
+    ]
+    missing = []
+    for index, key in enumerate(keys):
+        results[index] = summary_cache.get(key)
+        if results[index] is None:
+            missing.append(index)
+        elif on_result:
+            on_result(index, results[index])
+
+    async def run_all():
+        client = ollama.AsyncClient()
+        limit = asyncio.Semaphore(max(1, concurrency))
+
+        async def run_one(index: int, article_text: str, system_prompt: str, user_prompt: str):
+            prompt = build_prompt(system_prompt, user_prompt, [article_text])
+            for attempt in range(SUMMARY_MAX_RETRIES):
+                try:
+                    async with limit:
+                        response = await client.chat(model=OLLAMA_MODEL, messages=[{"role": "user", "content": prompt.text}],
+                                                     **ollama_manager.request_args())
+                    record_generation(prompt, response)
+                    summary = response['message']['content']
+                    break
+                except Exception as e:
+                    if attempt == SUMMARY_MAX_RETRIES - 1:
+                        summary = f"Erreur lors de l'appel à l'API après {SUMMARY_MAX_RETRIES} tentatives : {str(e)}"
+                        break
+                    logging.warning(f"Résumé {index + 1}, tentative {attempt + 1} échouée : {e}")
+                    # L'attente se fait hors du sémaphore : elle ne bloque pas les autres articles
+                    await asyncio.sleep(SUMMARY_RETRY_DELAY)
+            if not is_generation_error(summary):
+                summary_cache.store(keys[index], summary)
+            results[index] = summary
+            if on_result:
+                on_result(index, summary)
+
+        await asyncio.gather(*(run_one(index, texts[index], *prompts[index]) for index in missing))
+
+    if missing:
+        run_async(run_all())
+    return results
+
+def answer_prompt(question: str, context: str) -> BuiltPrompt:
+    instructions = f"""Vous êtes un assistant expert en veille stratégique. Votre tâche est de répondre aux questions basées sur les articles fournis.
 
 Question : {question}
-Contexte : {context}"""
+Contexte :"""
+    return build_prompt(instructions, "", [context])
+
+def generate_answer(question: str, context: str) -> str:
+    try:
+        prompt = answer_prompt(question, context)
 
         response = ollama.chat(
-            model='llama3.2:3b',
+            model=OLLAMA_MODEL,
             messages=[{
                 "role": "user",
-                "content": prompt
-            }]
+                "content": prompt.text
+            }],
+            **ollama_manager.request_args(),
         )
+        record_generation(prompt, response)
         return response['message']['content']
     except Exception as e:
         return f"Erreur lors de l'appel à l'API : {str(e)}"
 
+def stream_chat(prompt: BuiltPrompt) -> Iterator[str]:
+    """
+    Variante en flux de l'appel Ollama : produit les tokens au fur et à mesure de la génération.
+    Les nouvelles tentatives n'ont lieu qu'avant le premier token ; une erreur en cours de flux
+    est ajoutée au texte déjà produit. Les erreurs sont rendues comme texte, comme pour generate_summary.
+    """
+    for attempt in range(SUMMARY_MAX_RETRIES):
+        started = False
+        try:
+            for chunk in ollama.chat(model=OLLAMA_MODEL, messages=[{"role": "user", "content": prompt.text}],
+                                     **ollama_manager.request_args(), stream=True):
+                token = chunk['message']['content']
+                if token:
+                    started = True
+                    yield token
+                if chunk.get("done"):
+                    record_generation(prompt, chunk)
+            return
+        except Exception as e:
+            if started:
+                yield f"\n\nErreur lors de l'appel à l'API : {str(e)}"
+                return
+            if attempt == SUMMARY_MAX_RETRIES - 1:
+                yield f"Erreur lors de l'appel à l'API après {SUMMARY_MAX_RETRIES} tentatives : {str(e)}"
+                return
+            logging.warning(f"Tentative {attempt + 1} échouée : {e}")
+            time.sleep(SUMMARY_RETRY_DELAY)
+
+def stream_summary(article_text: str, system_prompt: str, user_prompt: str) -> Iterator[str]:
+    """Même prompt et même cache que generate_summary, réponse en flux (st.write_stream)."""
+    key = summary_cache_key(article_text, system_prompt, user_prompt)
+    cached = summary_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+    tokens = []
+    for token in stream_chat(build_prompt(system_prompt, user_prompt, [article_text])):
+        tokens.append(token)
+        yield token
+    summary = "".join(tokens)
+    if not is_generation_error(summary) and "Erreur lors de l'appel à l'API" not in summary:
+        summary_cache.store(key, summary)
+
+def stream_answer(question: str, context: str) -> Iterator[str]:
+    """Même prompt que generate_answer, réponse en flux."""
+    return stream_chat(answer_prompt(question, context))
+
+###############################
+# Synthèse de corpus (map-reduce)
+###############################
+# Tokens de contenu par appel au modèle (garder de la marge sous OLLAMA_CONTEXT_TOKENS pour le prompt et la réponse)
+SYNTHESIS_TOKEN_BUDGET = int(os.getenv("SYNTHESIS_TOKEN_BUDGET", 3000))
+
+MAP_SYSTEM_PROMPT = """Vous êtes un expert en veille stratégique. Résumez fidèlement l'extrait d'article fourni :
+points clés, acteurs, chiffres et innovations notables. Pas d'introduction ni de conclusion, 150 mots maximum."""
+ARTICLE_REDUCE_SYSTEM_PROMPT = """Vous êtes un expert en veille stratégique. Fusionnez les résumés partiels d'un même article
+en un résumé unique, sans répétition, en conservant les points clés, acteurs et chiffres. 200 mots maximum."""
+CORPUS_REDUCE_SYSTEM_PROMPT = """Vous êtes un expert en veille stratégique. Fusionnez les résumés d'articles suivants en une synthèse
+intermédiaire : tendances communes, puis points clés propres à chaque article en citant son titre. 300 mots maximum."""
+
+def split_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """Découpe un texte en morceaux d'au plus `max_tokens` tokens, aux paragraphes puis aux mots."""
+    max_chars = int(max_tokens * token_counter.chars_per_token())
+    pieces = []
+    for paragraph in (p.strip() for p in text.split("\n")):
+        if len(paragraph) <= max_chars:
+            if paragraph:
+                pieces.append(paragraph)
+            continue
+        words, current = paragraph.split(), []
+        for word in words:
+            if current and len(" ".join(current)) + len(word) + 1 > max_chars:
+                pieces.append(" ".join(current))
+                current = []
+            current.append(word)
+        if current:
+            pieces.append(" ".join(current))
+
+    chunks, current, size = [], [], 0
+    for piece in pieces:
+        if current and size + len(piece) + 1 > max_chars:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+def pack_under_budget(texts: List[str], token_budget: int) -> List[List[str]]:
+    """
+    Regroupe des textes consécutifs sous le budget de tokens. Un groupe contient au moins deux textes
+    (quand il en reste deux) pour que chaque niveau de réduction divise au moins par deux leur nombre.
+    L'ordre est conservé : ajouter un article en fin de corpus ne modifie que le dernier groupe.
+    """
+    groups, current, size = [], [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if len(current) >= 2 and size + tokens > token_budget:
+            groups.append(current)
+            current, size = [], 0
+        current.append(text)
+        size += tokens
+    if current:
+        if len(current) == 1 and groups:
+            groups[-1].append(current[0])
+        else:
+            groups.append(current)
+    return groups
+
+def format_corpus(pages: List[Page]) -> str:
+    return "\n\n".join(f"### {page.title}\nURL : {page.link}\n{page.content}" for page in pages)
+
+def corpus_synthesis_context(pages: List[Page], token_budget: int = SYNTHESIS_TOKEN_BUDGET,
+                             concurrency: int = SUMMARY_CONCURRENCY,
+                             on_progress: Optional[Callable[[str, int, int], None]] = None) -> str:
+    """
+    Prépare le contenu de la synthèse finale d'un corpus sans dépasser le contexte du modèle.
+    Si le corpus tient dans `token_budget`, il est rendu tel quel. Sinon :
+    - map : chaque article (découpé s'il est trop long) est résumé, tous les morceaux en parallèle ;
+    - réduction : les résumés sont regroupés sous le budget et fusionnés, niveau par niveau,
+      jusqu'à tenir dans un seul appel.
+    Tous les appels passent par generate_summaries, donc par le cache de résumés : ajouter un
+    document ne recalcule que ses propres morceaux et les groupes de réduction qui le contiennent.
+    `on_progress(étape, faits, total)` suit l'avancement de chaque étape.
+    """
+    corpus = format_corpus(pages)
+    if estimate_tokens(corpus) <= token_budget:
+        return corpus
+
+    def run_stage(stage: str, texts: List[str], prompts: List[Tuple[str, str]]) -> List[str]:
+        done = 0
+
+        def on_result(index, summary):
+            nonlocal done
+            done += 1
+            if on_progress:
+                on_progress(stage, done, len(texts))
+
+        return generate_summaries(texts, prompts, concurrency=concurrency, on_result=on_result)
+
+    # Map : tous les morceaux de tous les articles en un seul lot
+    chunks_per_page = [split_into_chunks(page.content, token_budget) or [""] for page in pages]
+    texts, prompts = [], []
+    for page, chunks in zip(pages, chunks_per_page):
+        for number, chunk in enumerate(chunks, start=1):
+            texts.append(chunk)
+            prompts.append((MAP_SYSTEM_PROMPT, f"Article : {page.title}\nExtrait {number}/{len(chunks)} :"))
+    chunk_summaries = iter(run_stage("Résumé des articles", texts, prompts))
+
+    # Les articles découpés en plusieurs morceaux sont d'abord ramenés à un seul résumé
+    article_summaries = [[next(chunk_summaries) for _ in chunks] for chunks in chunks_per_page]
+    multi = [index for index, summaries in enumerate(article_summaries) if len(summaries) > 1]
+    merged = run_stage(
+        "Fusion des articles longs",
+        ["\n\n".join(article_summaries[index]) for index in multi],
+        [(ARTICLE_REDUCE_SYSTEM_PROMPT, f"Article : {pages[index].title}\nRésumés partiels :") for index in multi],
+    ) if multi else []
+    for index, summary in zip(multi, merged):
+        article_summaries[index] = [summary]
+    partials = [
+        f"### {page.title}\nURL : {page.link}\n{summaries[0]}"
+        for page, summaries in zip(pages, article_summaries)
+    ]
+
+    # Réduction hiérarchique jusqu'à tenir dans le budget
+    level = 1
+    while len(partials) > 1 and estimate_tokens("\n\n".join(partials)) > token_budget:
+        groups = pack_under_budget(partials, token_budget)
+        partials = run_stage(
+            f"Réduction niveau {level}",
+            ["\n\n".join(group) for group in groups],
+            [(CORPUS_REDUCE_SYSTEM_PROMPT, "Résumés à fusionner :")] * len(groups),
+        )
+        level += 1
+    return "\n\n".join(partials)
+
+###############################
+# Questions / réponses sur un corpus (RAG)
+###############################
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
+RAG_CHUNK_TOKENS = int(os.getenv("RAG_CHUNK_TOKENS", 250))
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", 6))
+# Morceaux envoyés par appel au point d'entrée d'embeddings
+RAG_EMBED_BATCH = 32
+
+def embed_texts(texts: List[str], model: Optional[str] = None) -> np.ndarray:
+    """Embeddings Ollama par lots, normalisés (norme 1) : le produit scalaire donne la similarité cosinus."""
+    vectors = []
+    for start in range(0, len(texts), RAG_EMBED_BATCH):
+        response = ollama.embed(model=model or EMBEDDING_MODEL, input=texts[start:start + RAG_EMBED_BATCH])
+        vectors.extend(response["embeddings"])
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if not len(matrix):
+        return matrix
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+class ChunkIndex:
+    """
+    Index en mémoire des morceaux d'articles chargés : chaque morceau est embarqué une seule fois,
+    les vecteurs sont empilés dans une matrice NumPy et une question ne coûte qu'un embedding
+    et un produit matrice-vecteur, quel que soit le nombre d'articles.
+    """
+
+    def __init__(self, chunk_tokens: int = RAG_CHUNK_TOKENS, model: Optional[str] = None):
+        self.chunk_tokens = chunk_tokens
+        self.model = model or EMBEDDING_MODEL
+        self.chunks: List[Tuple[str, str, str]] = []
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+
+    def add_pages(self, pages: List[Page]) -> int:
+        """Découpe et embarque les pages ; retourne le nombre de morceaux ajoutés."""
+        chunks = [
+            (page.title, page.link, chunk)
+            for page in pages if page and page.content
+            for chunk in split_into_chunks(page.content, self.chunk_tokens)
+        ]
+        if not chunks:
+            return 0
+        vectors = embed_texts([f"{title}\n{text}" for title, _, text in chunks], self.model)
+        self.vectors = vectors if not len(self.chunks) else np.vstack([self.vectors, vectors])
+        self.chunks.extend(chunks)
+        return len(chunks)
+
+    def search(self, question: str, k: int = RAG_TOP_K) -> List[Tuple[float, Tuple[str, str, str]]]:
+        """Les `k` morceaux les plus proches de la question, par similarité cosinus décroissante."""
+        if not self.chunks:
+            return []
+        scores = self.vectors @ embed_texts([question], self.model)[0]
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.chunks[i]) for i in top]
+
+    def context(self, question: str, k: int = RAG_TOP_K) -> str:
+        """Contexte à transmettre à generate_answer / stream_answer : seulement les morceaux pertinents."""
+        return "\n\n".join(f"### {title}\nURL : {link}\n{text}" for _, (title, link, text) in self.search(question, k))
+
 ###############################
 # Fonctions de création de PDF
 ###############################
@@ -352,30 +2786,25 @@ def get_hash(input_data):
 ########## Sources ##########
 def load_default_sources():
     api_url = os.getenv("API_URL", "http://localhost:8000")
-    max_retries = 3
-    retry_delay = 2
-
-    for attempt in range(max_retries):
-        try:
-            resp = requests.get(f"{api_url}/sources", timeout=5)
-            resp.raise_for_status()
-            return resp.json()
-        except requests.exceptions.RequestException as e:
-            if attempt == max_retries - 1:
-                print(f"Erreur finale après {max_retries} tentatives : {e}")
-                return []
-            print(f"Tentative {attempt + 1} échouée : {e}")
-            time.sleep(retry_delay)
+    # Les nouvelles tentatives avec backoff sont gérées par la session partagée
+    try:
+        resp = http_request("GET", f"{api_url}/sources", timeout=5)
+        resp.raise_for_status()
+        return resp.json()
+    except requests.exceptions.RequestException as e:
+        print(f"Erreur lors du chargement des sources : {e}")
+        return []
 
 def save_default_sources(sources):
     try:
         # Filtrer les lignes vides
         clean_sources = [s.strip() for s in sources if s.strip()]
         
-        resp = requests.post(
-            "http://localhost:8000/sources", 
+        resp = http_request(
+            "POST",
+            "http://localhost:8000/sources",
             json=clean_sources,
-            timeout=10  # Ajouter un timeout
+            timeout=10
         )
         
         if resp.status_code != 200:
@@ -406,7 +2835,7 @@ def get_default_keywords():
 ########## Keywords ##########
 def load_default_keywords():
     try:
-        resp = requests.get("http://localhost:8000/keywords")  # Modifié
+        resp = http_request("GET", "http://localhost:8000/keywords")
         resp.raise_for_status()
         return resp.json()
     except Exception as e:
@@ -415,14 +2844,14 @@ def load_default_keywords():
 
 def save_default_keywords(keywords):
     try:
-        resp = requests.post("http://localhost:8000/keywords", json=keywords)  # Modifié
+        resp = http_request("POST", "http://localhost:8000/keywords", json=keywords)
         resp.raise_for_status()
     except Exception as e:
         print(f"Erreur lors de la sauvegarde des keywords: {e}")
 
 def load_filters():
     try:
-        resp = requests.get("http://localhost:8000/filters")  # Modifié
+        resp = http_request("GET", "http://localhost:8000/filters")
         resp.raise_for_status()
         return resp.json()
     except Exception as e:
@@ -442,7 +2871,7 @@ def save_filters(filters):
     Sauvegarde l'objet filters (id=1) via l'API (POST /filters).
     """
     try:
-        resp = requests.post("http://localhost:8000/filters", json=filters)
+        resp = http_request("POST", "http://localhost:8000/filters", json=filters)
         resp.raise_for_status()
     except Exception as e:
         print(f"Erreur lors de la sauvegarde des filters: {e}")
@@ -456,7 +2885,7 @@ def check_and_load_results(input_data, result_key):
     """
     input_hash = get_hash(input_data)
     try:
-        resp = requests.get("http://127.0.0.1:8000/cache", params={"input_hash": input_hash, "result_key": result_key})
+        resp = http_request("GET", "http://127.0.0.1:8000/cache", params={"input_hash": input_hash, "result_key": result_key})
         if resp.status_code == 200:
             data = resp.json()
             # data = {"data": "..."} => on doit le charger en JSON
@@ -481,7 +2910,7 @@ def save_results_to_file(input_data, result_key, data):
             "result_key": result_key,
             "data": data_json
         }
-        resp = requests.post("http://127.0.0.1:8000/cache", json=payload)
+        resp = http_request("POST", "http://127.0.0.1:8000/cache", json=payload)
         resp.raise_for_status()
     except Exception as e:
         print(f"Erreur lors de la sauvegarde du cache: {e}")
@@ -0,0 +1,94 @@
+# tests/bench_extraction.py
+#
+# Benchmark avant/après de l'extraction HTML sur les pages sauvegardées dans tests/fixtures.
+# Lancer depuis la racine du projet : python -m veille_db.tests.bench_extraction
+
+import os
+import timeit
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+from lxml import html as lxml_html
+from veille_db.app.utils import extract_page
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+BASE_URL = "https://www.example.com/article"
+
+###############################
+# Extraction d'origine (BeautifulSoup + re-sérialisation + lxml)
+###############################
+def legacy_first_valid_xpath(tree, xpaths):
+    for path in xpaths:
+        result = tree.xpath(path)
+        if result:
+            return result[0].strip() if isinstance(result[0], str) else result[0]
+    return None
+
+def legacy_first_valid_css(soup, css_selectors):
+    for selector in css_selectors:
+        result = soup.select_one(selector)
+        if result:
+            return result.get_text(strip=True) if result.get_text else result.get("content", "").strip()
+    return None
+
+def legacy_extract(url, content):
+    soup = BeautifulSoup(content, "lxml")
+    html_tree = lxml_html.fromstring(str(soup))
+
+    xpaths = {
+        "title": ["//h1/text()", "//meta[@property='og:title']/@content", "//title/text()"],
+        "content": ["//article//p//text()", "//div[contains(@class, 'content')]//p//text()", "//p//text()"],
+        "author": ["//meta[@name='author']/@content", "//span[contains(@class, 'author')]//text()"],
+        "date": ["//time/@datetime", "//meta[@property='article:published_time']/@content"],
+        "description": ["//meta[@name='description']/@content", "//meta[@property='og:description']/@content"],
+        "image_url": [
+            "//meta[@property='og:image']/@content",
+            "//img[@class='featured-image']/@src",
+            "//div[contains(@class, 'td-module-thumb')]//img/@src",
+            "//img[contains(@class, 'entry-thumb')]/@src"
+        ],
+    }
+    css_selectors = {
+        "title": ["h1", "meta[property='og:title']", "title"],
+        "content": ["article p", "div.content p", "p"],
+        "author": ["meta[name='author']", "span.author"],
+        "date": ["time", "meta[property='article:published_time']"],
+        "description": ["meta[name='description']", "meta[property='og:description']"],
+        "image_url": ["meta[property='og:image']", "img.featured-image", "div.td-module-thumb img", "img.entry-thumb"],
+    }
+
+    title = legacy_first_valid_xpath(html_tree, xpaths["title"]) or legacy_first_valid_css(soup, css_selectors["title"]) or "Titre non trouvé"
+    content_elements = html_tree.xpath("|".join(xpaths["content"])) or soup.select("|".join(css_selectors["content"]))
+    content = " ".join([c.strip() for c in content_elements if len(c.strip()) > 50]) or "Contenu non trouvé"
+    author = legacy_first_valid_xpath(html_tree, xpaths["author"]) or legacy_first_valid_css(soup, css_selectors["author"]) or "Auteur non spécifié"
+    date = legacy_first_valid_xpath(html_tree, xpaths["date"]) or legacy_first_valid_css(soup, css_selectors["date"])
+    date = date.strip() if date else None
+    description = legacy_first_valid_xpath(html_tree, xpaths["description"]) or legacy_first_valid_css(soup, css_selectors["description"]) or "Description non trouvée"
+    image_url = legacy_first_valid_xpath(html_tree, xpaths["image_url"]) or legacy_first_valid_css(soup, css_selectors["image_url"]) or None
+    if image_url and not image_url.startswith("http"):
+        image_url = urljoin(url, image_url)
+    return title, content, author, date, description, image_url
+
+###############################
+# Benchmark
+###############################
+def load_fixtures():
+    fixtures = {}
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if name.endswith(".html"):
+            with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+                fixtures[name] = f.read()
+    return fixtures
+
+def main(number=50):
+    print(f"{'fixture':<30}{'avant (ms)':>12}{'après (ms)':>12}{'gain':>8}")
+    total_before = total_after = 0.0
+    for name, content in load_fixtures().items():
+        before = timeit.timeit(lambda: legacy_extract(BASE_URL, content), number=number) / number * 1000
+        after = timeit.timeit(lambda: extract_page(BASE_URL, content), number=number) / number * 1000
+        total_before += before
+        total_after += after
+        print(f"{name:<30}{before:>12.2f}{after:>12.2f}{before / after:>7.1f}x")
+    print(f"{'total':<30}{total_before:>12.2f}{total_after:>12.2f}{total_before / total_after:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
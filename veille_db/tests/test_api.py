@@ -1,5 +1,6 @@
 # tests/test_api.py
 
+import os
 import pytest
 from fastapi.testclient import TestClient
 from veille_db.app.main import app
@@ -49,3 +50,86 @@ def test_save_and_get_filters(test_client):
     response = test_client.get("/filters")
     assert response.status_code == 200
     assert response.json() == filters
+
+def test_seen_urls_workflow(test_client):
+    """Test l'enregistrement des URLs vues et le curseur de dernier passage"""
+    source_url = "https://example.com/blog"
+    urls = ["https://example.com/a1", "https://example.com/a2"]
+    response = test_client.post("/seen_urls", json={"source_url": source_url, "urls": urls})
+    assert response.status_code == 200
+
+    response = test_client.post("/seen_urls/check", json={"source_url": source_url, "urls": urls + ["https://example.com/a3"]})
+    assert response.status_code == 200
+    assert set(response.json()["seen"]) == set(urls)
+
+    response = test_client.get("/seen_urls", params={"source_url": source_url})
+    assert response.status_code == 200
+    assert set(response.json()["urls"]) >= set(urls)
+
+    response = test_client.get("/crawl_cursor", params={"source_url": source_url})
+    assert response.status_code == 200
+    assert response.json()["last_run"] is not None
+
+def test_search_stub_mimics_custom_search():
+    """Le serveur de recherche local pagine comme l'API Custom Search"""
+    from veille_db.app.search_stub import app as stub_app
+    stub = TestClient(stub_app)
+    response = stub.get("/customsearch/v1", params={"q": "seniors", "num": 10, "start": 11})
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 10
+    assert "items" not in stub.get("/customsearch/v1", params={"q": "seniors", "start": 101}).json()
+    assert stub.get("/customsearch/v1", params={"q": "seniors", "num": 20}).status_code == 400
+
+def test_search_index_ranks_and_persists(tmp_path, monkeypatch):
+    """Index BM25 : recherche insensible aux accents et au pluriel, rechargement depuis le disque"""
+    import veille_db.app.main as main
+    from veille_db.app.search_index import BM25Index
+    path = str(tmp_path / "pages.npz")
+    monkeypatch.setattr(main, "_page_index", BM25Index(path))
+    pages = [
+        {"url": "https://a.com/1", "title": "Les banques et les seniors", "content": "Une offre bancaire dédiée aux retraités."},
+        {"url": "https://a.com/2", "title": "Énergie solaire", "content": "Les collectivités investissent dans le solaire. Une banque finance."},
+        {"url": "https://a.com/3", "title": "Santé connectée", "content": "Téléconsultation pour les territoires ruraux."},
+    ]
+    response = client.post("/search_index/pages", json=pages)
+    assert response.json() == {"added": 3, "total": 3}
+    assert client.post("/search_index/pages", json=pages[:1]).json()["added"] == 0
+
+    results = client.get("/search", params={"q": "banque senior"}).json()["results"]
+    assert [result["url"] for result in results] == ["https://a.com/1", "https://a.com/2"]
+    assert client.get("/search", params={"q": "energie"}).json()["results"][0]["url"] == "https://a.com/2"
+
+    # Écriture différée : rien sur disque avant le délai ou l'arrêt de l'API
+    assert not os.path.exists(path)
+    main.save_page_index()
+    reloaded = BM25Index.load(path)
+    assert len(reloaded) == 3
+    assert reloaded.search("téléconsultations", k=1)[0]["url"] == "https://a.com/3"
+
+def test_search_index_stopword_only_pages(tmp_path):
+    """Pages sans aucun terme indexable : longueur moyenne nulle, pas de division par zéro"""
+    import warnings
+    from veille_db.app.search_index import BM25Index
+    index = BM25Index(str(tmp_path / "pages.npz"))
+    index.add("https://a.com/1", "Et le", "Il y a de la, pour les uns et pour nous.")
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert index.search("nous uns") == []
+
+def test_page_index_is_loaded_once(tmp_path, monkeypatch, mocker):
+    """Premières requêtes simultanées : l'index n'est chargé qu'une fois, aucun ajout n'est perdu"""
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    import veille_db.app.main as main
+    from veille_db.app.search_index import BM25Index
+    monkeypatch.setattr(main, "_page_index", None)
+
+    def slow_load():
+        time.sleep(0.1)
+        return BM25Index(str(tmp_path / "pages.npz"))
+    load = mocker.patch.object(BM25Index, "load", side_effect=slow_load)
+    pages = [[{"url": f"https://a.com/{i}", "title": "Titre", "content": "Contenu"}] for i in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda batch: client.post("/search_index/pages", json=batch), pages))
+    assert load.call_count == 1
+    assert len(main.get_page_index()) == 4
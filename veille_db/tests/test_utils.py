@@ -1,20 +1,615 @@
 # tests/test_utils.py
 
+import os
 import pytest
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
 from veille_db.app.utils import (
     scrape_page, 
+    get_http_session,
+    scrape_pages,
+    extract_page,
+    fetch_page,
+    HttpCache,
+    ExtractionProfiles,
+    extract_page_with_profile,
+    validate_image_urls,
+    FetchResult,
+    HostRateLimiter,
+    BloomFilter,
+    SeenUrlIndex,
+    extract_listing_links,
+    canonicalize_url,
+    dedupe_urls,
+    minhash_signature,
+    minhash_similarity,
+    shingle_hashes,
+    collapse_near_duplicates,
+    parse_date,
+    SearchCache,
+    google_search_many,
+    google_search,
+    SearchQuota,
+    SEARCH_QUOTA_RESERVE,
+    generate_summaries,
+    generate_summary,
+    SummaryCache,
+    summary_cache_key,
+    corpus_synthesis_context,
+    estimate_tokens,
+    ChunkIndex,
+    build_prompt,
+    OllamaModelManager,
+    queue_page_for_search,
+    flush_search_index,
+    stream_chat,
     get_mysql_connection,
     get_mongo_client,
     save_page_to_mongodb,
     Page
 )
 
+@pytest.fixture(autouse=True)
+def isolated_caches(mocker, tmp_path):
+    """
+    Cache HTTP et profils d'extraction isolés dans un répertoire temporaire : ce sont les seuls
+    singletons écrits par scrape_pages, aucun test n'écrit donc dans ~/.cache/veille
+    (les caches de recherche et de résumés ont leurs propres fixtures). Le limiteur de débit
+    est remplacé par un limiteur neuf qui ne télécharge pas de robots.txt.
+    """
+    mocker.patch("veille_db.app.utils.extraction_profiles", ExtractionProfiles(path=str(tmp_path / "profiles.json")))
+    # Limiteur neuf, sans téléchargement de robots.txt
+    limiter = HostRateLimiter()
+    mocker.patch.object(limiter, "_load_crawl_delay")
+    mocker.patch("veille_db.app.utils.host_rate_limiter", limiter)
+    return mocker.patch("veille_db.app.utils.http_cache", HttpCache(path=str(tmp_path / "http_cache.sqlite")))
+
 def test_scrape_page():
     """Test basique de scrape_page"""
     url = "https://www.example.com"
     result = scrape_page(url)
     assert result is None or hasattr(result, 'title')
 
+def test_scrape_pages_keeps_input_order(mocker):
+    """scrape_pages retourne une liste alignée sur les URLs, None pour les échecs"""
+    html = b"<html><body><h1>Titre</h1><p>" + b"Contenu de l'article " * 5 + b"</p></body></html>"
+    mocker.patch("veille_db.app.utils.fetch_url", side_effect=lambda url, **kwargs: FetchResult(body=None if "echec" in url else html))
+    urls = ["https://a.com/1", "https://echec.com/2", "https://b.com/3"]
+    results = scrape_pages(urls, concurrency=2, per_host_limit=1)
+    assert len(results) == 3
+    assert results[0].title == "Titre" and results[0].link == urls[0]
+    assert results[1] is None
+    assert results[2].link == urls[2]
+
+def test_scrape_pages_process_pool(mocker):
+    """L'extraction dans un pool de processus donne le même résultat que dans les threads"""
+    html = load_fixture("article_wordpress.html")
+    mocker.patch("veille_db.app.utils.fetch_url", side_effect=lambda url, **kwargs: FetchResult(body=html))
+    urls = ["https://a.com/1", "https://b.com/2"]
+    in_threads = scrape_pages(urls, parse_workers=0)
+    in_processes = scrape_pages(urls, parse_workers=2)
+    assert in_processes == in_threads
+
+def test_scrape_pages_requeues_throttled_urls(mocker):
+    """Une URL limitée (429) est remise en file au lieu d'être abandonnée"""
+    html = b"<html><body><h1>Titre</h1></body></html>"
+    responses = iter([FetchResult(body=None, status=429, retry_after=0), FetchResult(body=html, status=200)])
+    mocker.patch("veille_db.app.utils.fetch_url", side_effect=lambda url, **kwargs: next(responses))
+    assert scrape_pages(["https://a.com/1"])[0].title == "Titre"
+
+def test_host_rate_limiter_adapts_to_throttling():
+    """Le débit d'un hôte augmente sur succès, diminue et se suspend sur 429"""
+    limiter = HostRateLimiter(initial_rate=4.0)
+    limiter._crawl_delays["a.com"] = None
+    limiter.record("https://a.com/1", 200)
+    assert limiter._hosts["a.com"].rate > 4.0
+    limiter.record("https://a.com/1", 429, retry_after=30)
+    assert limiter._hosts["a.com"].rate < 4.0
+    assert 25 < limiter.blocked_for("a.com") <= 30
+    assert limiter.blocked_for("b.com") == 0
+
+def test_host_rate_limiter_fetches_robots_once(mocker):
+    """Requêtes simultanées vers un nouvel hôte : un seul téléchargement du robots.txt"""
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    def slow_robots(method, url, **kwargs):
+        time.sleep(0.1)
+        return mocker.Mock(status_code=200, text="User-agent: *\nCrawl-delay: 2")
+    http_request = mocker.patch("veille_db.app.utils.http_request", side_effect=slow_robots)
+    limiter = HostRateLimiter(burst=10)
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        list(pool.map(limiter.acquire, [f"https://a.com/{i}" for i in range(5)]))
+    assert http_request.call_count == 1
+    assert limiter._hosts["a.com"].max_rate == 0.5
+
+def test_scrape_pages_waits_for_slow_host_outside_semaphores(mocker):
+    """Un hôte en attente de jeton ne bloque pas la place de concurrence d'un autre hôte"""
+    limiter = HostRateLimiter(initial_rate=2.0, burst=1)
+    limiter._crawl_delays.update({"slow.com": None, "fast.com": None})
+    limiter.acquire("https://slow.com/0")
+    mocker.patch("veille_db.app.utils.host_rate_limiter", limiter)
+    fetched = []
+    html = b"<html><body><h1>Titre</h1></body></html>"
+    mocker.patch("veille_db.app.utils.fetch_url", side_effect=lambda url, **kwargs: fetched.append(url) or FetchResult(body=html))
+    scrape_pages(["https://slow.com/1", "https://fast.com/1"], concurrency=1)
+    assert fetched == ["https://fast.com/1", "https://slow.com/1"]
+
+def load_fixture(name):
+    with open(os.path.join(os.path.dirname(__file__), "fixtures", name), "rb") as f:
+        return f.read()
+
+def test_extract_page_fixtures():
+    """Extraction en un seul passage lxml sur des pages sauvegardées"""
+    page = extract_page("https://www.example.com/article", load_fixture("article_nested_title.html"))
+    assert page.title == "Bien vieillir : les nouveaux services numériques pour les seniors"
+    assert page.author == "Marc Lefèvre"
+    assert page.date == "2024-04-03T00:00:00"
+
+    page = extract_page("https://www.example.com/article", load_fixture("article_latin1.html"))
+    assert page.title == "Banque : un projet pilote d'IA générative pour le service à la clientèle"
+    assert page.image_url == "https://www.example.com/images/banque-ia.png"
+    assert page.content != "Contenu non trouvé"
+
+def fake_response(mocker, status_code, body=b"", headers=None, url="https://a.com/1"):
+    response = mocker.MagicMock(status_code=status_code, headers=headers or {}, url=url)
+    response.__enter__.return_value = response
+    response.iter_content.return_value = [body[i:i + 4] for i in range(0, len(body), 4)]
+    return response
+
+def test_fetch_page_revalidates_with_conditional_get(mocker, tmp_path):
+    """Une entrée expirée est revalidée avec If-None-Match et resservie sur 304"""
+    cache = HttpCache(path=str(tmp_path / "http_cache.sqlite"), ttl=0)
+    mocker.patch("veille_db.app.utils.http_cache", cache)
+    get = mocker.patch("veille_db.app.utils.http_request")
+    get.return_value = fake_response(mocker, 200, b"<html>v1</html>", {"ETag": '"v1"', "Content-Type": "text/html"})
+    assert fetch_page("https://a.com/1") == b"<html>v1</html>"
+
+    get.return_value = fake_response(mocker, 304)
+    assert fetch_page("https://a.com/1") == b"<html>v1</html>"
+    assert get.call_args.kwargs["headers"]["If-None-Match"] == '"v1"'
+
+def test_fetch_page_streaming_limits(mocker):
+    """Les contenus non HTML sont ignorés, la lecture s'arrête à max_bytes"""
+    get = mocker.patch("veille_db.app.utils.http_request")
+    get.return_value = fake_response(mocker, 200, b"%PDF-1.4", {"Content-Type": "application/pdf"})
+    assert fetch_page("https://a.com/doc.pdf", use_cache=False) is None
+
+    html = b"<html><head><title>T</title></HEAD><body>" + b"x" * 1000 + b"</body></html>"
+    get.return_value = fake_response(mocker, 200, html, {"Content-Type": "text/html; charset=utf-8"})
+    assert fetch_page("https://a.com/1", use_cache=False) == html
+    assert len(fetch_page("https://a.com/1", use_cache=False, max_bytes=100)) == 100
+
+def test_canonicalize_url_variants():
+    """Paramètres de suivi, AMP, http/https, slash final et fragment donnent la même clé"""
+    canonical = "https://www.site.fr/article?id=3&page=2"
+    assert canonicalize_url("http://WWW.Site.fr:80/article/?page=2&utm_source=x&id=3#top") == canonical
+    assert canonicalize_url("https://www.site.fr/article/amp/?id=3&page=2&fbclid=abc") == canonical
+    assert canonicalize_url("mailto:contact@site.fr") == "mailto:contact@site.fr"
+    assert dedupe_urls(["https://a.com/x?utm_medium=mail", "https://b.com/y", "http://a.com/x/"]) == [
+        "https://a.com/x?utm_medium=mail", "https://b.com/y"]
+
+def test_fetch_page_caches_under_final_url(mocker, tmp_path):
+    """Après une redirection, l'URL demandée et l'URL finale partagent la même entrée de cache"""
+    cache = HttpCache(path=str(tmp_path / "http_cache.sqlite"))
+    mocker.patch("veille_db.app.utils.http_cache", cache)
+    get = mocker.patch("veille_db.app.utils.http_request")
+    get.return_value = fake_response(mocker, 200, b"<html>v1</html>", {"Content-Type": "text/html"}, url="https://a.com/final")
+    assert fetch_page("https://a.com/old?utm_source=x") == b"<html>v1</html>"
+    assert fetch_page("http://a.com/old") == b"<html>v1</html>"
+    assert fetch_page("https://a.com/final/") == b"<html>v1</html>"
+    assert get.call_count == 1
+
+def test_scrape_pages_dedupes_canonical_urls(mocker):
+    """Les doublons sont écartés avant (URL normalisée) et après téléchargement (rel=canonical)"""
+    html = b"""<html><head><link rel="canonical" href="https://site.fr/article"></head>
+    <body><h1>Titre</h1></body></html>"""
+    fetch = mocker.patch("veille_db.app.utils.fetch_url", side_effect=lambda url, **kwargs: FetchResult(body=html))
+    urls = ["https://a.site.fr/1", "https://a.site.fr/1?utm_source=x", "https://b.site.fr/2"]
+    reported, skipped = [], []
+    results = scrape_pages(urls, concurrency=1, on_result=lambda index, url, page: reported.append(index),
+                           on_skipped=lambda index, url: skipped.append(index))
+    assert fetch.call_count == 2
+    assert results[0].canonical_url == "https://site.fr/article"
+    assert results[1] is None and results[2] is None
+    # Aucun doublon n'est signalé comme un échec
+    assert reported == [0] and skipped == [2]
+
+def test_minhash_signature_is_exact_universal_hash():
+    """(a·x + b) mod p calculé sans débordement 64 bits : identique au calcul en entiers Python"""
+    from veille_db.app.utils import _MINHASH_A, _MINHASH_B, _MINHASH_PRIME
+    text = " ".join(f"mot{i}" for i in range(60))
+    p = int(_MINHASH_PRIME)
+    expected = [
+        min((int(a) * (int(x) % p) + int(b)) % p for x in shingle_hashes(text))
+        for a, b in zip(_MINHASH_A, _MINHASH_B)
+    ]
+    assert minhash_signature(text).tolist() == expected
+
+    # L'estimation suit la similarité de Jaccard réelle : aucun shingle commun, puis 76 shingles sur 100
+    words = [f"w{i}" for i in range(104)]
+    disjoint = minhash_similarity(minhash_signature(" ".join(words[:54])), minhash_signature(" ".join(words[50:])))
+    assert disjoint < 0.1
+    contained = minhash_similarity(minhash_signature(" ".join(words)), minhash_signature(" ".join(words[:80])))
+    assert abs(contained - 76 / 100) < 0.12
+
+def test_collapse_near_duplicates_keeps_first_with_alternate_links():
+    """Une dépêche reprise avec de légères variantes est regroupée sous la première page"""
+    text = " ".join(f"mot{i}" for i in range(300))
+    variant = text.replace("mot150", "autre") + " source AFP"
+    other = " ".join(f"terme{i}" for i in range(300))
+    assert minhash_similarity(minhash_signature(text), minhash_signature(variant)) > 0.9
+    pages = [
+        Page(title="A", link="https://a.fr/1", content=text),
+        None,
+        Page(title="B", link="https://b.fr/1", content=other),
+        Page(title="C", link="https://c.fr/1", content=variant),
+        Page(title="D", link="https://d.fr/1", content="Contenu non trouvé"),
+    ]
+    kept = collapse_near_duplicates(pages)
+    assert [page.title for page in kept] == ["A", "B", "D"]
+    assert kept[0].alternate_links == ["https://c.fr/1"]
+
+def test_parse_date_formats():
+    """Dates ISO, françaises, relatives et anglaises"""
+    now = datetime(2024, 5, 10, 12, 0)
+    assert parse_date("2024-04-03T14:30:00+02:00").isoformat() == "2024-04-03T14:30:00+02:00"
+    assert parse_date("Publié le 03/04/2024 à 14h30") == datetime(2024, 4, 3, 14, 30)
+    assert parse_date("mardi 1er avril 2024") == datetime(2024, 4, 1)
+    assert parse_date("il y a 3 jours", now=now) == datetime(2024, 5, 7, 12, 0)
+    assert parse_date("hier", now=now) == datetime(2024, 5, 9, 12, 0)
+    assert parse_date("April 3, 2024") == datetime(2024, 4, 3)
+    assert parse_date("Auteur inconnu") is None
+
+def test_parse_date_relative_units():
+    """Secondes et semaines ne se confondent pas, pas plus que mois et minutes"""
+    now = datetime(2024, 5, 10, 12, 0)
+    assert parse_date("il y a 30 secondes", now=now) == datetime(2024, 5, 10, 11, 59, 30)
+    assert parse_date("30 seconds ago", now=now) == datetime(2024, 5, 10, 11, 59, 30)
+    assert parse_date("il y a 2 semaines", now=now) == datetime(2024, 4, 26, 12, 0)
+    assert parse_date("il y a 1 mois", now=now) == datetime(2024, 4, 10, 12, 0)
+    assert parse_date("il y a 5 minutes", now=now) == datetime(2024, 5, 10, 11, 55)
+    assert parse_date("3 mins ago", now=now) == datetime(2024, 5, 10, 11, 57)
+    assert parse_date("il y a 2 ans", now=now) == now - timedelta(days=730)
+
+def test_scrape_pages_drops_pages_outside_window(mocker):
+    """Les pages trop anciennes sont écartées (signalées à on_skipped) et ne comptent pas dans max_pages"""
+    def fake_fetch(url, **kwargs):
+        date = "2020-01-01" if "old" in url else "2024-05-01"
+        return FetchResult(body=f"<html><body><h1>{url}</h1><time datetime='{date}'></time></body></html>".encode())
+    mocker.patch("veille_db.app.utils.fetch_url", side_effect=fake_fetch)
+    urls = ["https://a.com/old", "https://b.com/new", "https://c.com/other"]
+    skipped = []
+    results = scrape_pages(urls, concurrency=1, max_pages=2, published_after=datetime(2024, 1, 1),
+                           on_skipped=lambda index, url: skipped.append(url))
+    assert results[0] is None
+    assert skipped == ["https://a.com/old"]
+    assert results[1].date == "2024-05-01T00:00:00"
+    assert results[2] is not None
+
+@pytest.fixture
+def search_store(mocker, tmp_path):
+    """Cache et quota de recherche isolés dans un répertoire temporaire"""
+    quota = SearchQuota(path=str(tmp_path / "quota.sqlite"), daily_quota=100)
+    mocker.patch("veille_db.app.utils.search_quota", quota)
+    cache = mocker.patch("veille_db.app.utils.search_cache", SearchCache(path=str(tmp_path / "search.sqlite")))
+    return cache, quota
+
+def fake_search_api(mocker, links_for):
+    def fake_request(method, url, **kwargs):
+        query = url.split("q=", 1)[1].split("&", 1)[0]
+        start = int(url.split("start=", 1)[1].split("&", 1)[0]) if "start=" in url else 1
+        items = [{"link": link} for link in links_for(query, start)]
+        return mocker.MagicMock(status_code=200, json=lambda: {"items": items})
+    return mocker.patch("veille_db.app.utils.http_request", side_effect=fake_request)
+
+def test_google_search_many_fans_out_and_caches(mocker, search_store):
+    """Recherches parallèles, ordre conservé ; une requête équivalente est servie par le cache"""
+    request = fake_search_api(mocker, lambda query, start: [f"https://{query}.fr/1"])
+    assert google_search_many(["seniors", "banque"], time_unit="mois", time_value=1) == [
+        ["https://seniors.fr/1"], ["https://banque.fr/1"]]
+    assert google_search_many(["  Seniors "], time_unit="mois", time_value=1) == [["https://seniors.fr/1"]]
+    assert request.call_count == 2
+
+def test_google_search_paginates_and_stops_early(mocker, search_store):
+    """Au-delà de 10 résultats, les pages start= sont fusionnées sans doublons ; une page incomplète arrête la recherche"""
+    request = fake_search_api(mocker, lambda query, start: (
+        [f"https://site.fr/{rank}" for rank in range(start, start + 10)] if start < 21 else ["https://site.fr/1"]))
+    urls = google_search("seniors", num_results=50, page_concurrency=1)
+    assert urls == [f"https://site.fr/{rank}" for rank in range(1, 21)]
+    assert request.call_count == 3
+
+def test_google_search_many_spends_quota_on_stalest_keywords(mocker, search_store):
+    """Quota bas : les thèmes jamais cherchés passent en premier, les autres sont servis par le cache périmé"""
+    cache, quota = search_store
+    request = fake_search_api(mocker, lambda query, start: [f"https://{query}.fr/{start}"])
+    google_search_many(["ancien"], time_unit="mois", time_value=1)
+    cache.ttl = 0
+    quota.daily_quota = quota.used() + 1 + SEARCH_QUOTA_RESERVE
+    results = google_search_many(["ancien", "nouveau"], time_unit="mois", time_value=1)
+    assert results == [["https://ancien.fr/1"], ["https://nouveau.fr/1"]]
+    assert [call.args[1].split("q=")[1].split("&")[0] for call in request.call_args_list] == ["ancien", "nouveau"]
+    assert quota.remaining() == SEARCH_QUOTA_RESERVE
+
+@pytest.fixture
+def summary_store(mocker, tmp_path):
+    """Cache de résumés isolé dans un répertoire temporaire"""
+    return mocker.patch("veille_db.app.utils.summary_cache", SummaryCache(path=str(tmp_path / "summaries.sqlite"), max_entries=2))
+
+def test_generate_summaries_bounds_concurrency_and_isolates_errors(mocker, summary_store):
+    """Résumés en parallèle : ordre conservé, au plus N requêtes en vol, un échec n'affecte que son article"""
+    import asyncio
+    state = {"in_flight": 0, "max_in_flight": 0, "calls": []}
+
+    async def chat(model, messages, **kwargs):
+        prompt = messages[0]["content"]
+        state["calls"].append(prompt)
+        state["in_flight"] += 1
+        state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        await asyncio.sleep(0.01)
+        state["in_flight"] -= 1
+        if "instable" in prompt and state["calls"].count(prompt) == 1:
+            raise ConnectionError("timeout")
+        if "cassé" in prompt:
+            raise ConnectionError("refusé")
+        return {"message": {"content": f"résumé de {prompt.split()[-1]}"}}
+
+    mocker.patch("veille_db.app.utils.ollama.AsyncClient").return_value.chat = chat
+    mocker.patch("veille_db.app.utils.SUMMARY_RETRY_DELAY", 0)
+    texts = ["a1", "a2", "instable", "cassé", "a5", "a6"]
+    done = []
+    summaries = generate_summaries(texts, [("sys", "user")] * len(texts), concurrency=2,
+                                   on_result=lambda index, summary: done.append(index))
+    assert summaries[:3] == ["résumé de a1", "résumé de a2", "résumé de instable"]
+    assert summaries[3].startswith("Erreur lors de l'appel à l'API après 3 tentatives")
+    assert summaries[4:] == ["résumé de a5", "résumé de a6"]
+    assert state["max_in_flight"] == 2
+    assert sorted(done) == list(range(len(texts)))
+
+def test_summary_cache_is_content_addressed(mocker, summary_store):
+    """Même article et même gabarit de prompt : un seul appel, même si le prompt est indenté autrement"""
+    chat = mocker.patch("veille_db.app.utils.ollama.chat", return_value={"message": {"content": "résumé"}})
+    article = "Une  banque lance\nun service pour les seniors."
+    assert generate_summary(article, "sys", f"Résumez :\n{article}") == "résumé"
+    assert generate_summary(" ".join(article.split()), "sys", f"Résumez :\n      {' '.join(article.split())}") == "résumé"
+    assert chat.call_count == 1
+    assert summary_cache_key(article, "sys", article) != summary_cache_key(article, "sys", article, model="autre")
+
+    # Les erreurs ne sont pas mises en cache ; au-delà de max_entries, le moins récent est évincé
+    chat.side_effect = [ConnectionError("refusé")] * 3 + [{"message": {"content": "b"}}, {"message": {"content": "c"}}]
+    mocker.patch("veille_db.app.utils.SUMMARY_RETRY_DELAY", 0)
+    assert generate_summary("article b", "sys", "user").startswith("Erreur")
+    generate_summary("article b", "sys", "user")
+    generate_summary("article c", "sys", "user")
+    assert summary_store.get(summary_cache_key(article, "sys", f"Résumez :\n{article}")) is None
+    assert summary_store.get(summary_cache_key("article c", "sys", "user")) == "c"
+
+def test_corpus_synthesis_context_map_reduces_under_budget(mocker, summary_store):
+    """Corpus trop long : résumés par article puis réduction ; un article ajouté ne recalcule que sa branche"""
+    summary_store.max_entries = 1000
+    prompts_seen = []
+
+    async def chat(model, messages, **kwargs):
+        prompts_seen.append(messages[0]["content"])
+        return {"message": {"content": f"résumé {len(prompts_seen)} " + "mot " * 40}}
+
+    mocker.patch("veille_db.app.utils.ollama.AsyncClient").return_value.chat = chat
+    pages = [
+        Page(date=None, title=f"Article {i}", link=f"https://a.com/{i}", description="",
+             content="\n".join(f"Paragraphe {i}-{j} " + "innovation " * 60 for j in range(4)), author=None, image_url=None)
+        for i in range(6)
+    ]
+    short = corpus_synthesis_context(pages[:1], token_budget=5000)
+    assert "Paragraphe 0-0" in short and not prompts_seen
+
+    context = corpus_synthesis_context(pages, token_budget=300)
+    assert estimate_tokens(context) <= 300
+    first_run = len(prompts_seen)
+    assert sum("Extrait" in prompt for prompt in prompts_seen) > len(pages)
+
+    prompts_seen.clear()
+    corpus_synthesis_context(pages + [Page(date=None, title="Article 6", link="https://a.com/6", description="",
+                                           content="Court article.", author=None, image_url=None)], token_budget=300)
+    assert sum("Extrait" in prompt for prompt in prompts_seen) == 1
+    assert len(prompts_seen) < first_run
+
+def test_chunk_index_embeds_once_and_returns_top_k(mocker):
+    """Morceaux embarqués au chargement ; une question = un seul embedding et les k morceaux les plus proches"""
+    topics = ["banque", "santé", "énergie"]
+
+    def embed(model, input):
+        return {"embeddings": [[float(topic in text) for topic in topics] + [0.1] for text in input]}
+
+    embed_mock = mocker.patch("veille_db.app.utils.ollama.embed", side_effect=embed)
+    pages = [
+        Page(date=None, title=f"Article {topic}", link=f"https://a.com/{topic}", description="",
+             content=f"Un article sur la {topic}.\nSecond paragraphe neutre.", author=None, image_url=None)
+        for topic in topics
+    ]
+    index = ChunkIndex(chunk_tokens=10)
+    assert index.add_pages(pages) == 6
+    assert embed_mock.call_count == 1
+
+    results = index.search("Que dit-on de la santé ?", k=3)
+    assert embed_mock.call_count == 2
+    assert [chunk[1] for _, chunk in results[:2]] == ["https://a.com/santé"] * 2
+    assert results[1][0] > results[2][0]
+    assert index.context("santé", k=1).startswith("### Article santé\nURL : https://a.com/santé")
+
+def test_summary_cache_failure_falls_through_to_ollama(mocker, tmp_path):
+    """Un fichier de cache corrompu ne bloque pas la génération : le résumé vient d'Ollama"""
+    corrupt = tmp_path / "summaries.sqlite"
+    corrupt.write_bytes(b"ceci n'est pas une base SQLite" * 100)
+    mocker.patch("veille_db.app.utils.summary_cache", SummaryCache(path=str(corrupt)))
+    chat = mocker.patch("veille_db.app.utils.ollama.chat", return_value={"message": {"content": "résumé"}})
+    assert generate_summary("Article.", "sys", "user") == "résumé"
+    assert chat.call_count == 1
+
+def test_build_prompt_includes_each_document_once_within_budget():
+    """L'article recopié dans le prompt utilisateur n'apparaît qu'une fois ; les longs documents sont tronqués"""
+    article = "La banque lance un service dédié aux seniors. " * 20
+    prompt = build_prompt("Consignes.", f"Voici l'article :\n{article}\nRésumez-le.", [article])
+    assert prompt.text.count(article.strip()) == 1
+    assert prompt.text.startswith("Consignes.") and prompt.truncated == 0
+
+    short, long = "Court document. " * 5, "mot " * 5000
+    prompt = build_prompt("Consignes.", "", [long, short, short], context_tokens=1000, output_tokens=200)
+    assert prompt.tokens <= 800
+    assert prompt.truncated == 1
+    assert short.strip() in prompt.text and prompt.text.count(short.strip()) == 1
+    assert "[…]" in prompt.text
+
+def test_ollama_manager_schedule_warm_up_and_timings(mocker):
+    """keep_alive selon les heures de veille, préchargement unique, durées Ollama converties en ms"""
+    manager = OllamaModelManager(model="llama3.2:3b")
+    mocker.patch("veille_db.app.utils.OLLAMA_ACTIVE_HOURS", "8-19")
+    assert manager.keep_alive(datetime(2024, 4, 3, 10)) == "2h"
+    assert manager.keep_alive(datetime(2024, 4, 3, 22)) == "5m"
+    assert manager.keep_alive(datetime(2024, 4, 6, 10)) == "5m"
+
+    generate = mocker.patch("veille_db.app.utils.ollama.generate", return_value={"load_duration": 2_500_000_000})
+    assert manager.warm_up() == 2500
+    assert generate.call_args.kwargs["prompt"] == ""
+    assert set(generate.call_args.kwargs) >= {"keep_alive", "options"}
+    manager.ensure_warm()
+    assert generate.call_count == 1
+
+    prompt = build_prompt("Consignes.", "", ["Article."])
+    stats = manager.record(prompt, {"prompt_eval_count": 40, "eval_count": 20, "load_duration": 0,
+                                    "prompt_eval_duration": 30_000_000, "eval_duration": 400_000_000,
+                                    "total_duration": 450_000_000})
+    assert (stats.prefill_ms, stats.generation_ms, stats.total_ms) == (30, 400, 450)
+    assert manager.summary()["tokens/s"] == 50
+
+def test_archived_pages_are_indexed_in_batches(mocker):
+    """Les pages archivées partent vers l'index en un seul appel, pas une requête par page"""
+    mocker.patch("veille_db.app.utils.SEARCH_INDEX_FLUSH_DELAY", 60)
+    request = mocker.patch("veille_db.app.utils.http_request")
+    request.return_value.json.return_value = {"added": 3}
+    for i in range(3):
+        queue_page_for_search(Page(title=f"Article {i}", link=f"https://a.com/{i}", content="Texte."))
+    assert request.call_count == 0
+    assert flush_search_index() == 3
+    assert request.call_count == 1
+    assert [page["url"] for page in request.call_args.kwargs["json"]] == [f"https://a.com/{i}" for i in range(3)]
+    assert flush_search_index() == 0
+
+def test_stream_chat_retries_only_before_first_token(mocker, summary_store):
+    """Flux de tokens : nouvelle tentative tant que rien n'est affiché, erreur ajoutée au texte ensuite"""
+    def chunks(*tokens, error=None):
+        for token in tokens:
+            yield {"message": {"content": token}}
+        if error:
+            raise error
+
+    chat = mocker.patch("veille_db.app.utils.ollama.chat", side_effect=[
+        chunks(error=ConnectionError("refusé")),
+        chunks("Bon", "jour", "", " !"),
+    ])
+    mocker.patch("veille_db.app.utils.SUMMARY_RETRY_DELAY", 0)
+    assert list(stream_chat(build_prompt("prompt", "", []))) == ["Bon", "jour", " !"]
+    assert chat.call_args.kwargs["stream"] is True
+
+    chat.side_effect = [chunks("Début", error=ConnectionError("coupé"))]
+    tokens = list(stream_chat(build_prompt("prompt", "", [])))
+    assert tokens[0] == "Début" and "coupé" in tokens[1]
+    assert chat.call_count == 3
+
+def test_get_http_session_is_shared():
+    """Une seule session poolée pour tout le module"""
+    session = get_http_session()
+    assert session is get_http_session()
+    adapter = session.get_adapter("https://example.com")
+    assert adapter.max_retries.total >= 0
+
+def test_http_cache_lru_eviction(tmp_path):
+    cache = HttpCache(path=str(tmp_path / "http_cache.sqlite"), max_bytes=10)
+    cache.store("https://a.com/1", b"123456", {})
+    cache.store("https://a.com/2", b"123456", {})
+    assert cache.get("https://a.com/1") is None
+    assert cache.get("https://a.com/2").body == b"123456"
+
+def test_extraction_profiles_learn_and_expire(tmp_path):
+    """Le sélecteur gagnant est mémorisé par domaine puis oublié quand il ne trouve plus rien"""
+    path = str(tmp_path / "profiles.json")
+    profiles = ExtractionProfiles(path=path, max_misses=2)
+    profiles.record("a.com", {"title": "//title/text()"})
+    profiles.save()
+    assert ExtractionProfiles(path=path).get("a.com") == {"title": "//title/text()"}
+
+    profiles.record("a.com", {"title": "normalize-space(//h1)"})
+    assert profiles.get("a.com")["title"] == "//title/text()"
+    profiles.record("a.com", {"title": "normalize-space(//h1)"})
+    assert profiles.get("a.com")["title"] == "normalize-space(//h1)"
+
+def test_extract_page_with_profile_tries_preferred_first():
+    html = load_fixture("article_wordpress.html")
+    page, winners = extract_page_with_profile("https://a.com/1", html)
+    assert winners["title"] == "normalize-space(//h1)"
+    page, winners = extract_page_with_profile("https://a.com/1", html, {"title": "//title/text()"})
+    assert winners["title"] == "//title/text()"
+    assert page.title == "article_wordpress.html - Site de presse"
+
+def test_extract_page_strips_boilerplate():
+    """Pied de page, bandeau cookies et paragraphes de liens sont retirés du contenu"""
+    page = extract_page("https://www.example.com/article", load_fixture("article_wordpress.html"))
+    assert "Tous droits réservés" not in page.content
+    assert "cookies" not in page.content
+    assert page.token_estimate == (len(page.content) + 3) // 4
+
+    html = ("<html><body><article><p>" + "Paragraphe d'article utile et suffisamment long. " * 3 + "</p>"
+            "<p><a href='/a'>Un lien vers un autre article du même site, très long</a> et un peu de texte</p>"
+            "</article><div class='related-posts'><p>" + "Article similaire recommandé par le site. " * 3 + "</p></div>"
+            "</body></html>").encode("utf-8")
+    page = extract_page("https://www.example.com/article", html)
+    assert page.content == ("Paragraphe d'article utile et suffisamment long. " * 3).strip()
+
+def test_validate_image_urls_batches_and_caches(mocker):
+    """Les images d'une grille sont vérifiées en un lot, puis servies depuis le cache"""
+    check = mocker.patch("veille_db.app.utils.check_image_url", side_effect=lambda url: url.endswith(".jpg"))
+    urls = ["https://img.test/a.jpg", "https://img.test/b.pdf", None, "https://img.test/a.jpg"]
+    assert validate_image_urls(urls) == {"https://img.test/a.jpg": True, "https://img.test/b.pdf": False}
+    assert check.call_count == 2
+    validate_image_urls(urls)
+    assert check.call_count == 2
+
+def test_extract_listing_links_resolves_and_dedupes():
+    content = b"""<html><body>
+    <h2 class="entry-title ast-blog-single-element"><a href="/a1">A1</a></h2>
+    <div class="td-module-thumb"><a href="https://site.test/a2">A2</a></div>
+    <div class="td-module-thumb"><a href="/a1">A1 bis</a></div>
+    <div class="sidebar"><a href="/ignored">X</a></div>
+    </body></html>"""
+    links = extract_listing_links("https://site.test/blog", content)
+    assert links == ["https://site.test/a1", "https://site.test/a2"]
+    assert extract_listing_links("https://site.test/blog", content, limit=1) == ["https://site.test/a1"]
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    urls = [f"https://site.test/{i}" for i in range(1000)]
+    for url in urls:
+        bloom.add(url)
+    assert all(url in bloom for url in urls)
+    false_positives = sum(f"https://other.test/{i}" in bloom for i in range(1000))
+    assert false_positives < 50
+
+def test_seen_url_index_only_checks_bloom_hits(tmp_path, mocker):
+    index = SeenUrlIndex(str(tmp_path / "seen.bloom"))
+    responses = {
+        ("GET", "/seen_urls"): {"urls": ["https://site.test/old"], "synced_at": "2024-01-01 00:00:00"},
+        ("POST", "/seen_urls/check"): {"seen": ["https://site.test/old"]},
+    }
+    def fake_request(method, url, **kwargs):
+        response = mocker.MagicMock()
+        response.json.return_value = responses[(method, urlparse(url).path)]
+        return response
+    request = mocker.patch("veille_db.app.utils.http_request", side_effect=fake_request)
+    new = index.filter_new("https://site.test", ["https://site.test/old", "https://site.test/new"])
+    assert new == ["https://site.test/new"]
+    check_calls = [call for call in request.call_args_list if call.args[1].endswith("/check")]
+    assert check_calls[0].kwargs["json"]["urls"] == ["https://site.test/old"]
+    assert (tmp_path / "seen.bloom").exists()
+
 @pytest.mark.integration
 def test_mysql_connection():
     """Test de connexion MySQL"""